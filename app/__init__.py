@@ -28,11 +28,49 @@ def create_app(config_name=None):
 
     app.config.from_object(f'app.config.{config_name.capitalize()}Config')
     
+    # orjson-backed JSON with Decimal support
+    from app.utils.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
     # Register extensions
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     
+    from app.services.property_cache import property_cache
+    property_cache.init_app(app)
+    
+    from app.services.reference_data import reference_data
+    reference_data.init_app(app)
+    
+    from app.services.view_tracker import view_buffer
+    view_buffer.init_app(app)
+    
+    from app.services.search_history import search_history_buffer
+    search_history_buffer.init_app(app)
+    
+    from app.services.property_similarity import similarity_refresh
+    similarity_refresh.init_app(app)
+    
+    from app.services.listing_index import listing_index
+    listing_index.init_app(app)
+
+    from app.services.search_suggest import suggest_index
+    suggest_index.init_app(app)
+
+    from app.services.map_clusters import cluster_index
+    cluster_index.init_app(app)
+    
+    from app.services.search_cache import search_cache
+    search_cache.init_app(app)
+    
+    from app.middleware.compression import compress
+    compress.init_app(app)
+    
+    # Per-request SQL and latency metrics (replaces request body logging)
+    from app.middleware.instrumentation import instrumentation
+    instrumentation.init_app(app)
+    
     # Register blueprints
     from app.route.auth import auth_bp
     from app.route.properties import properties_bp
@@ -85,14 +123,6 @@ def create_app(config_name=None):
     def serve_script(filename):
         return serve_static_with_fallback('js', filename)
     
-    # Add pre-request logger
-    @app.before_request
-    def log_request_info():
-        app.logger.debug('Headers: %s', request.headers)
-        app.logger.debug('Body: %s', request.get_data())
-        app.logger.debug('URL: %s', request.url)
-        app.logger.debug('Method: %s', request.method)
-    
     # Serve uploaded files
     @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
@@ -0,0 +1,187 @@
+# app/middleware/compression.py
+import gzip
+import threading
+import zlib
+from collections import OrderedDict
+from functools import wraps
+from flask import request, current_app
+from app.utils.http_cache import encoded_etag, ENCODING_ETAG_SUFFIXES
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional, gzip is always available
+    brotli = None
+
+DEFAULT_MIMETYPES = (
+    'application/json',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/javascript',
+    'image/svg+xml',
+)
+
+
+def no_compress(view):
+    """Opt a view out of response compression"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return view(*args, **kwargs)
+    wrapper.no_compress = True
+    return wrapper
+
+
+class Compress:
+    """
+    Compresses text responses with brotli or gzip, whichever the client
+    prefers (brotli wins ties when installed).
+
+    Responses are left alone when they are below COMPRESS_MIN_SIZE, are not
+    of a text type (images, PDFs, ...), are file passthroughs, already carry
+    a Content-Encoding, or come from a view decorated with @no_compress.
+    Streamed responses are compressed incrementally.
+
+    Bodies that carry an ETag are compressed once per encoding and kept in
+    an LRU, so cached payloads such as reference data or property detail
+    documents are not recompressed on every request. The ETag of a
+    compressed response gets an encoding suffix, since it is a different
+    representation of the resource.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.min_size = 500
+        self.level = 6
+        self.brotli_level = 4
+        self.mimetypes = frozenset(DEFAULT_MIMETYPES)
+        self.cache_size = 256
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+        self.level = app.config.get('COMPRESS_LEVEL', 6)
+        self.brotli_level = app.config.get('COMPRESS_BR_LEVEL', 4)
+        self.mimetypes = frozenset(app.config.get('COMPRESS_MIMETYPES', DEFAULT_MIMETYPES))
+        self.cache_size = app.config.get('COMPRESS_CACHE_SIZE', 256)
+        app.after_request(self.after_request)
+        app.extensions['compress'] = self
+
+    def _negotiate(self):
+        accept = request.accept_encodings
+        gzip_q = accept['gzip']
+        br_q = accept['br'] if brotli is not None else 0
+        if br_q and br_q >= gzip_q:
+            return 'br'
+        if gzip_q:
+            return 'gzip'
+        return None
+
+    def _opted_out(self):
+        view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+        return getattr(view, 'no_compress', False)
+
+    def after_request(self, response):
+        if not self.enabled:
+            return response
+
+        if response.status_code == 304:
+            self._echo_encoded_etag(response)
+            return response
+
+        if (response.status_code < 200 or response.status_code == 204
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in self.mimetypes
+                or request.method == 'HEAD'
+                or self._opted_out()):
+            return response
+
+        if response.is_streamed:
+            response.vary.add('Accept-Encoding')
+            encoding = self._negotiate()
+            if encoding:
+                response.response = self._compress_stream(response.response, encoding)
+                response.headers.pop('Content-Length', None)
+                self._finish(response, encoding)
+            return response
+
+        if (response.calculate_content_length() or 0) < self.min_size:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self._negotiate()
+        if encoding is None:
+            return response
+
+        etag = response.get_etag()[0]
+        cacheable = etag is not None and 'no-store' not in response.headers.get('Cache-Control', '')
+        body = self._cached(etag, encoding) if cacheable else None
+        if body is None:
+            body = self._compress(response.get_data(), encoding)
+            if cacheable:
+                self._store(etag, encoding, body)
+
+        response.set_data(body)
+        self._finish(response, encoding)
+        return response
+
+    def _finish(self, response, encoding):
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag is not None:
+            response.set_etag(encoded_etag(etag, encoding), weak=weak)
+
+    def _echo_encoded_etag(self, response):
+        # A 304 must repeat the validator the client sent, which for a
+        # compressed representation carries the encoding suffix
+        etag = response.get_etag()[0]
+        if etag is None or not request.if_none_match:
+            return
+        for encoding in ENCODING_ETAG_SUFFIXES:
+            if request.if_none_match.contains(encoded_etag(etag, encoding)):
+                response.set_etag(encoded_etag(etag, encoding))
+                return
+
+    def _compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_level)
+        return gzip.compress(data, compresslevel=self.level)
+
+    def _compress_stream(self, chunks, encoding):
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_level)
+            compress, flush = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            compress, flush = compressor.compress, compressor.flush
+
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compress(chunk)
+            if data:
+                yield data
+        yield flush()
+
+    def _cached(self, etag, encoding):
+        key = (etag, encoding)
+        with self._lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+            return body
+
+    def _store(self, etag, encoding, body):
+        with self._lock:
+            self._cache[(etag, encoding)] = body
+            self._cache.move_to_end((etag, encoding))
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+compress = Compress()
@@ -0,0 +1,139 @@
+# app/middleware/instrumentation.py
+import json
+import logging
+import random
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class RequestStats:
+    """SQL and timing counters of one request"""
+
+    __slots__ = ('started', 'queries', 'db_time', 'slowest_time', 'slowest_sql')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+
+    def record(self, statement, elapsed):
+        self.queries += 1
+        self.db_time += elapsed
+        if elapsed > self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_sql = statement
+
+
+class Instrumentation:
+    """
+    Per-request SQL and latency metrics built on SQLAlchemy engine events.
+
+    A sampled request (INSTRUMENTATION_SAMPLE_RATE) counts its queries,
+    total DB time and slowest statement. These are returned in a
+    Server-Timing header and logged as one JSON line. Requests slower than
+    INSTRUMENTATION_SLOW_REQUEST_MS are always logged, at WARNING, with
+    their latency; their DB figures are included when they were sampled.
+
+    Queries run while a streamed body is being sent happen after the
+    response headers are written and are not counted.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.sample_rate = 1.0
+        self.slow_request_ms = 1000
+        self.max_sql_length = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('INSTRUMENTATION_ENABLED', True)
+        self.sample_rate = app.config.get('INSTRUMENTATION_SAMPLE_RATE', 1.0)
+        self.slow_request_ms = app.config.get('INSTRUMENTATION_SLOW_REQUEST_MS', 1000)
+        self.max_sql_length = app.config.get('INSTRUMENTATION_MAX_SQL_LENGTH', 300)
+        app.extensions['instrumentation'] = self
+
+        if not self.enabled:
+            return
+
+        # Engine class events cover every engine, including ones created later
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def _start(self):
+        g._request_started = time.perf_counter()
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            g._request_stats = RequestStats()
+
+    def _finish(self, response):
+        started = g.pop('_request_started', None)
+        if started is None:
+            return response
+
+        total_ms = (time.perf_counter() - started) * 1000
+        stats = g.pop('_request_stats', None)
+        slow = total_ms >= self.slow_request_ms
+        if stats is None and not slow:
+            return response
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total_ms, 2),
+        }
+
+        if stats is not None:
+            db_ms = stats.db_time * 1000
+            record.update({
+                'db_queries': stats.queries,
+                'db_ms': round(db_ms, 2),
+                'slowest_query_ms': round(stats.slowest_time * 1000, 2),
+                'slowest_query': _shorten(stats.slowest_sql, self.max_sql_length),
+            })
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={db_ms:.2f};desc="{stats.queries} queries", '
+                f'app;dur={max(total_ms - db_ms, 0):.2f}, total;dur={total_ms:.2f}'
+            )
+
+        logger.log(logging.WARNING if slow else logging.INFO, json.dumps(record))
+        return response
+
+
+def _shorten(statement, limit):
+    if statement is None:
+        return None
+    statement = ' '.join(statement.split())
+    return statement if len(statement) <= limit else statement[:limit] + '...'
+
+
+def _current_stats():
+    return g.get('_request_stats') if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which a failed statement takes with it
+    if context is not None and _current_stats() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats()
+    started = getattr(context, '_query_started', None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+instrumentation = Instrumentation()
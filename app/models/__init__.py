@@ -1,6 +1,6 @@
 # app/models/__init__.py
 from app.models.user import User
-from app.models.property import Property, PropertyType, Parish, Amenity, PropertyImage, UserPropertyInteraction
+from app.models.property import Property, PropertyType, Parish, Amenity, PropertyImage, UserPropertyInteraction, PropertySimilarity
 from app.models.preference import UserPreference
-from app.models.search import SearchHistory
+from app.models.search import SearchHistory, SearchAggregate
 from app.models.alert import PropertyAlert  # Add this line to import PropertyAlert
\ No newline at end of file
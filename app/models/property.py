@@ -1,7 +1,11 @@
 from datetime import datetime
 from app import db
 import json
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import DDL, event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
+from app.utils.geo import GEO_CELL_EXPRESSION
 
 # Existing reference tables
 class PropertyType(db.Model):
@@ -55,11 +59,64 @@ property_amenities = db.Table('property_amenities',
     db.Column('amen_id', db.Integer, db.ForeignKey('amenities.amen_id'), primary_key=True)
 )
 
+# properties.amenity_bits is maintained by PostgreSQL so raw SQL writers
+# (the scraper) keep it in sync too. Statement triggers see every row a
+# statement inserted or deleted and repack each touched listing once; the
+# listing's updated_at is bumped so caches and indexes pick the change up.
+# Keep in step with migration 9a3f6c1d2e84.
+AMENITY_BITS_TRIGGER = """
+CREATE OR REPLACE FUNCTION sync_property_amenity_bits() RETURNS trigger AS $$
+BEGIN
+    UPDATE properties p
+    SET amenity_bits = packed.bits,
+        updated_at = timezone('utc', clock_timestamp())
+    FROM (
+        SELECT touched.prop_id,
+               coalesce(bit_or(1::bigint << (pa.amen_id - 1)) FILTER (WHERE pa.amen_id BETWEEN 1 AND 63), 0) AS bits
+        FROM (SELECT DISTINCT prop_id FROM changed) AS touched
+        LEFT JOIN property_amenities pa ON pa.prop_id = touched.prop_id
+        GROUP BY touched.prop_id
+    ) AS packed
+    WHERE p.prop_id = packed.prop_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER property_amenities_insert_bits AFTER INSERT ON property_amenities
+    REFERENCING NEW TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_property_amenity_bits();
+
+CREATE TRIGGER property_amenities_delete_bits AFTER DELETE ON property_amenities
+    REFERENCING OLD TABLE AS changed
+    FOR EACH STATEMENT EXECUTE FUNCTION sync_property_amenity_bits();
+"""
+
+event.listen(property_amenities, 'after_create', DDL(AMENITY_BITS_TRIGGER).execute_if(dialect='postgresql'))
+
 
 # Updated Property model with status and custom amenities
 
 class Property(db.Model):
     __tablename__ = 'properties'
+    __table_args__ = (
+        db.Index('ix_properties_search_vector', 'search_vector', postgresql_using='gin'),
+        db.Index('ix_properties_city_trgm', 'city', postgresql_using='gin', postgresql_ops={'city': 'gin_trgm_ops'}),
+        db.Index('ix_properties_address_trgm', 'address', postgresql_using='gin', postgresql_ops={'address': 'gin_trgm_ops'}),
+        db.Index('ix_properties_title_trgm', 'title', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'}),
+        db.Index('ix_properties_geo_cell', 'geo_cell'),
+        # Filters ending in the (created_at, prop_id) listing sort and cursor
+        db.Index('ix_properties_created_at', 'created_at', 'prop_id'),
+        db.Index('ix_properties_active_created_at', 'created_at', 'prop_id',
+                 postgresql_where=db.text("status = 'Active'")),
+        db.Index('ix_properties_parish_created_at', 'parish_id', 'created_at', 'prop_id'),
+        db.Index('ix_properties_type_created_at', 'property_type_id', 'created_at', 'prop_id'),
+        db.Index('ix_properties_parish_price', 'parish_id', 'price'),
+        db.Index('ix_properties_bedrooms_price', 'bedrooms', 'price'),
+        db.Index('ix_properties_price', 'price', 'prop_id'),
+        db.Index('ix_properties_owner_created_at', 'owner_id', 'created_at'),
+        db.Index('ix_properties_agent_id', 'agent_id', postgresql_where=db.text('agent_id IS NOT NULL')),
+        db.Index('ix_properties_updated_at', 'updated_at'),
+    )
     
     prop_id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -74,6 +131,7 @@ class Property(db.Model):
     parish_id = db.Column(db.Integer, db.ForeignKey('parishes.parish_id'))
     latitude = db.Column(db.Numeric(10, 7))
     longitude = db.Column(db.Numeric(10, 7))
+    geo_cell = db.Column(db.BigInteger, db.Computed(GEO_CELL_EXPRESSION, persisted=True))  # Map grid cell for area searches, maintained by PostgreSQL
     is_for_sale = db.Column(db.Boolean, default=True)
     is_for_rent = db.Column(db.Boolean, default=False)
     monthly_rent = db.Column(db.Numeric(15, 2))
@@ -89,9 +147,22 @@ class Property(db.Model):
     # New fields
     status = db.Column(db.String(20), default='Active')  # Active, Pending, Sold, Rented, Inactive, etc.
     custom_amenities = db.Column(JSONB, nullable=True)  # Store custom amenities as JSON string
+    amenity_bits = db.Column(db.BigInteger, nullable=False, default=0, server_default='0')  # Bit amen_id-1 per standard amenity, kept in sync by a trigger on property_amenities
     
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Raw inserts (the scraper) get created_at and updated_at from the server default
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow,
+                           server_default=db.text("timezone('utc', now())"))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.text("timezone('utc', now())"))
+    
+    # Weighted full-text document maintained by PostgreSQL (GIN indexed);
+    # deferred so ordinary loads never fetch it
+    search_vector = db.deferred(db.Column(TSVECTOR, db.Computed(
+        "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english'::regconfig, coalesce(city, '') || ' ' || coalesce(address, '')), 'B') || "
+        "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'C')",
+        persisted=True
+    )))
     
     # Relationships
     property_type = db.relationship('PropertyType', back_populates='properties')
@@ -153,6 +224,9 @@ class Property(db.Model):
 
 class PropertyImage(db.Model):
     __tablename__ = 'property_images'
+    __table_args__ = (
+        db.Index('ix_property_images_prop_id', 'prop_id', 'is_primary'),
+    )
     
     image_id = db.Column(db.Integer, primary_key=True)
     prop_id = db.Column(db.Integer, db.ForeignKey('properties.prop_id'), nullable=False)
@@ -175,6 +249,9 @@ class PropertyImage(db.Model):
 
 class SavedProperty(db.Model):
     __tablename__ = 'saved_properties'
+    __table_args__ = (
+        db.Index('ix_saved_properties_prop_id', 'prop_id'),
+    )
     
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), primary_key=True)
     prop_id = db.Column(db.Integer, db.ForeignKey('properties.prop_id'), primary_key=True)
@@ -187,6 +264,11 @@ class SavedProperty(db.Model):
 
 class UserPropertyInteraction(db.Model):
     __tablename__ = 'user_property_interactions'
+    __table_args__ = (
+        # One row per user and listing, so view counts can be upserted
+        db.UniqueConstraint('user_id', 'prop_id', name='uq_user_property_interactions_user_prop'),
+        db.Index('ix_user_property_interactions_prop_id', 'prop_id'),
+    )
     
     interaction_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'), nullable=False)
@@ -199,4 +281,50 @@ class UserPropertyInteraction(db.Model):
     
     # Relationships
     user = db.relationship('User', back_populates='interactions')
-    property = db.relationship('Property', back_populates='interactions')
\ No newline at end of file
+    property = db.relationship('Property', back_populates='interactions')
+
+
+
+class PropertySimilarity(db.Model):
+    """Precomputed top-k most similar listings of each listing, kept by property_similarity"""
+    __tablename__ = 'property_similarities'
+    __table_args__ = (
+        db.Index('ix_property_similarities_similar_prop_id', 'similar_prop_id'),
+    )
+    
+    prop_id = db.Column(db.Integer, db.ForeignKey('properties.prop_id', ondelete='CASCADE'), primary_key=True)
+    rank = db.Column(db.SmallInteger, primary_key=True)  # 1 = most similar
+    similar_prop_id = db.Column(db.Integer, db.ForeignKey('properties.prop_id', ondelete='CASCADE'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# The trigger on property_amenities rewrites amenity_bits and updated_at
+# of listings whose amenities change; read them back after the flush so
+# loaded objects do not hold stale values.
+@event.listens_for(Session, 'before_flush')
+def _collect_amenity_changes(session, flush_context, instances):
+    changed = session.info.setdefault('amenity_bits_pending', set())
+    for obj in session.new:
+        if isinstance(obj, Property) and 'amenities' in inspect(obj).dict:
+            changed.add(obj)
+    for obj in session.dirty:
+        if isinstance(obj, Property) and inspect(obj).attrs.amenities.history.has_changes():
+            changed.add(obj)
+
+
+@event.listens_for(Session, 'after_flush')
+def _refresh_amenity_bits(session, flush_context):
+    changed = session.info.pop('amenity_bits_pending', None)
+    props = {prop.prop_id: prop for prop in changed or ()
+             if not inspect(prop).deleted and prop.prop_id is not None}
+    if not props:
+        return
+
+    table = Property.__table__
+    rows = session.connection().execute(
+        db.select(table.c.prop_id, table.c.amenity_bits, table.c.updated_at)
+        .where(table.c.prop_id.in_(list(props)))
+    )
+    for prop_id, bits, updated_at in rows:
+        set_committed_value(props[prop_id], 'amenity_bits', bits)
+        set_committed_value(props[prop_id], 'updated_at', updated_at)
@@ -5,12 +5,20 @@ from app import db
 
 class SearchHistory(db.Model):
     __tablename__ = 'search_history'
+    __table_args__ = (
+        db.Index('ix_search_history_user_signature', 'user_id', 'signature', 'search_date'),
+        db.Index('ix_search_history_user_date', 'user_id', 'search_date'),
+        db.Index('ix_search_history_pending', 'search_date', postgresql_where=db.text('NOT aggregated')),
+    )
     
     search_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.user_id'))
     search_query = db.Column(db.Text, nullable=False)
     search_params = db.Column(db.JSON)
-    search_date = db.Column(db.DateTime, default=datetime.utcnow)
+    search_date = db.Column(db.DateTime, default=datetime.utcnow)  # Last time the search was run
+    signature = db.Column(db.String(40))  # SearchFilters.signature, identifies repeats of a search
+    hit_count = db.Column(db.Integer, nullable=False, default=1, server_default='1')  # Repeats collapsed into this row
+    aggregated = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())  # Counted in search_aggregates
     
     # Relationships
     user = db.relationship('User', back_populates='search_history')
@@ -21,5 +29,27 @@ class SearchHistory(db.Model):
             'user_id': self.user_id,
             'search_query': self.search_query,
             'search_params': self.search_params,
-            'search_date': self.search_date.isoformat() if self.search_date else None
-        }
\ No newline at end of file
+            'search_date': self.search_date.isoformat() if self.search_date else None,
+            'hit_count': self.hit_count
+        }
+
+
+class SearchAggregate(db.Model):
+    """Searches rolled up from search_history by compaction, one row per signature"""
+    __tablename__ = 'search_aggregates'
+    
+    aggregate_id = db.Column(db.Integer, primary_key=True)
+    signature = db.Column(db.String(40), unique=True, nullable=False)
+    search_query = db.Column(db.Text, nullable=False)
+    search_params = db.Column(db.JSON)  # Normalized params of the latest run
+    search_count = db.Column(db.Integer, nullable=False, default=0, index=True)
+    first_seen = db.Column(db.DateTime)
+    last_seen = db.Column(db.DateTime, index=True)
+    
+    def to_dict(self):
+        return {
+            'search_query': self.search_query,
+            'search_params': self.search_params,
+            'search_count': self.search_count,
+            'last_seen': self.last_seen.isoformat() if self.last_seen else None
+        }
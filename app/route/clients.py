@@ -3,6 +3,9 @@ from flask_cors import cross_origin
 from app import db
 from app.models.client import Client
 from app.models.property import Property
+from app.services.property_loader import loader_options
+from app.utils.json_provider import stream_json_array
+from sqlalchemy.orm import selectinload
 
 clients_bp = Blueprint('clients', __name__, url_prefix='/clients')
 
@@ -78,8 +81,15 @@ def delete_client(client_id):
 @clients_bp.route('', methods=['GET'])
 @cross_origin()
 def get_clients():
-    clients = Client.query.all()
-    return jsonify([c.to_dict() for c in clients])
+    try:
+        # Streamed in batches; each batch loads its listings with a few IN queries
+        clients = Client.query.options(
+            selectinload(Client.properties).options(*loader_options('card'))
+        ).order_by(Client.id)
+        return stream_json_array(clients, lambda client: client.to_dict())
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error retrieving clients: {str(e)}'}), 500
 
 @clients_bp.route('/<int:client_id>', methods=['GET'])
 @cross_origin()
@@ -1,16 +1,31 @@
 # app/route/properties.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 import os
 import json
+import hashlib
 from datetime import datetime
 from werkzeug.utils import secure_filename
 from app import db, create_app
 from app.models.property import Property, PropertyImage, PropertyType, Parish, Amenity, UserPropertyInteraction
 from app.models.user import User
+from app.services.property_loader import with_profile
+from app.services.property_cache import (
+    property_cache, serialize_property, version_query, documents_for_rows,
+    property_version, detail_document
+)
+from app.services.reference_data import reference_data
+from app.services.view_tracker import view_buffer
+from app.services.text_search import attach_snippets
+from app.services.search_count import count_strategy
+from app.services.search_query import InvalidSearch, SearchFilters, filter_query
+from app.services.search_service import search_properties as run_search
+from app.services.map_clusters import cluster_index
+from app.services.property_similarity import similar_listings
+from app.utils.http_cache import cached_json_response, request_is_fresh, not_modified
+from app.services.property_projection import requested_fields, project, row_to_dict
+from app.utils.pagination import InvalidCursor, clamp_limit, keyset_paginate
 from sqlalchemy import desc, or_, func
-import random
-import math
 
 
 # Create blueprint without url_prefix
@@ -53,33 +68,31 @@ def save_property_image(file, prop_id):
 @properties_bp.route('/<int:prop_id>', methods=['GET'])
 @jwt_required(optional=True)  # This allows anonymous users too
 def get_property(prop_id):
-    property = Property.query.get_or_404(prop_id)
+    # Cheap version lookup; the listing itself is only loaded on a cache miss
+    version = property_version(prop_id)
+    if version is None:
+        abort(404)
     
     user_id = get_jwt_identity()
     
     if user_id:
-        from app.models.property import UserPropertyInteraction
-
-        interaction = UserPropertyInteraction.query.filter_by(
-            user_id=user_id, 
-            prop_id=prop_id
-        ).first()
+        # Buffered and written in bulk by a background flush
+        view_buffer.record(user_id, prop_id)
 
-        if interaction:
-            interaction.view_count += 1
-            interaction.last_viewed = datetime.utcnow()
-        else:
-            interaction = UserPropertyInteraction(
-                user_id=user_id,
-                prop_id=prop_id,
-                view_count=1,
-                last_viewed=datetime.utcnow()
-            )
-            db.session.add(interaction)
+    # Detail pages revalidate on every load, so tell clients to always ask
+    cache_control = 'private, no-cache'
+    if request_is_fresh(version.etag, version.last_modified):
+        return not_modified(version.etag, cache_control, version.last_modified)
 
-        db.session.commit()
+    document = detail_document(version)
+    if document is None:
+        abort(404)
 
-    return jsonify(property.to_dict(include_owner=True)), 200
+    response = jsonify(document)
+    response.set_etag(version.etag)
+    response.last_modified = version.last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response, 200
 
 # Create property
 # Create property
@@ -240,25 +253,36 @@ def create_property():
                 except ValueError:
                     custom_names.append(a.strip())
 
+            # Resolve custom names of amenities that already exist through the registry
+            new_names = []
+            for name in custom_names:
+                if not name:
+                    continue
+                amen_id = reference_data.lookup_id('amenities', name)
+                if amen_id:
+                    standard_ids.append(amen_id)
+                else:
+                    new_names.append(name)
+
             # Attach standard amenities
             if standard_ids:
                 standard_amenities = Amenity.query.filter(Amenity.amen_id.in_(standard_ids)).all()
                 property.amenities = standard_amenities
 
             # Attach custom amenities
-            for name in custom_names:
-                if not name:
-                    continue  # Fixed indentation here
-                
-                # Check if amenity already exists
+            created_amenity = False
+            for name in new_names:
+                # Another worker may have added it since our registry was loaded
                 existing_amenity = Amenity.query.filter(func.lower(Amenity.name) == func.lower(name)).first()
                 if existing_amenity:
-                    property.amenities.append(existing_amenity)
+                    if existing_amenity not in property.amenities:
+                        property.amenities.append(existing_amenity)
                 else:
                     new_amenity = Amenity(name=name)
                     db.session.add(new_amenity)
                     db.session.flush()
                     property.amenities.append(new_amenity)
+                    created_amenity = True
 
             images = request.files.getlist('images')
             print(f"Processing {len(images)} images")
@@ -288,6 +312,9 @@ def create_property():
                 print("Error committing to database:", str(e))
                 return jsonify({'message': f'Database commit error: {str(e)}'}), 422
 
+            if created_amenity:
+                reference_data.invalidate('amenities')
+
             return jsonify({
                 'message': 'Property created successfully',
                 'property': property.to_dict()
@@ -305,18 +332,18 @@ def create_property():
 
 @properties_bp.route('/types', methods=['GET'])
 def get_property_types():
-    property_types = PropertyType.query.all()
-    return jsonify({'property_types': [pt.to_dict() for pt in property_types]}), 200
+    entry = reference_data.get('property_types')
+    return cached_json_response(entry.body, entry.etag, reference_data.cache_control)
 
 @properties_bp.route('/parishes', methods=['GET'])
 def get_parishes():
-    parishes = Parish.query.all()
-    return jsonify({'parishes': [p.to_dict() for p in parishes]}), 200
+    entry = reference_data.get('parishes')
+    return cached_json_response(entry.body, entry.etag, reference_data.cache_control)
 
 @properties_bp.route('/amenities', methods=['GET'])
 def get_amenities():
-    amenities = Amenity.query.all()
-    return jsonify({'amenities': [a.to_dict() for a in amenities]}), 200
+    entry = reference_data.get('amenities')
+    return cached_json_response(entry.body, entry.etag, reference_data.cache_control)
 
 @properties_bp.route('/amenities/add', methods=['POST'])
 @jwt_required()
@@ -335,6 +362,9 @@ def create_amenity():
         return jsonify({'message': 'Amenity name is required'}), 400
     
     # Check if amenity already exists
+    known = reference_data.lookup('amenities', data['name'])
+    if known:
+        return jsonify({'message': 'This amenity already exists', 'amenity': known}), 400
     existing = Amenity.query.filter(func.lower(Amenity.name) == func.lower(data['name'])).first()
     if existing:
         return jsonify({'message': 'This amenity already exists', 'amenity': existing.to_dict()}), 400
@@ -343,18 +373,54 @@ def create_amenity():
     amenity = Amenity(name=data['name'])
     db.session.add(amenity)
     db.session.commit()
+    reference_data.invalidate('amenities')
     
     return jsonify({'message': 'Amenity created successfully', 'amenity': amenity.to_dict()}), 201
 
+@properties_bp.route('/clusters', methods=['GET'])
+def get_property_clusters():
+    """Map markers aggregated per grid cell (count, centroid, min and median price) for a zoom level"""
+    zoom = request.args.get('zoom', type=int)
+    if zoom is None or not 0 <= zoom <= 22:
+        return jsonify({'message': 'zoom must be an integer between 0 and 22'}), 400
+    try:
+        bbox = SearchFilters.from_params({'bbox': request.args.get('bbox')}).bbox
+    except InvalidSearch as e:
+        return jsonify({'message': str(e)}), 400
+
+    zoom, clusters = cluster_index.clusters(zoom, bbox)
+    body = current_app.json.dumps({
+        'zoom': zoom,
+        'cell_degrees': cluster_index.cell_degrees(zoom),
+        'total': sum(cluster['count'] for cluster in clusters),
+        'clusters': clusters
+    }).encode('utf-8')
+
+    # Panning back over an unchanged area is answered with a 304
+    cache_control = f"public, max-age={current_app.config.get('PROPERTY_CLUSTER_MAX_AGE', 30)}"
+    return cached_json_response(body, hashlib.sha1(body).hexdigest(), cache_control)
+
 @properties_bp.route('/featured', methods=['GET'])
 def get_featured_properties():
     limit = request.args.get('limit', 6, type=int)
     
+    try:
+        fields = requested_fields(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    
+    # Card grids only need a few columns, so skip ORM hydration entirely
+    if fields:
+        rows = project(Property.query, fields).limit(limit).all()
+        return jsonify({
+            'featured_properties': [row_to_dict(row, fields) for row in rows]
+        }), 200
+    
     # Logic to get featured properties
-    featured_properties = Property.query.limit(limit).all()
+    featured_properties = version_query(Property.query).limit(limit).all()
     
     return jsonify({
-        'featured_properties': [p.to_dict() for p in featured_properties]
+        'featured_properties': documents_for_rows(featured_properties)
     }), 200
 
 @properties_bp.route('/most-viewed', methods=['GET'])
@@ -362,10 +428,10 @@ def get_most_viewed_properties():
     limit = request.args.get('limit', 6, type=int)
     
     # Logic to get most viewed properties
-    properties = Property.query.limit(limit).all()
+    properties = version_query(Property.query).limit(limit).all()
     
     return jsonify({
-        'properties': [p.to_dict() for p in properties]
+        'properties': documents_for_rows(properties)
     }), 200
 
 @properties_bp.route('/<int:prop_id>/similar', methods=['GET'])
@@ -380,75 +446,19 @@ def get_similar_properties(prop_id):
         if not property:
             return jsonify({"error": "Property not found"}), 404
         
-        # Find similar properties based on various attributes
-        similar_properties = Property.query.filter(
-            Property.prop_id != prop_id,  # Exclude the current property
-            Property.property_type_id == property.property_type_id  # Same property type
-        )
+        # Precomputed neighbours, best first, loaded with the card profile
+        similar_properties = similar_listings(prop_id, limit)
         
-        # Additional filters if available
-        if property.parish_id:
-            similar_properties = similar_properties.filter(
-                or_(
-                    Property.parish_id == property.parish_id,  # Same parish
-                    Property.city == property.city  # Or same city
-                )
-            )
-        
-        if property.bedrooms:
-            # Similar number of bedrooms (+/- 1)
-            similar_properties = similar_properties.filter(
-                or_(
-                    Property.bedrooms == property.bedrooms,
-                    Property.bedrooms == property.bedrooms + 1,
-                    Property.bedrooms == property.bedrooms - 1
-                )
-            )
-        
-        if property.price:
-            # Price range within 25% of the target property's price
-            price_min = property.price * 0.75
-            price_max = property.price * 1.25
-            similar_properties = similar_properties.filter(
-                Property.price.between(price_min, price_max)
-            )
-        
-        # Get all matching properties
-        similar_properties = similar_properties.all()
-        
-        # If we don't have enough, get random properties of the same type
-        if len(similar_properties) < limit:
-            fallback_properties = Property.query.filter(
-                Property.prop_id != prop_id,
-                Property.property_type_id == property.property_type_id,
-                ~Property.prop_id.in_([p.prop_id for p in similar_properties])
-            ).all()
-            
-            # Add fallback properties until we reach the limit or run out
-            while len(similar_properties) < limit and fallback_properties:
-                random_property = random.choice(fallback_properties)
-                similar_properties.append(random_property)
-                fallback_properties.remove(random_property)
-        
-        # Limit to requested number and convert to list of dictionaries
+        # Convert to list of dictionaries
         result = []
-        for prop in similar_properties[:limit]:
-            # Get property images
-            images = []
-            property_images = PropertyImage.query.filter_by(prop_id=prop.prop_id).all()
-            for img in property_images:
-                images.append({
-                    "image_url": img.image_url,
-                    "is_primary": img.is_primary
-                })
-                
-            # Get property type name
-            property_type = PropertyType.query.get(prop.property_type_id)
-            property_type_name = property_type.name if property_type else None
-            
-            # Get parish name
-            parish = Parish.query.get(prop.parish_id) if prop.parish_id else None
-            parish_name = parish.name if parish else None
+        for prop, score in similar_properties:
+            # Images, type and parish are already loaded by the card profile
+            images = [
+                {"image_url": img.image_url, "is_primary": img.is_primary}
+                for img in prop.images
+            ]
+            property_type_name = prop.property_type.name if prop.property_type else None
+            parish_name = prop.parish.name if prop.parish else None
             
             # Build property data
             property_data = {
@@ -471,7 +481,8 @@ def get_similar_properties(prop_id):
                     "name": parish_name
                 },
                 "property_images": images,
-                "status": prop.status
+                "status": prop.status,
+                "similarity_score": score
             }
             
             result.append(property_data)
@@ -520,7 +531,11 @@ def add_property_images(prop_id):
                 else:
                     print(f"Failed to save image {i+1}")
         
+        # New images change the serialized listing
+        property.updated_at = datetime.utcnow()
+        
         db.session.commit()
+        property_cache.invalidate(prop_id)
         return jsonify({
             'message': 'Images added successfully', 
             'property': property.to_dict()
@@ -534,38 +549,49 @@ def add_property_images(prop_id):
 @properties_bp.route('/', methods=['GET'])
 def get_properties():
     try:
-        owner_id = request.args.get('owner_id', type=int)
-        agent_id = request.args.get('agent_id', type=int)
-        parish_id = request.args.get('parish_id', type=int)
-        property_type_id = request.args.get('property_type_id', type=int)
-        status = request.args.get('status')
+        fields = requested_fields(request.args)
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
 
-        query = Property.query
+    try:
+        filters = SearchFilters.from_args(request.args)
+        cursor = request.args.get('cursor')
+        limit = clamp_limit(
+            request.args.get('limit', type=int),
+            current_app.config['PROPERTY_PAGE_SIZE'],
+            current_app.config['PROPERTY_PAGE_SIZE_MAX']
+        )
 
-        if owner_id:
-            print("Filtering by owner_id:", owner_id)
-            query = query.filter_by(owner_id=owner_id)
-        if agent_id:
-            print("Filtering by agent_id:", agent_id)
-            query = query.filter_by(agent_id=agent_id)
-        if parish_id:
-            print("Filtering by parish_id:", parish_id)
-            query = query.filter_by(parish_id=parish_id)
-        if property_type_id:
-            print("Filtering by property_type_id:", property_type_id)
-            query = query.filter_by(property_type_id=property_type_id)
-        if status:
-            print("Filtering by status:", status)
-            query = query.filter_by(status=status)
+        # Any search filter applies; the listing stays newest first for the
+        # keyset cursor
+        query = filter_query(filters)
 
-        properties = query.order_by(Property.created_at.desc()).all()
+        if fields:
+            # created_at is selected for the keyset cursor even if not requested
+            query = project(query, fields, extra=('created_at',))
+        else:
+            # Only ids and versions are read here, documents come from the cache
+            query = version_query(query, include_owner=True, extra=(Property.created_at,))
+
+        properties, next_cursor = keyset_paginate(
+            query, Property.created_at, Property.prop_id, limit, cursor
+        )
 
         print("Returned properties:", [p.prop_id for p in properties])
 
+        if fields:
+            properties_data = [row_to_dict(row, fields) for row in properties]
+        else:
+            properties_data = documents_for_rows(properties, include_owner=True)
+
         return jsonify({
-            'properties': [p.to_dict(include_owner=True) for p in properties]
+            'properties': properties_data,
+            'next_cursor': next_cursor,
+            'limit': limit
         }), 200
 
+    except (InvalidCursor, InvalidSearch) as e:
+        return jsonify({'message': str(e)}), 400
     except Exception as e:
         print("Error in get_properties:", str(e))
         return jsonify({'message': 'Failed to fetch properties'}), 500
@@ -600,6 +626,7 @@ def update_property_custom_amenities(prop_id):
     property_item.updated_at = datetime.utcnow()
     
     db.session.commit()
+    property_cache.invalidate(prop_id)
     
     return jsonify({
         'message': 'Property custom amenities updated successfully',
@@ -638,6 +665,7 @@ def update_property_standard_amenities(prop_id):
         property_item.updated_at = datetime.utcnow()
         
         db.session.commit()
+        property_cache.invalidate(prop_id)
         
         return jsonify({
             'message': 'Property standard amenities updated successfully',
@@ -683,6 +711,7 @@ def update_property_amenities(prop_id):
     property_item.updated_at = datetime.utcnow()
     
     db.session.commit()
+    property_cache.invalidate(prop_id)
     
     return jsonify({
         'message': 'Property amenities updated successfully',
@@ -723,6 +752,7 @@ def update_property_status(prop_id):
     property_item.updated_at = datetime.utcnow()
     
     db.session.commit()
+    property_cache.invalidate(prop_id)
     
     return jsonify({
         'message': 'Property status updated successfully',
@@ -849,6 +879,7 @@ def update_property(prop_id):
     
     try:
         db.session.commit()
+        property_cache.invalidate(prop_id)
         return jsonify({
             'message': 'Property updated successfully',
             'property': property.to_dict()
@@ -887,6 +918,7 @@ def delete_property(prop_id):
         # Delete property from database
         db.session.delete(property_item)
         db.session.commit()
+        property_cache.invalidate(prop_id)
         
         return jsonify({
             'message': 'Property deleted successfully'
@@ -1002,10 +1034,10 @@ def get_user_saved_properties():
         property_ids = [interaction.prop_id for interaction in saved_interactions]
         
         # Get the properties
-        properties = Property.query.filter(Property.property_id.in_(property_ids)).all()
+        properties = with_profile(Property.query, 'card').filter(Property.prop_id.in_(property_ids)).all()
         
         return jsonify({
-            'properties': [prop.to_dict() for prop in properties]
+            'properties': [serialize_property(prop) for prop in properties]
         }), 200
         
     except Exception as e:
@@ -1018,101 +1050,37 @@ def get_user_saved_properties():
 def search_properties():
     """Search properties with advanced filters"""
     try:
-        # Extract filters from query parameters
-        min_price = request.args.get('min_price', type=float)
-        max_price = request.args.get('max_price', type=float)
-        parish_id = request.args.get('parish_id', type=int)
-        parish_name = request.args.get('parish')  # String parameter for parish name
-        property_type_id = request.args.get('property_type_id', type=int)
-        min_bedrooms = request.args.get('min_bedrooms', type=int)
-        min_bathrooms = request.args.get('min_bathrooms', type=float)
-        is_for_sale = request.args.get('is_for_sale', '').lower() == 'true'
-        is_for_rent = request.args.get('is_for_rent', '').lower() == 'true'
-        city = request.args.get('city')
-        keyword = request.args.get('keyword')
+        # Parameters are validated once into the shared search filters
+        try:
+            filters = SearchFilters.from_args(request.args)
+        except InvalidSearch as e:
+            return jsonify({'error': 'Invalid search', 'message': str(e)}), 400
         
         # Get pagination parameters
         page = request.args.get('page', 1, type=int)
         limit = request.args.get('limit', 12, type=int)
         
         # Log the search parameters
-        print(f"Search params: min_price={min_price}, max_price={max_price}, parish_id={parish_id}, "
-              f"parish={parish_name}, property_type_id={property_type_id}, min_bedrooms={min_bedrooms}, "
-              f"min_bathrooms={min_bathrooms}, is_for_sale={is_for_sale}, is_for_rent={is_for_rent}, "
-              f"city={city}, keyword={keyword}, page={page}, limit={limit}")
-        
-        # Start building the query
-        query = Property.query
-        
-        # Apply filters
-        if min_price:
-            query = query.filter(Property.price >= min_price)
-        if max_price:
-            query = query.filter(Property.price <= max_price)
-        if parish_id:
-            query = query.filter(Property.parish_id == parish_id)
-        elif parish_name:
-            # Get parish ID from name
-            parish = Parish.query.filter(Parish.name.ilike(f"%{parish_name}%")).first()
-            if parish:
-                query = query.filter(Property.parish_id == parish.parish_id)
-        if property_type_id:
-            query = query.filter(Property.property_type_id == property_type_id)
-        if min_bedrooms:
-            query = query.filter(Property.bedrooms >= min_bedrooms)
-        if min_bathrooms:
-            query = query.filter(Property.bathrooms >= min_bathrooms)
-        if is_for_sale is not None:
-            query = query.filter(Property.is_for_sale == is_for_sale)
-        if is_for_rent is not None:
-            query = query.filter(Property.is_for_rent == is_for_rent)
-        if city:
-            query = query.filter(Property.city.ilike(f"%{city}%"))
-        if keyword:
-            search_term = f"%{keyword}%"
-            query = query.filter(
-                or_(
-                    Property.title.ilike(search_term),
-                    Property.description.ilike(search_term),
-                    Property.city.ilike(search_term),
-                    Property.address.ilike(search_term)
-                )
-            )
-        
-        # Process amenities filter - more complex because it's an array parameter
-        amenities = request.args.getlist('amenities[]')
-        if amenities and len(amenities) > 0:
-            print(f"Filtering by amenities: {amenities}")
-            
-            # For each amenity, join with amenities table to filter
-            for amenity in amenities:
-                # Try to parse as int for ID-based filter
-                try:
-                    amenity_id = int(amenity)
-                    query = query.join(Property.amenities).filter(Amenity.amen_id == amenity_id)
-                except ValueError:
-                    # If not an ID, filter by name
-                    query = query.join(Property.amenities).filter(Amenity.name.ilike(f"%{amenity}%"))
-        
-        # Count total results
-        total_count = query.count()
-        
-        # Apply pagination
-        query = query.order_by(Property.created_at.desc())
-        paginated_query = query.offset((page - 1) * limit).limit(limit)
+        print(f"Search params: {filters.to_params()}, page={page}, limit={limit}")
         
-        # Execute query
-        properties = paginated_query.all()
+        # Same search path as /api/search: in-memory index, cached result
+        # ids, then SQL with the total riding along with the page
+        result = run_search(filters, page=page, per_page=limit,
+                            count=count_strategy(request.args.get('count')))
         
-        # Convert to dict
-        properties_data = [p.to_dict(include_images=True) for p in properties]
+        # Documents are assembled from the serialization cache
+        properties_data = documents_for_rows(result.items)
+        if filters.keyword and request.args.get('snippets', '').lower() == 'true':
+            attach_snippets(properties_data, filters.keyword)
         
         # Create response
         response = {
             'properties': properties_data,
-            'total': total_count,
-            'pages': math.ceil(total_count / limit) if limit > 0 else 1,
-            'page': page
+            'total': result.total,
+            'total_is_estimate': result.estimated,
+            'pages': result.pages,
+            'page': page,
+            'has_more': result.has_more
         }
         
         print(f"Found {len(properties_data)} properties matching filters (page {page} of {response['pages']})")
@@ -6,6 +6,7 @@ from app.models.property import Property
 from app.models.preference import UserPreference  # Instead of app.models.user_preference
 from app.models.property import UserPropertyInteraction  # Instead of app.models.property_interaction
 from app.utils.recommendation_engine import PropertyRecommendationEngine
+from app.services.property_similarity import similar_listings
 from app import db
 import logging
 
@@ -46,24 +47,19 @@ def get_similar_properties(property_id):
     
     try:
         # Check if property exists
-        property_exists = Property.query.filter_by(id=property_id).first()
+        property_exists = Property.query.filter_by(prop_id=property_id).first()
         if not property_exists:
             return jsonify({
                 'success': False,
                 'message': 'Property not found'
             }), 404
             
-        # Get similar properties
-        similar_properties = recommendation_engine.get_similar_properties(property_id, limit)
-        
-        # Add property details to each similar property
+        # Precomputed neighbours, loaded with their details in one query
         detailed_properties = []
-        for similar in similar_properties:
-            property_data = Property.query.filter_by(id=similar['property_id']).first()
-            if property_data:
-                property_dict = property_data.to_dict()
-                property_dict['similarity_score'] = similar['similarity_score']
-                detailed_properties.append(property_dict)
+        for property_data, score in similar_listings(property_id, limit):
+            property_dict = property_data.to_dict()
+            property_dict['similarity_score'] = score
+            detailed_properties.append(property_dict)
         
         return jsonify({
             'success': True,
@@ -1,15 +1,41 @@
 # app/route/search.py
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt.exceptions import PyJWTError
 from sqlalchemy import and_, or_, func
 import json
 from app import db
 from app.models.property import Property, Parish, PropertyType, Amenity
 from app.models.search import SearchHistory
 from app.services.search_service import search_properties
+from app.services.search_facets import search_facets
+from app.services.search_count import count_strategy
+from app.services.search_query import InvalidSearch, SearchFilters
+from app.services.search_history import search_history_buffer
+from app.services.search_aggregates import popular_searches
+from app.services.search_suggest import SUGGEST_TYPES, suggest
+from app.services.property_projection import requested_fields, row_to_dict
+from app.services.property_cache import documents_for_rows, serialize_property
+from app.services.text_search import attach_snippets
+from app.services.geo_search import attach_distances
 
 search_bp = Blueprint('search', __name__)
 
+def _describe(filters):
+    """Human readable summary of a search for the search history"""
+    return " ".join([
+        filters.keyword or '',
+        filters.city or '',
+        f"{filters.min_bedrooms} bedrooms" if filters.min_bedrooms else '',
+        f"{filters.min_bathrooms} bathrooms" if filters.min_bathrooms else '',
+        f"${filters.min_price}-${filters.max_price}" if filters.min_price and filters.max_price else '',
+        "For Sale" if filters.is_for_sale else '',
+        "For Rent" if filters.is_for_rent else '',
+        f"within {filters.radius_km:g} km" if filters.radius_km else '',
+        "in map area" if filters.bbox else ''
+    ]).strip()
+
 # Add OPTIONS handler for the main search endpoint
 @search_bp.route('', methods=['OPTIONS'])
 def options_search():
@@ -18,83 +44,58 @@ def options_search():
 # Main search endpoint
 @search_bp.route('', methods=['GET'])
 def search():
-    # Extract search parameters from query string
-    min_price = request.args.get('min_price', type=float)
-    max_price = request.args.get('max_price', type=float)
-    parish_id = request.args.get('parish_id', type=int)
-    city = request.args.get('city')
-    property_type_id = request.args.get('property_type_id', type=int)
-    min_bedrooms = request.args.get('min_bedrooms', type=int)
-    min_bathrooms = request.args.get('min_bathrooms', type=float)
-    amenities = request.args.getlist('amenities')
-    is_for_sale = request.args.get('is_for_sale', 'false').lower() == 'true'
-    is_for_rent = request.args.get('is_for_rent', 'false').lower() == 'true'
-    sort_by = request.args.get('sort_by', 'created_at')
-    sort_order = request.args.get('sort_order', 'desc')
+    try:
+        filters = SearchFilters.from_args(request.args)
+    except InvalidSearch as e:
+        return jsonify({'error': 'Invalid search', 'message': str(e)}), 400
+    search_params = filters.to_params()
+    keyword = filters.keyword
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     
-    # Construct search parameters dictionary for history
-    search_params = {
-        'min_price': min_price,
-        'max_price': max_price,
-        'parish_id': parish_id,
-        'city': city,
-        'property_type_id': property_type_id,
-        'min_bedrooms': min_bedrooms,
-        'min_bathrooms': min_bathrooms,
-        'amenities': amenities,
-        'is_for_sale': is_for_sale,
-        'is_for_rent': is_for_rent,
-        'sort_by': sort_by,
-        'sort_order': sort_order
-    }
-    
-    # Remove None values for cleaner JSON
-    search_params = {k: v for k, v in search_params.items() if v is not None}
+    try:
+        fields = requested_fields(request.args)
+    except ValueError as e:
+        return jsonify({'error': 'Invalid fields', 'message': str(e)}), 400
     
-    # Get current user ID if available
+    # Get current user ID if available; a missing, expired or malformed
+    # token still gets results, the search is just not recorded
     user_id = None
-    if request.headers.get('Authorization'):
-        try:
-            user_id = get_jwt_identity()
-        except:
-            pass
+    try:
+        verify_jwt_in_request(optional=True)
+        user_id = get_jwt_identity()
+    except (JWTExtendedException, PyJWTError):
+        pass
     
     try:
         # Call search service
-        results, total, pages = search_properties(
-            search_params, 
+        result = search_properties(
+            filters, 
             page=page, 
-            per_page=per_page
+            per_page=per_page,
+            fields=fields,
+            count=count_strategy(request.args.get('count'))
         )
         
-        # Save search history if user is logged in
+        # Save search history if user is logged in; buffered and written
+        # in bulk by a background flush
         if user_id:
-            search_query = " ".join([
-                city or '',
-                f"{min_bedrooms} bedrooms" if min_bedrooms else '',
-                f"{min_bathrooms} bathrooms" if min_bathrooms else '',
-                f"${min_price}-${max_price}" if min_price and max_price else '',
-                "For Sale" if is_for_sale else '',
-                "For Rent" if is_for_rent else ''
-            ]).strip()
-            
-            # Save to search history
-            search_history = SearchHistory(
-                user_id=user_id,
-                search_query=search_query,
-                search_params=search_params
-            )
-            
-            db.session.add(search_history)
-            db.session.commit()
+            search_history_buffer.record(user_id, filters, _describe(filters))
+        
+        properties = [row_to_dict(row, fields) for row in result.items] if fields \
+            else documents_for_rows(result.items)
+        if keyword and request.args.get('snippets', '').lower() == 'true':
+            attach_snippets(properties, keyword)
+        if filters.near is not None:
+            attach_distances(properties, filters.near)
         
         return jsonify({
-            'properties': [prop.to_dict() for prop in results],
-            'total': total,
-            'pages': pages,
+            'properties': properties,
+            'total': result.total,
+            'total_is_estimate': result.estimated,
+            'pages': result.pages,
             'page': page,
+            'has_more': result.has_more,
             'search_params': search_params
         }), 200
     except Exception as e:
@@ -104,6 +105,81 @@ def search():
             'message': str(e)
         }), 500
 
+# Add OPTIONS handler for facet counts
+@search_bp.route('/facets', methods=['OPTIONS'])
+def options_search_facets():
+    return '', 200
+
+@search_bp.route('/facets', methods=['GET'])
+def get_search_facets():
+    """Listing counts per parish, type, bedrooms and price band for a search"""
+    try:
+        filters = SearchFilters.from_args(request.args)
+    except InvalidSearch as e:
+        return jsonify({'error': 'Invalid search', 'message': str(e)}), 400
+    try:
+        facets = search_facets(filters)
+        return jsonify({**facets, 'search_params': filters.to_params()}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'Facet counts failed',
+            'message': str(e)
+        }), 500
+
+# Add OPTIONS handler for typeahead suggestions
+@search_bp.route('/suggest', methods=['OPTIONS'])
+def options_search_suggest():
+    return '', 200
+
+@search_bp.route('/suggest', methods=['GET'])
+def get_search_suggestions():
+    """Ranked completions for cities, parishes, addresses and titles as the user types"""
+    text = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+    types = tuple(t.strip() for t in request.args.get('types', ','.join(SUGGEST_TYPES)).split(',') if t.strip())
+    unknown = [t for t in types if t not in SUGGEST_TYPES]
+    if unknown or not types:
+        return jsonify({
+            'error': 'Invalid search',
+            'message': f"types must be a comma separated subset of {', '.join(SUGGEST_TYPES)}"
+        }), 400
+
+    try:
+        suggestions = suggest(text, types, limit)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'Suggestions failed',
+            'message': str(e)
+        }), 500
+
+    response = jsonify({'query': text, 'suggestions': suggestions})
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config.get('SEARCH_SUGGEST_MAX_AGE', 60)}"
+    return response, 200
+
+# Add OPTIONS handler for popular searches
+@search_bp.route('/popular', methods=['OPTIONS'])
+def options_popular_searches():
+    return '', 200
+
+@search_bp.route('/popular', methods=['GET'])
+def get_popular_searches():
+    """Most run searches across all users, from the compacted search aggregates"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    try:
+        searches = popular_searches(limit=limit)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'Popular searches failed',
+            'message': str(e)
+        }), 500
+
+    response = jsonify({'searches': [s.to_dict() for s in searches]})
+    response.headers['Cache-Control'] = f"public, max-age={current_app.config.get('SEARCH_POPULAR_MAX_AGE', 300)}"
+    return response, 200
+
 # Add OPTIONS handler for search history
 @search_bp.route('/search-history', methods=['OPTIONS'])
 def options_search_history():
@@ -147,7 +223,7 @@ def get_similar_properties(prop_id):
         similar_properties = find_similar_properties(property, limit=limit)
         
         return jsonify({
-            'similar_properties': [p.to_dict() for p in similar_properties]
+            'similar_properties': [serialize_property(p) for p in similar_properties]
         }), 200
     except Exception as e:
         return jsonify({
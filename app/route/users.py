@@ -4,6 +4,7 @@ from app.models.user import User
 from app.utils.validators import validate_email, validate_password
 from app import db
 from app.models.property import SavedProperty, Property
+from app.utils.json_provider import stream_json_array
 
 users_bp = Blueprint('users', __name__)
 
@@ -11,17 +12,12 @@ users_bp = Blueprint('users', __name__)
 def get_users():
     """Get a list of all users"""
     try:
-        # This is a placeholder - implement according to your data access pattern
-        users = User.query.all()
-        
-        # Convert users to a list of dictionaries
-        users_list = [user.to_dict() for user in users]
-        
-        return jsonify({
-            'success': True,
-            'users': users_list
-        }), 200
+        # Streamed from a server-side cursor so memory stays flat
+        users = User.query.order_by(User.user_id)
+        return stream_json_array(users, lambda user: user.to_dict(),
+                                 key='users', envelope={'success': True})
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'message': f'Error retrieving users: {str(e)}'
@@ -345,6 +345,7 @@ def insert_listing(cursor, listing):
             (listing['prop_id'], img['image_url'], img['is_primary'])
         )
 
+    # A trigger on property_amenities updates properties.amenity_bits
     for amenity_id in listing['amenities']:
         cursor.execute(
             "INSERT INTO property_amenities (prop_id, amen_id) VALUES (%s, %s) ON CONFLICT DO NOTHING;",
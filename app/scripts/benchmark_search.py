@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Search Benchmark
+
+Runs the same random /api/search filter combinations through the SQL path
+and the in-memory listing index, checks that both return the same page and
+prints latency percentiles for each.
+
+Usage:
+    FLASK_CONFIG=development python app/scripts/benchmark_search.py [--runs 200] [--per-page 10]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+# Add the project root to the path so the app package can be imported
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from app import create_app
+from app.models.property import Property, Parish, PropertyType, Amenity
+from app.services.listing_index import listing_index
+from app.services.search_cache import search_cache
+from app.services.search_query import SearchFilters
+from app.services.search_service import search_properties
+
+
+def random_params(parish_ids, type_ids, amenity_ids, prices):
+    """Builds a random combination of the filters /api/search accepts"""
+    params = {}
+    if random.random() < 0.5:
+        params['min_price'] = random.choice(prices)
+    if random.random() < 0.3:
+        params['max_price'] = params.get('min_price', 0) + random.choice(prices)
+    if parish_ids and random.random() < 0.5:
+        params['parish_id'] = random.choice(parish_ids)
+    if type_ids and random.random() < 0.4:
+        params['property_type_id'] = random.choice(type_ids)
+    if random.random() < 0.4:
+        params['min_bedrooms'] = random.randint(1, 4)
+    if random.random() < 0.3:
+        params['is_for_sale'] = True
+    if amenity_ids and random.random() < 0.4:
+        params['amenities'] = [str(amen_id) for amen_id in random.sample(amenity_ids, min(len(amenity_ids), random.randint(1, 3)))]
+    params['sort_by'] = random.choice(['newest', 'price', 'price_per_sqft'])
+    params['sort_order'] = random.choice(['asc', 'desc'])
+    return params
+
+
+def timed(params, page, per_page):
+    started = time.perf_counter()
+    result = search_properties(SearchFilters.from_params(params), page=page, per_page=per_page)
+    return (time.perf_counter() - started) * 1000, [row.prop_id for row in result.items], result.total
+
+
+def summarize(label, timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) >= 20 else timings[-1]
+    print(f"{label:<8} p50={statistics.median(timings):8.2f}ms  p95={p95:8.2f}ms  max={timings[-1]:8.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare SQL and in-memory search latency')
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--per-page', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    app = create_app(os.environ.get('FLASK_CONFIG', 'development'))
+
+    with app.app_context():
+        parish_ids = [row[0] for row in Parish.query.with_entities(Parish.parish_id)]
+        type_ids = [row[0] for row in PropertyType.query.with_entities(PropertyType.type_id)]
+        amenity_ids = [row[0] for row in Amenity.query.with_entities(Amenity.amen_id) if row[0] <= 63]
+        prices = sorted(float(row[0]) for row in Property.query.with_entities(Property.price).limit(1000))
+        if not prices:
+            print("No listings to search")
+            return
+
+        # Measure the queries themselves, not cached results
+        search_cache.enabled = False
+        
+        started = time.perf_counter()
+        listing_index.enabled = True
+        listing_index.rebuild()
+        print(f"Indexed {listing_index.size} listings in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+        sql_timings, index_timings, mismatches = [], [], 0
+        for _ in range(args.runs):
+            params = random_params(parish_ids, type_ids, amenity_ids, prices)
+            page = random.randint(1, 3)
+
+            listing_index.enabled = False
+            sql_ms, sql_ids, sql_total = timed(params, page, args.per_page)
+            listing_index.enabled = True
+            index_ms, index_ids, index_total = timed(params, page, args.per_page)
+
+            sql_timings.append(sql_ms)
+            index_timings.append(index_ms)
+            # Pages can differ only in the order of listings with equal sort keys
+            if sql_total != index_total or set(sql_ids) != set(index_ids):
+                mismatches += 1
+
+        print(f"{args.runs} searches, {args.per_page} per page")
+        summarize('SQL', sql_timings)
+        summarize('index', index_timings)
+        print(f"Result mismatches: {mismatches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+# app/services/amenity_filter.py
+from app import db
+from app.models.property import Property, property_amenities
+from app.services.reference_data import reference_data
+from app.utils.amenity_bits import amenity_mask, has_amenity_bit
+
+
+def resolve_amenity_terms(terms):
+    """
+    Resolve requested amenities (ids or names) to groups of amenity ids
+    using the in-memory reference data. A name matches every amenity whose
+    name contains it, as the previous ILIKE '%name%' filter did.
+    Returns a list of frozensets, one per distinct term; an empty set means
+    the term matches no amenity.
+    """
+    groups = []
+    for term in terms:
+        term = str(term).strip()
+        if not term:
+            continue
+        try:
+            group = frozenset([int(term)])
+        except ValueError:
+            group = frozenset(reference_data.search_ids('amenities', term))
+        if group not in groups:
+            groups.append(group)
+    return groups
+
+
+def amenity_predicate(terms):
+    """
+    Build one predicate requiring a listing to have every requested amenity.
+
+    Amenities with a bit in properties.amenity_bits are matched on the row
+    itself: all single-amenity terms collapse into one
+
+        amenity_bits & mask = mask
+
+    and a name that matched several amenities becomes
+    amenity_bits & its_mask <> 0. Terms involving amenities without a bit
+    fall back to a single grouped subquery over property_amenities (see
+    _junction_predicate). Returns None when there is nothing to filter on.
+    """
+    groups = resolve_amenity_terms(terms)
+    if not groups:
+        return None
+    if any(not group for group in groups):
+        # A name that matches no amenity cannot be satisfied
+        return db.false()
+
+    required = 0
+    conditions = []
+    junction_groups = []
+    for group in groups:
+        if not all(has_amenity_bit(amen_id) for amen_id in group):
+            junction_groups.append(group)
+        elif len(group) == 1:
+            required |= amenity_mask(group)
+        else:
+            conditions.append(Property.amenity_bits.op('&')(amenity_mask(group)) != 0)
+
+    if required:
+        conditions.insert(0, Property.amenity_bits.op('&')(required) == required)
+    if junction_groups:
+        conditions.append(_junction_predicate(junction_groups))
+
+    return conditions[0] if len(conditions) == 1 else db.and_(*conditions)
+
+
+def _junction_predicate(groups):
+    """
+    Match groups of amenity ids with one grouped subquery:
+
+        prop_id IN (SELECT prop_id FROM property_amenities
+                    WHERE amen_id IN (...all candidate ids...)
+                    GROUP BY prop_id
+                    HAVING count(DISTINCT amen_id) = n)
+
+    When a group holds several ids, the HAVING clause instead requires,
+    per group, that at least one of its ids is present.
+    """
+    candidate_ids = sorted(set().union(*groups))
+    amen_id = property_amenities.c.amen_id
+
+    if all(len(group) == 1 for group in groups):
+        having = db.func.count(db.distinct(amen_id)) == len(groups)
+    else:
+        having = db.and_(*[
+            db.func.max(db.case((amen_id.in_(sorted(group)), 1), else_=0)) == 1
+            for group in groups
+        ])
+
+    matching = (
+        db.select(property_amenities.c.prop_id)
+        .where(amen_id.in_(candidate_ids))
+        .group_by(property_amenities.c.prop_id)
+        .having(having)
+    )
+    return Property.prop_id.in_(matching)
@@ -0,0 +1,49 @@
+# app/services/geo_search.py
+from flask import current_app
+from app import db
+from app.models.property import Property
+from app.utils.geo import EARTH_RADIUS_KM, cell_ranges, haversine_km, radius_bbox
+
+
+def bbox_predicate(min_lat, min_lon, max_lat, max_lon):
+    """
+    Listings inside a bounding box. Boxes spanning up to
+    SEARCH_GEO_MAX_CELL_ROWS grid rows are first narrowed to runs of
+    geo_cell through its btree index; larger boxes are not selective enough
+    to gain from it and only test the coordinates.
+    """
+    predicates = [
+        Property.latitude.between(min_lat, max_lat),
+        Property.longitude.between(min_lon, max_lon),
+    ]
+    ranges = cell_ranges(min_lat, min_lon, max_lat, max_lon)
+    if len(ranges) <= current_app.config.get('SEARCH_GEO_MAX_CELL_ROWS', 40):
+        predicates.insert(0, db.or_(*[Property.geo_cell.between(first, last) for first, last in ranges]))
+    return db.and_(*predicates)
+
+
+def distance_km(lat, lon):
+    """Great-circle (haversine) distance in km from a point to each listing, NULL without coordinates"""
+    radians = db.func.radians
+    a = db.func.power(db.func.sin(radians(Property.latitude - lat) / 2), 2) + \
+        db.func.cos(radians(lat)) * db.func.cos(radians(Property.latitude)) * \
+        db.func.power(db.func.sin(radians(Property.longitude - lon) / 2), 2)
+    # Not least(a, 1.0): it skips NULLs, which would give listings without
+    # coordinates half the circumference instead of no distance
+    return 2 * EARTH_RADIUS_KM * db.func.asin(db.func.sqrt(db.case((a > 1.0, 1.0), else_=a)))
+
+
+def radius_predicate(lat, lon, radius_km):
+    """Listings within radius_km of a point: the circle's bounding box, then the exact distance"""
+    return db.and_(bbox_predicate(*radius_bbox(lat, lon, radius_km)), distance_km(lat, lon) <= radius_km)
+
+
+def attach_distances(documents, near):
+    """Add a 'distance_km' key to serialized listings (dicts with latitude and longitude)"""
+    lat, lon = near
+    for document in documents:
+        if document.get('latitude') is not None and document.get('longitude') is not None:
+            document['distance_km'] = round(float(haversine_km(lat, lon, document['latitude'], document['longitude'])), 3)
+        else:
+            document['distance_km'] = None
+    return documents
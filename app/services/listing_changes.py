@@ -0,0 +1,55 @@
+# app/services/listing_changes.py
+import logging
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.models.property import Property, PropertyImage
+
+logger = logging.getLogger(__name__)
+
+_callbacks = []
+
+
+def on_listings_changed(callback):
+    """
+    Register callback(prop_ids) to run after a commit that inserted,
+    updated or deleted listings (or their images) through the ORM.
+    Can be used as a decorator.
+    """
+    _callbacks.append(callback)
+    return callback
+
+
+def _changed_prop_ids(session):
+    prop_ids = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Property):
+            prop_ids.add(obj.prop_id)
+        elif isinstance(obj, PropertyImage):
+            prop_ids.add(obj.prop_id)
+    return prop_ids
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_listing_changes(session, flush_context):
+    # session.new/dirty/deleted still describe the flushed objects here,
+    # and new listings already have their ids
+    changed = _changed_prop_ids(session)
+    if changed:
+        session.info.setdefault('changed_listings', set()).update(changed)
+
+
+@event.listens_for(Session, 'after_commit')
+def _notify_listing_changes(session):
+    changed = session.info.pop('changed_listings', None)
+    if not changed:
+        return
+    for callback in _callbacks:
+        try:
+            callback(changed)
+        except Exception as e:
+            logger.error(f"Listing change callback {callback.__name__} failed: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_listing_changes(session):
+    session.info.pop('changed_listings', None)
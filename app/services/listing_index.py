@@ -0,0 +1,332 @@
+# app/services/listing_index.py
+import logging
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+import numpy as np
+from app import db
+from app.models.property import Property
+from app.services.amenity_filter import resolve_amenity_terms
+from app.services.listing_changes import on_listings_changed
+from app.utils.amenity_bits import amenity_mask, has_amenity_bit
+from app.utils.geo import haversine_km
+
+logger = logging.getLogger(__name__)
+
+
+# Columns loaded for every listing: name -> (SQL column, numpy dtype, value for NULL)
+def _indexed_columns():
+    return {
+        'price': (Property.price, np.float64, np.nan),
+        'bedrooms': (Property.bedrooms, np.float64, np.nan),
+        'bathrooms': (Property.bathrooms, np.float64, np.nan),
+        'area_sqft': (Property.area_sqft, np.float64, np.nan),
+        'parish_id': (Property.parish_id, np.int64, -1),
+        'property_type_id': (Property.property_type_id, np.int64, -1),
+        # Flags are 1/0, and -1 for NULL, which matches neither true nor false in SQL
+        'is_for_sale': (Property.is_for_sale, np.int8, -1),
+        'is_for_rent': (Property.is_for_rent, np.int8, -1),
+        'amenity_bits': (Property.amenity_bits, np.int64, 0),
+        'created_at': (Property.created_at, 'datetime64[us]', None),
+        'latitude': (Property.latitude, np.float64, np.nan),
+        'longitude': (Property.longitude, np.float64, np.nan),
+        'city': (db.func.lower(Property.city), np.str_, ''),
+    }
+
+
+# An immutable generation of the index; searches read whichever snapshot
+# is current while a refresh builds the next one
+Snapshot = namedtuple('Snapshot', ['ids', 'columns', 'positions', 'watermark'])
+
+# Search sort -> column it is ordered by ('distance' is computed per search)
+SORT_COLUMNS = {'newest': 'created_at', 'price': 'price', 'price_per_sqft': 'price_per_sqft'}
+
+
+class ListingIndex:
+    """
+    Every listing held in process as NumPy column arrays.
+
+    Search filters are evaluated as vectorized boolean masks and sorts as
+    an argsort, so a search costs no SQL until the final page is hydrated
+    by prop_id. Searches the index cannot answer (keywords, owner, agent or
+    status filters, amenities without a bit) make search() return None and
+    the caller falls back to SQL.
+
+    The index refreshes incrementally: listings this process changed
+    (on_listings_changed) and listings updated since the newest updated_at
+    already indexed are reloaded, and changed listings that no longer load
+    are removed. The delta reaches LISTING_INDEX_REFRESH_OVERLAP seconds
+    further back so a transaction that committed after a later one is not
+    missed. Refreshes run at most every LISTING_INDEX_REFRESH_INTERVAL
+    seconds, or on the next search after this process commits a listing
+    change. Other workers' deletions never show up in a delta; every
+    LISTING_INDEX_DELETE_CHECK_INTERVAL seconds the row count is compared
+    to catch them.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.refresh_interval = 30
+        self.refresh_overlap = 60
+        self.delete_check_interval = 300
+        self._snapshot = None
+        self._refreshed_at = 0.0
+        self._delete_checked_at = 0.0
+        self._stale = False
+        self._pending = set()
+        self._pending_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('LISTING_INDEX_ENABLED', False)
+        self.refresh_interval = app.config.get('LISTING_INDEX_REFRESH_INTERVAL', 30)
+        self.refresh_overlap = app.config.get('LISTING_INDEX_REFRESH_OVERLAP', 60)
+        self.delete_check_interval = app.config.get('LISTING_INDEX_DELETE_CHECK_INTERVAL', 300)
+        app.extensions['listing_index'] = self
+
+    @property
+    def size(self):
+        return len(self._snapshot.ids) if self._snapshot is not None else 0
+
+    def mark_stale(self, prop_ids=()):
+        with self._pending_lock:
+            self._pending.update(prop_id for prop_id in prop_ids if prop_id is not None)
+        self._stale = True
+
+    # Loading
+
+    def _load(self, query):
+        columns = _indexed_columns()
+        rows = query.with_entities(
+            Property.prop_id, Property.updated_at, *[column for column, _, _ in columns.values()]
+        ).all()
+
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        updated = [row[1] for row in rows if row[1] is not None]
+        arrays = {}
+        for offset, (name, (_, dtype, null)) in enumerate(columns.items(), start=2):
+            values = [row[offset] if row[offset] is not None else null for row in rows]
+            if dtype == np.float64:
+                values = [float(value) for value in values]
+            arrays[name] = np.array(values, dtype=dtype) if rows else np.array([], dtype=dtype)
+
+        area = arrays['area_sqft']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            arrays['price_per_sqft'] = np.where(area > 0, arrays['price'] / area, np.nan)
+        return ids, arrays, max(updated) if updated else None
+
+    def rebuild(self):
+        """Load every listing from scratch"""
+        started = time.perf_counter()
+        ids, arrays, watermark = self._load(Property.query)
+        positions = {prop_id: index for index, prop_id in enumerate(ids.tolist())}
+        self._snapshot = Snapshot(ids, arrays, positions, watermark)
+        self._refreshed_at = self._delete_checked_at = time.monotonic()
+        logger.info(f"Listing index built: {len(ids)} listings in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    def refresh(self):
+        """Apply listings changed since the last refresh"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.rebuild()
+
+        with self._pending_lock:
+            pending, self._pending = self._pending, set()
+        self._stale = False
+        try:
+            self._apply_changes(snapshot, pending)
+        except Exception:
+            # Changed listings are not in any later delta if updated_at did
+            # not move, so keep them for the next attempt
+            with self._pending_lock:
+                self._pending |= pending
+            self._stale = True
+            raise
+
+    def _apply_changes(self, snapshot, pending):
+        query = Property.query
+        if snapshot.watermark is not None:
+            since = snapshot.watermark - timedelta(seconds=self.refresh_overlap)
+            changed = [Property.updated_at >= since]
+            if pending:
+                changed.append(Property.prop_id.in_(pending))
+            query = query.filter(db.or_(*changed))
+        ids, arrays, watermark = self._load(query)
+
+        # Copy the columns, widening string columns so longer values fit
+        columns = {
+            name: array.astype(np.result_type(array, arrays[name]))
+            for name, array in snapshot.columns.items()
+        }
+        all_ids = snapshot.ids
+        positions = dict(snapshot.positions)
+
+        # Changed listings are updated in place, new ones appended
+        known = np.array([prop_id in positions for prop_id in ids.tolist()], dtype=bool)
+        if known.any():
+            targets = np.array([positions[prop_id] for prop_id in ids[known].tolist()])
+            for name, array in arrays.items():
+                columns[name][targets] = array[known]
+        if (~known).any():
+            fresh = ids[~known]
+            for name, array in arrays.items():
+                columns[name] = np.concatenate([columns[name], array[~known]])
+            for prop_id in fresh.tolist():
+                positions[prop_id] = len(positions)
+            all_ids = np.concatenate([all_ids, fresh])
+
+        # Listings changed here that no longer load were deleted
+        deleted = pending - set(ids.tolist())
+        keep = ~np.isin(all_ids, np.fromiter(deleted, dtype=np.int64, count=len(deleted)))
+
+        if time.monotonic() - self._delete_checked_at >= self.delete_check_interval:
+            total = db.session.query(db.func.count(Property.prop_id)).scalar()
+            if total != int(keep.sum()):
+                existing = np.array([row[0] for row in db.session.query(Property.prop_id)], dtype=np.int64)
+                keep &= np.isin(all_ids, existing)
+            self._delete_checked_at = time.monotonic()
+
+        if not keep.all():
+            all_ids = all_ids[keep]
+            columns = {name: array[keep] for name, array in columns.items()}
+            positions = {prop_id: index for index, prop_id in enumerate(all_ids.tolist())}
+
+        if watermark is None or (snapshot.watermark is not None and snapshot.watermark > watermark):
+            watermark = snapshot.watermark
+        self._snapshot = Snapshot(all_ids, columns, positions, watermark)
+        self._refreshed_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Build or refresh the index if it is due; never blocks on a refresh in progress"""
+        if self._snapshot is None:
+            with self._refresh_lock:
+                if self._snapshot is None:
+                    self.rebuild()
+            return
+
+        due = self._stale or time.monotonic() - self._refreshed_at >= self.refresh_interval
+        if due and self._refresh_lock.acquire(blocking=False):
+            try:
+                self.refresh()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Listing index refresh failed: {str(e)}")
+            finally:
+                self._refresh_lock.release()
+
+    # Searching
+
+    def matching(self, filters, snapshot=None):
+        """
+        Boolean mask of listings matching SearchFilters, or None if a
+        filter cannot be evaluated in memory. Mirrors search_query.filter_query().
+        """
+        snapshot = snapshot or self._snapshot
+        if filters.keyword or filters.owner_id is not None or filters.agent_id is not None or filters.status:
+            return None
+
+        c = snapshot.columns
+        mask = np.ones(len(snapshot.ids), dtype=bool)
+
+        if filters.min_price is not None:
+            mask &= c['price'] >= filters.min_price
+        if filters.max_price is not None:
+            mask &= c['price'] <= filters.max_price
+        if filters.parish_id is not None:
+            mask &= c['parish_id'] == filters.parish_id
+        if filters.city:
+            # Plain substring, as the escaped ILIKE in SQL
+            mask &= np.char.find(c['city'], filters.city.lower()) >= 0
+        if filters.property_type_id is not None:
+            mask &= c['property_type_id'] == filters.property_type_id
+        if filters.min_bedrooms is not None:
+            mask &= c['bedrooms'] >= filters.min_bedrooms
+        if filters.min_bathrooms is not None:
+            mask &= c['bathrooms'] >= filters.min_bathrooms
+        if filters.is_for_sale is not None:
+            mask &= c['is_for_sale'] == int(filters.is_for_sale)
+        if filters.is_for_rent is not None:
+            mask &= c['is_for_rent'] == int(filters.is_for_rent)
+        if filters.bbox is not None:
+            min_lon, min_lat, max_lon, max_lat = filters.bbox
+            mask &= (c['latitude'] >= min_lat) & (c['latitude'] <= max_lat)
+            mask &= (c['longitude'] >= min_lon) & (c['longitude'] <= max_lon)
+        if filters.near is not None and filters.radius_km is not None:
+            with np.errstate(invalid='ignore'):
+                mask &= haversine_km(*filters.near, c['latitude'], c['longitude']) <= filters.radius_km
+
+        if filters.amenities:
+            groups = resolve_amenity_terms(filters.amenities)
+            if any(not has_amenity_bit(amen_id) for group in groups for amen_id in group):
+                return None
+            bits = c['amenity_bits']
+            for group in groups:
+                group_mask = amenity_mask(group)
+                if len(group) == 1:
+                    mask &= (bits & group_mask) == group_mask
+                else:
+                    mask &= (bits & group_mask) != 0
+
+        return mask
+
+    def select(self, filters, names):
+        """
+        The given columns of every listing matching SearchFilters, or None
+        if the filters have to go to SQL
+        """
+        if not self.enabled:
+            return None
+
+        self.ensure_fresh()
+        snapshot = self._snapshot
+        mask = self.matching(filters, snapshot)
+        if mask is None:
+            return None
+        return {name: snapshot.columns[name][mask] for name in names}
+
+    def search(self, filters, page=1, per_page=10):
+        """
+        Run a search (SearchFilters) in memory.
+        Returns (prop_ids of the page in order, total) or None if the
+        search has to go to SQL.
+        """
+        if not self.enabled:
+            return None
+        sort = filters.effective_sort
+        sort_column = SORT_COLUMNS.get(sort)
+        if sort_column is None and sort != 'distance':
+            return None
+
+        self.ensure_fresh()
+        snapshot = self._snapshot
+        mask = self.matching(filters, snapshot)
+        if mask is None:
+            return None
+
+        hits = np.flatnonzero(mask)
+        total = len(hits)
+        start = max(page - 1, 0) * per_page
+        if start >= total:
+            return [], total
+
+        # Sort by the key, then prop_id so equal keys page deterministically
+        if sort == 'distance':
+            key = haversine_km(*filters.near, snapshot.columns['latitude'][hits], snapshot.columns['longitude'][hits])
+        else:
+            key = snapshot.columns[sort_column][hits]
+        order = np.lexsort((snapshot.ids[hits], key))
+        if filters.sort_order == 'desc':
+            order = order[::-1]
+        if key.dtype == np.float64:
+            # Missing values (NaN) go last either way, like NULLS LAST in SQL
+            missing = np.isnan(key[order])
+            order = np.concatenate([order[~missing], order[missing]])
+        page_rows = hits[order[start:start + per_page]]
+        return snapshot.ids[page_rows].tolist(), total
+
+
+listing_index = ListingIndex()
+on_listings_changed(listing_index.mark_stale)
@@ -0,0 +1,253 @@
+# app/services/map_clusters.py
+import bisect
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+from app import db
+from app.models.property import Property
+from app.services.listing_changes import on_listings_changed
+
+logger = logging.getLogger(__name__)
+
+
+class ClusterIndex:
+    """
+    Map marker clusters for every listing with coordinates, precomputed in
+    process for each zoom level from PROPERTY_CLUSTER_MIN_ZOOM to
+    PROPERTY_CLUSTER_MAX_ZOOM.
+
+    At zoom z the map is cut into square cells of 360 / 2**z /
+    PROPERTY_CLUSTER_CELLS_PER_TILE degrees (a few cells per 256px tile;
+    plain latitude/longitude cells, which is close enough to the map's
+    projection at Jamaica's latitude). Each cell keeps its coordinate sums
+    and a sorted list of (price, prop_id), so count, centroid, minimum and
+    median price are read without touching the database, and a listing
+    write only moves that listing between cells. Listings this process
+    changes (on_listings_changed) are re-read on the next request; other
+    workers' changes are picked up every PROPERTY_CLUSTER_REFRESH_INTERVAL
+    seconds from updated_at, as in ListingIndex.
+    """
+
+    def __init__(self, app=None):
+        self.min_zoom = 6
+        self.max_zoom = 16
+        self.cells_per_tile = 4
+        self.refresh_interval = 30
+        self.refresh_overlap = 60
+        self._cells = {}  # zoom -> {(row, column): {'lat_sum', 'lon_sum', 'prices'}}
+        self._listings = {}  # prop_id -> (lat, lon, price), None without coordinates
+        self._pending = set()
+        self._watermark = None
+        self._loaded = False
+        self._refreshed_at = 0.0
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_zoom = app.config.get('PROPERTY_CLUSTER_MIN_ZOOM', 6)
+        self.max_zoom = app.config.get('PROPERTY_CLUSTER_MAX_ZOOM', 16)
+        self.cells_per_tile = app.config.get('PROPERTY_CLUSTER_CELLS_PER_TILE', 4)
+        self.refresh_interval = app.config.get('PROPERTY_CLUSTER_REFRESH_INTERVAL', 30)
+        self.refresh_overlap = app.config.get('PROPERTY_CLUSTER_REFRESH_OVERLAP', 60)
+        app.extensions['map_clusters'] = self
+
+    def mark_changed(self, prop_ids):
+        with self._lock:
+            self._pending.update(prop_id for prop_id in prop_ids if prop_id is not None)
+
+    def clamp_zoom(self, zoom):
+        return min(max(zoom, self.min_zoom), self.max_zoom)
+
+    def cell_degrees(self, zoom):
+        return 360 / (2 ** zoom * self.cells_per_tile)
+
+    def _cell(self, zoom, lat, lon):
+        size = self.cell_degrees(zoom)
+        return math.floor((lat + 90) / size), math.floor((lon + 180) / size)
+
+    # Loading
+
+    @staticmethod
+    def _load(query):
+        rows = query.with_entities(
+            Property.prop_id, Property.updated_at, Property.latitude, Property.longitude, Property.price
+        ).all()
+        listings = {
+            prop_id: (float(lat), float(lon), float(price or 0))
+            if lat is not None and lon is not None else None
+            for prop_id, _, lat, lon, price in rows
+        }
+        updated = [row[1] for row in rows if row[1] is not None]
+        return listings, max(updated) if updated else None
+
+    def rebuild(self):
+        """Load every listing from scratch"""
+        started = time.perf_counter()
+        listings, watermark = self._load(Property.query)
+
+        cells = {zoom: {} for zoom in range(self.min_zoom, self.max_zoom + 1)}
+        for prop_id, point in listings.items():
+            if point is None:
+                continue
+            lat, lon, price = point
+            for zoom, zoom_cells in cells.items():
+                cell = zoom_cells.setdefault(self._cell(zoom, lat, lon), {'lat_sum': 0.0, 'lon_sum': 0.0, 'prices': []})
+                cell['lat_sum'] += lat
+                cell['lon_sum'] += lon
+                cell['prices'].append((price, prop_id))
+        for zoom_cells in cells.values():
+            for cell in zoom_cells.values():
+                cell['prices'].sort()
+
+        with self._lock:
+            self._cells, self._listings = cells, listings
+            self._watermark = watermark
+            self._loaded = True
+            self._refreshed_at = time.monotonic()
+        logger.info(f"Map clusters built: {len(listings)} listings in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    def _move(self, prop_id, point, sign):
+        """Add (sign 1) or remove (sign -1) a listing's point in every zoom level"""
+        lat, lon, price = point
+        for zoom, zoom_cells in self._cells.items():
+            key = self._cell(zoom, lat, lon)
+            if sign > 0:
+                cell = zoom_cells.setdefault(key, {'lat_sum': 0.0, 'lon_sum': 0.0, 'prices': []})
+                bisect.insort(cell['prices'], (price, prop_id))
+            else:
+                cell = zoom_cells.get(key)
+                if cell is None:
+                    continue
+                index = bisect.bisect_left(cell['prices'], (price, prop_id))
+                if index < len(cell['prices']) and cell['prices'][index] == (price, prop_id):
+                    del cell['prices'][index]
+                if not cell['prices']:
+                    del zoom_cells[key]
+                    continue
+            cell['lat_sum'] += sign * lat
+            cell['lon_sum'] += sign * lon
+
+    def _apply(self, prop_id, point):
+        """Replace one listing's point (None removes it from the map)"""
+        old = self._listings.get(prop_id)
+        if old == point:
+            return
+        if old is not None:
+            self._move(prop_id, old, -1)
+        if point is not None:
+            self._move(prop_id, point, 1)
+        self._listings[prop_id] = point
+
+    def refresh(self):
+        """Re-read listings changed here, and every interval those changed since the watermark"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        due = time.monotonic() - self._refreshed_at >= self.refresh_interval
+
+        changed = []
+        if pending:
+            changed.append(Property.prop_id.in_(pending))
+        if due and self._watermark is None:
+            # Nothing indexed yet, so every listing is new
+            changed.append(db.true())
+        elif due:
+            changed.append(Property.updated_at >= self._watermark - timedelta(seconds=self.refresh_overlap))
+        try:
+            if changed:
+                listings, watermark = self._load(Property.query.filter(db.or_(*changed)))
+            else:
+                listings, watermark = {}, None
+        except Exception:
+            # Listings changed here may not be in any later delta, so keep
+            # them for the next attempt
+            with self._lock:
+                self._pending |= pending
+            raise
+
+        with self._lock:
+            for prop_id, point in listings.items():
+                self._apply(prop_id, point)
+            # Pending listings that no longer load were deleted
+            for prop_id in pending - listings.keys():
+                self._apply(prop_id, None)
+                self._listings.pop(prop_id, None)
+            if watermark is not None and (self._watermark is None or watermark > self._watermark):
+                self._watermark = watermark
+
+        if due:
+            # Deleted listings never show up in a delta, so compare counts
+            total = db.session.query(db.func.count(Property.prop_id)).scalar()
+            if total != len(self._listings):
+                existing = {row[0] for row in db.session.query(Property.prop_id)}
+                with self._lock:
+                    for prop_id in list(self._listings.keys() - existing):
+                        self._apply(prop_id, None)
+                        self._listings.pop(prop_id, None)
+            self._refreshed_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Build or refresh the clusters if due; never blocks on a refresh in progress"""
+        if not self._loaded:
+            with self._refresh_lock:
+                if not self._loaded:
+                    self.rebuild()
+            return
+
+        due = self._pending or time.monotonic() - self._refreshed_at >= self.refresh_interval
+        if due and self._refresh_lock.acquire(blocking=False):
+            try:
+                self.refresh()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Map cluster refresh failed: {str(e)}")
+            finally:
+                self._refresh_lock.release()
+
+    # Lookup
+
+    @staticmethod
+    def _summary(cell):
+        prices = cell['prices']
+        count = len(prices)
+        middle = count // 2
+        median = prices[middle][0] if count % 2 else (prices[middle - 1][0] + prices[middle][0]) / 2
+        cluster = {
+            'count': count,
+            'latitude': round(cell['lat_sum'] / count, 6),
+            'longitude': round(cell['lon_sum'] / count, 6),
+            'min_price': prices[0][0],
+            'median_price': median,
+        }
+        if count == 1:
+            cluster['prop_id'] = prices[0][1]
+        return cluster
+
+    def clusters(self, zoom, bbox=None):
+        """
+        Clusters of the cells at zoom (clamped to the precomputed levels)
+        overlapping bbox (min_lon, min_lat, max_lon, max_lat; the whole map
+        by default). Returns (zoom used, list of cluster dicts).
+        """
+        self.ensure_fresh()
+        zoom = self.clamp_zoom(zoom)
+        min_lon, min_lat, max_lon, max_lat = bbox or (-180.0, -90.0, 180.0, 90.0)
+        first_row, first_column = self._cell(zoom, min_lat, min_lon)
+        last_row, last_column = self._cell(zoom, max_lat, max_lon)
+        rows, columns = range(first_row, last_row + 1), range(first_column, last_column + 1)
+
+        with self._lock:
+            cells = self._cells.get(zoom, {})
+            # Walk whichever is smaller: the box's cells or the occupied ones
+            if len(rows) * len(columns) < len(cells):
+                keys = [(row, column) for row in rows for column in columns if (row, column) in cells]
+            else:
+                keys = sorted(key for key in cells if key[0] in rows and key[1] in columns)
+            return zoom, [self._summary(cells[key]) for key in keys]
+
+
+cluster_index = ClusterIndex()
+on_listings_changed(cluster_index.mark_changed)
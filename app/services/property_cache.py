@@ -0,0 +1,250 @@
+# app/services/property_cache.py
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from app import db
+from app.models.property import Property, PropertyImage
+from app.models.user import User
+from app.services.property_loader import with_profile
+
+try:
+    import redis
+except ImportError:  # The shared backend is optional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+def _version(updated_at, owner_updated_at=None, image_count=0):
+    """
+    Build the cache version of a serialized listing. Images added outside
+    the ORM (the scraper) do not bump updated_at, so their count is part of
+    the version.
+    """
+    version = updated_at.isoformat() if updated_at else ''
+    if owner_updated_at:
+        version += '|' + owner_updated_at.isoformat()
+    return f'{version}#{image_count or 0}'
+
+
+class PropertyDocumentCache:
+    """
+    Cache of Property.to_dict() documents keyed by prop_id and versioned by
+    updated_at and image count (plus the owner's updated_at for documents
+    that embed it).
+
+    Documents live in an in-process LRU and, when CACHE_REDIS_URL is set, in
+    a shared Redis backend so every worker benefits from a serialization.
+    A document whose version no longer matches is treated as a miss, so any
+    write that bumps updated_at invalidates it everywhere. Both tiers expire
+    entries after PROPERTY_CACHE_TTL seconds, which bounds how long a write
+    that changes neither (a raw SQL update) can go unseen.
+    """
+
+    def __init__(self, app=None):
+        self.max_size = 2048
+        self.ttl = 3600
+        self.enabled = True
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PROPERTY_CACHE_ENABLED', True)
+        self.max_size = app.config.get('PROPERTY_CACHE_SIZE', 2048)
+        self.ttl = app.config.get('PROPERTY_CACHE_TTL', 3600)
+
+        redis_url = app.config.get('CACHE_REDIS_URL')
+        if redis_url and redis is not None:
+            self._shared = redis.Redis.from_url(redis_url)
+        elif redis_url:
+            logger.warning("CACHE_REDIS_URL is set but the redis package is not installed")
+
+        app.extensions['property_cache'] = self
+
+    @staticmethod
+    def _key(prop_id, include_owner):
+        return f"property:doc:{prop_id}:{'owner' if include_owner else 'base'}"
+
+    def get(self, prop_id, version, include_owner=False):
+        if not self.enabled:
+            return None
+
+        key = self._key(prop_id, include_owner)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                cached_version, document, expires_at = entry
+                if cached_version == version and time.monotonic() < expires_at:
+                    self._local.move_to_end(key)
+                    return document
+                del self._local[key]
+
+        if self._shared is not None:
+            try:
+                raw = self._shared.get(key)
+            except redis.RedisError as e:
+                logger.warning(f"Property cache backend unavailable: {str(e)}")
+                return None
+            if raw:
+                cached = json.loads(raw)
+                if cached.get('v') == version:
+                    self._store_local(key, version, cached['doc'])
+                    return cached['doc']
+        return None
+
+    def set(self, prop_id, version, document, include_owner=False):
+        if not self.enabled:
+            return
+
+        key = self._key(prop_id, include_owner)
+        self._store_local(key, version, document)
+
+        if self._shared is not None:
+            try:
+                self._shared.setex(key, self.ttl, json.dumps({'v': version, 'doc': document}))
+            except redis.RedisError as e:
+                logger.warning(f"Property cache backend unavailable: {str(e)}")
+
+    def _store_local(self, key, version, document):
+        with self._lock:
+            self._local[key] = (version, document, time.monotonic() + self.ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def invalidate(self, prop_id):
+        """Drop every cached document of a listing"""
+        keys = [self._key(prop_id, False), self._key(prop_id, True)]
+        with self._lock:
+            for key in keys:
+                self._local.pop(key, None)
+
+        if self._shared is not None:
+            try:
+                self._shared.delete(*keys)
+            except redis.RedisError as e:
+                logger.warning(f"Property cache backend unavailable: {str(e)}")
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+property_cache = PropertyDocumentCache()
+
+
+def serialize_property(prop, include_owner=False):
+    """Property.to_dict() served from the document cache"""
+    owner_updated_at = prop.owner.updated_at if include_owner and prop.owner else None
+    version = _version(prop.updated_at, owner_updated_at, len(prop.images))
+
+    document = property_cache.get(prop.prop_id, version, include_owner)
+    if document is None:
+        document = prop.to_dict(include_owner=include_owner)
+        property_cache.set(prop.prop_id, version, document, include_owner)
+
+    # Shallow copy so callers can add keys without touching the cached document
+    return dict(document)
+
+
+class PropertyVersion(namedtuple('PropertyVersion', ['prop_id', 'updated_at', 'owner_updated_at', 'image_count'])):
+    """Everything the serialized detail document depends on"""
+
+    @property
+    def cache_version(self):
+        return _version(self.updated_at, self.owner_updated_at, self.image_count)
+
+    @property
+    def etag(self):
+        raw = f"{self.prop_id}:{self.cache_version}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @property
+    def last_modified(self):
+        stamps = [stamp for stamp in (self.updated_at, self.owner_updated_at) if stamp]
+        return max(stamps) if stamps else None
+
+
+def property_version(prop_id):
+    """
+    Look up a listing's version with one indexed query and without loading
+    the listing itself. Returns None if the listing does not exist.
+    """
+    row = db.session.query(
+        Property.updated_at,
+        db.select(User.updated_at)
+            .where(User.user_id == Property.owner_id)
+            .scalar_subquery(),
+        db.select(db.func.count(PropertyImage.image_id))
+            .where(PropertyImage.prop_id == Property.prop_id)
+            .scalar_subquery()
+    ).filter(Property.prop_id == prop_id).first()
+
+    if row is None:
+        return None
+    return PropertyVersion(prop_id, row[0], row[1], row[2] or 0)
+
+
+def detail_document(version):
+    """Serialized detail document (with owner) for a PropertyVersion"""
+    document = property_cache.get(version.prop_id, version.cache_version, include_owner=True)
+    if document is not None:
+        return dict(document)
+
+    prop = with_profile(Property.query, 'detail').filter_by(prop_id=version.prop_id).first()
+    return serialize_property(prop, include_owner=True) if prop else None
+
+
+def version_query(query, include_owner=False, extra=()):
+    """
+    Reduce a Property query to the columns needed to look documents up in
+    the cache: prop_id, updated_at, the image count and, if needed, the
+    owner's updated_at.
+    """
+    columns = [
+        Property.prop_id,
+        Property.updated_at,
+        db.select(db.func.count(PropertyImage.image_id))
+            .where(PropertyImage.prop_id == Property.prop_id)
+            .scalar_subquery()
+            .label('image_count')
+    ]
+    if include_owner:
+        columns.append(
+            db.select(User.updated_at)
+            .where(User.user_id == Property.owner_id)
+            .scalar_subquery()
+            .label('owner_updated_at')
+        )
+    columns.extend(extra)
+    return query.with_entities(*columns)
+
+
+def documents_for_rows(rows, include_owner=False):
+    """
+    Assemble serialized listings for rows produced by version_query(),
+    preserving their order. Listings missing from the cache are loaded with
+    a single profiled query and serialized once.
+    """
+    documents = {}
+    missing = []
+    for row in rows:
+        version = _version(row.updated_at, getattr(row, 'owner_updated_at', None), row.image_count)
+        document = property_cache.get(row.prop_id, version, include_owner)
+        if document is None:
+            missing.append(row.prop_id)
+        else:
+            documents[row.prop_id] = document
+
+    if missing:
+        profile = 'detail' if include_owner else 'card'
+        for prop in with_profile(Property.query, profile).filter(Property.prop_id.in_(missing)):
+            documents[prop.prop_id] = serialize_property(prop, include_owner)
+
+    return [dict(documents[row.prop_id]) for row in rows if row.prop_id in documents]
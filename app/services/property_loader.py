@@ -0,0 +1,48 @@
+# app/services/property_loader.py
+from sqlalchemy.orm import joinedload, selectinload
+from app.models.property import Property
+
+# Loader profiles describing which relationships Property.to_dict() will touch.
+# Many-to-one lookups are joined into the main query, collections are fetched
+# with one extra SELECT ... WHERE prop_id IN (...) each, so the number of
+# queries per page stays constant no matter how many listings are returned.
+LOADER_PROFILES = {
+    # Listing cards and search results: to_dict() without the owner
+    'card': (
+        (joinedload, 'property_type'),
+        (joinedload, 'parish'),
+        (selectinload, 'images'),
+        (selectinload, 'amenities'),
+    ),
+    # Property detail page: to_dict(include_owner=True)
+    'detail': (
+        (joinedload, 'property_type'),
+        (joinedload, 'parish'),
+        (joinedload, 'owner'),
+        (selectinload, 'images'),
+        (selectinload, 'amenities'),
+    ),
+    # Owner/agent dashboards list many listings, each with its owner
+    'owner': (
+        (joinedload, 'property_type'),
+        (joinedload, 'parish'),
+        (selectinload, 'owner'),
+        (selectinload, 'images'),
+        (selectinload, 'amenities'),
+    ),
+}
+
+
+def loader_options(profile='card'):
+    """Return the loader options for a profile"""
+    if profile not in LOADER_PROFILES:
+        raise ValueError(f"Unknown loader profile: {profile}")
+
+    # Options are built on demand so importing this module does not force
+    # mapper configuration before every model has been imported
+    return [strategy(getattr(Property, attr)) for strategy, attr in LOADER_PROFILES[profile]]
+
+
+def with_profile(query, profile='card'):
+    """Apply a loader profile to a Property query"""
+    return query.options(*loader_options(profile))
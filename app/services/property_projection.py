@@ -0,0 +1,103 @@
+# app/services/property_projection.py
+from datetime import datetime
+from decimal import Decimal
+from app import db
+from app.models.property import Property, PropertyType, Parish, PropertyImage
+
+# Fields a client may request through ?fields=, mapped to the SQL expression
+# that produces them. Related names and the primary image are correlated
+# scalar subqueries so a projected page is a single SELECT.
+def _projectable_fields():
+    return {
+        'prop_id': Property.prop_id,
+        'title': Property.title,
+        'description': Property.description,
+        'price': Property.price,
+        'bedrooms': Property.bedrooms,
+        'bathrooms': Property.bathrooms,
+        'area_sqft': Property.area_sqft,
+        'address': Property.address,
+        'city': Property.city,
+        'latitude': Property.latitude,
+        'longitude': Property.longitude,
+        'is_for_sale': Property.is_for_sale,
+        'is_for_rent': Property.is_for_rent,
+        'monthly_rent': Property.monthly_rent,
+        'status': Property.status,
+        'owner_id': Property.owner_id,
+        'agent_id': Property.agent_id,
+        'property_type_id': Property.property_type_id,
+        'parish_id': Property.parish_id,
+        'created_at': Property.created_at,
+        'updated_at': Property.updated_at,
+        'property_type_name': db.select(PropertyType.name)
+            .where(PropertyType.type_id == Property.property_type_id)
+            .scalar_subquery(),
+        'parish_name': db.select(Parish.name)
+            .where(Parish.parish_id == Property.parish_id)
+            .scalar_subquery(),
+        'primary_image': db.select(PropertyImage.image_url)
+            .where(PropertyImage.prop_id == Property.prop_id)
+            .order_by(PropertyImage.is_primary.desc(), PropertyImage.image_id)
+            .limit(1)
+            .scalar_subquery(),
+    }
+
+# Named views selectable with ?view=
+VIEWS = {
+    'card': ('prop_id', 'title', 'price', 'bedrooms', 'bathrooms', 'parish_name', 'primary_image'),
+}
+
+PROJECTABLE_FIELDS = frozenset(_projectable_fields())
+
+
+def requested_fields(args):
+    """
+    Resolve ?view= / ?fields= query arguments to a tuple of field names.
+    Returns None when the client wants the full to_dict() shape.
+    Raises ValueError for an unknown view or field.
+    """
+    view = args.get('view')
+    fields = args.get('fields')
+
+    if view and view != 'full':
+        if view not in VIEWS:
+            raise ValueError(f"Unknown view: {view}")
+        return VIEWS[view]
+
+    if fields:
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in names if name not in PROJECTABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        # prop_id is always returned so clients can link to the listing
+        if 'prop_id' not in names:
+            names.insert(0, 'prop_id')
+        return tuple(dict.fromkeys(names))
+
+    return None
+
+
+def project(query, fields, extra=()):
+    """
+    Replace the entities of a Property query with the requested columns.
+    'extra' columns are selected too (e.g. for keyset cursors) but are not
+    returned by row_to_dict unless they were requested.
+    """
+    expressions = _projectable_fields()
+    names = tuple(dict.fromkeys(tuple(fields) + tuple(extra)))
+    return query.with_entities(*[expressions[name].label(name) for name in names])
+
+
+def _to_json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def row_to_dict(row, fields):
+    """Convert a projected row to a response dictionary"""
+    mapping = row._mapping
+    return {name: _to_json_value(mapping[name]) for name in fields}
@@ -0,0 +1,334 @@
+# app/services/property_similarity.py
+import logging
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models.property import Property, PropertySimilarity
+from app.services.listing_changes import on_listings_changed
+from app.services.property_loader import with_profile
+from app.services.write_behind import WriteBehindBuffer
+from app.utils.amenity_bits import unpack_amenity_bits
+from app.utils.geo import haversine_km
+
+logger = logging.getLogger(__name__)
+
+# Share of the score each attribute contributes; every part is in [0, 1]
+SIMILARITY_WEIGHTS = {
+    'type': 0.30,  # Same property type
+    'location': 0.20,  # Same parish or same city
+    'price': 0.25,  # 1 at the same price, 0 at double or half
+    'bedrooms': 0.10,  # 1 at the same count, 0 three or more apart
+    'amenities': 0.10,  # Jaccard overlap of standard amenities
+    'distance': 0.05,  # 1 at the same spot, 0 at SIMILARITY_DISTANCE_KM
+}
+SIMILARITY_DISTANCE_KM = 25
+
+# Every listing's scoring attributes as NumPy columns, row i is ids[i]
+Features = namedtuple('Features', ['ids', 'positions', 'columns', 'amenities', 'amenity_counts'])
+
+
+def _k():
+    return current_app.config.get('SIMILAR_PROPERTIES_K', 20)
+
+
+def _min_score():
+    return current_app.config.get('SIMILAR_PROPERTIES_MIN_SCORE', 0.5)
+
+
+def _load_features(*criteria):
+    """Scoring attributes of every listing, or of those matching criteria"""
+    rows = db.session.query(
+        Property.prop_id, Property.property_type_id, Property.parish_id, db.func.lower(Property.city),
+        Property.price, Property.bedrooms, Property.latitude, Property.longitude, Property.amenity_bits
+    ).filter(*criteria).order_by(Property.prop_id).all()
+
+    def column(index, dtype, null):
+        return np.array([row[index] if row[index] is not None else null for row in rows], dtype=dtype)
+
+    ids = column(0, np.int64, 0)
+    amenities = unpack_amenity_bits(row[8] or 0 for row in rows).astype(np.int16)
+    return Features(
+        ids=ids,
+        positions={prop_id: index for index, prop_id in enumerate(ids.tolist())},
+        columns={
+            'type': column(1, np.int64, -1),
+            'parish': column(2, np.int64, -1),
+            'city': column(3, np.str_, ''),
+            'price': column(4, np.float64, np.nan),
+            'bedrooms': column(5, np.float64, np.nan),
+            'latitude': column(6, np.float64, np.nan),
+            'longitude': column(7, np.float64, np.nan),
+        },
+        amenities=amenities,
+        amenity_counts=amenities.sum(axis=1),
+    )
+
+
+def _scores(features, index):
+    """Similarity of listing index to every listing (itself -inf), vectorized"""
+    c = features.columns
+    weights = SIMILARITY_WEIGHTS
+
+    score = weights['type'] * ((c['type'] == c['type'][index]) & (c['type'] >= 0))
+    same_parish = (c['parish'] == c['parish'][index]) & (c['parish'] >= 0)
+    same_city = (c['city'] == c['city'][index]) & (c['city'] != '')
+    score = score + weights['location'] * (same_parish | same_city)
+
+    # Missing or unusable values (NaN) score 0 for that attribute
+    with np.errstate(divide='ignore', invalid='ignore'):
+        price_gap = np.abs(np.log(c['price'] / c['price'][index])) / np.log(2)
+        score += weights['price'] * np.nan_to_num(np.clip(1 - price_gap, 0, 1))
+
+        bedroom_gap = np.abs(c['bedrooms'] - c['bedrooms'][index]) / 3
+        score += weights['bedrooms'] * np.nan_to_num(np.clip(1 - bedroom_gap, 0, 1))
+
+        shared = features.amenities @ features.amenities[index]
+        union = features.amenity_counts + features.amenity_counts[index] - shared
+        score += weights['amenities'] * np.where(union > 0, shared / np.maximum(union, 1), 0)
+
+        distance = haversine_km(c['latitude'][index], c['longitude'][index], c['latitude'], c['longitude'])
+        score += weights['distance'] * np.nan_to_num(np.clip(1 - distance / SIMILARITY_DISTANCE_KM, 0, 1))
+
+    score[index] = -np.inf
+    return score
+
+
+def _top_k(features, index, k, scores=None):
+    """[(prop_id, score)] of the k best neighbours, best first (ties by prop_id)"""
+    scores = _scores(features, index) if scores is None else scores
+    count = min(k, len(scores) - 1)
+    if count <= 0:
+        return []
+    top = np.argpartition(-scores, count - 1)[:count]
+    top = top[np.lexsort((features.ids[top], -scores[top]))]
+    return [(int(features.ids[i]), float(scores[i])) for i in top]
+
+
+def _store(features, indices, k, removed=()):
+    """Replace the stored neighbours of the listings at indices (and drop removed listings' rows)"""
+    now = datetime.utcnow()
+    prop_ids = [int(features.ids[index]) for index in indices] + list(removed)
+    rows = [
+        (int(features.ids[index]), rank, similar_id, round(score, 4), now)
+        for index in indices
+        for rank, (similar_id, score) in enumerate(_top_k(features, index, k), start=1)
+    ]
+
+    try:
+        db.session.execute(
+            db.delete(PropertySimilarity).where(PropertySimilarity.prop_id.in_(prop_ids))
+            .execution_options(synchronize_session=False)
+        )
+        if rows:
+            computed = db.values(
+                db.column('prop_id', db.Integer),
+                db.column('rank', db.SmallInteger),
+                db.column('similar_prop_id', db.Integer),
+                db.column('score', db.Float),
+                db.column('computed_at', db.DateTime),
+                name='computed_similarities'
+            ).data(rows)
+            # Listings deleted since the features were loaded are skipped
+            # rather than failing the batch on the foreign key, and rows a
+            # concurrent refresh already stored are kept
+            existing = db.select(Property.prop_id)
+            db.session.execute(
+                pg_insert(PropertySimilarity).from_select(
+                    ['prop_id', 'rank', 'similar_prop_id', 'score', 'computed_at'],
+                    db.select(computed).where(
+                        computed.c.prop_id.in_(existing),
+                        computed.c.similar_prop_id.in_(existing)
+                    )
+                ).on_conflict_do_nothing()
+            )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+
+def rebuild_similarities(batch_size=500):
+    """Recompute the neighbours of every listing; returns the number of listings"""
+    k = _k()
+    features = _load_features()
+    for start in range(0, len(features.ids), batch_size):
+        _store(features, range(start, min(start + batch_size, len(features.ids))), k)
+    logger.info(f"Rebuilt similar properties for {len(features.ids)} listings")
+    return len(features.ids)
+
+
+def _candidate_ids(prop_ids):
+    """
+    Ids of the listings each of prop_ids is scored against outside a full
+    rebuild: up to SIMILARITY_CANDIDATES per listing sharing its type or
+    parish, nearest in price first, in one LATERAL query.
+    """
+    if not prop_ids:
+        return set()
+    target = db.aliased(Property)
+    candidate = db.aliased(Property)
+    nearest = (
+        db.select(candidate.prop_id)
+        .where(
+            candidate.prop_id != target.prop_id,
+            db.or_(candidate.property_type_id == target.property_type_id,
+                   candidate.parish_id == target.parish_id)
+        )
+        .order_by(db.func.abs(candidate.price - target.price).nulls_last(), candidate.prop_id)
+        .limit(current_app.config.get('SIMILARITY_CANDIDATES', 200))
+        .lateral()
+    )
+    rows = db.session.execute(
+        db.select(nearest.c.prop_id)
+        .select_from(target)
+        .join(nearest, db.true())
+        .where(target.prop_id.in_(prop_ids))
+    )
+    return {row[0] for row in rows}
+
+
+def _stored_neighbours(prop_ids):
+    if not prop_ids:
+        return set()
+    rows = db.session.query(PropertySimilarity.similar_prop_id.distinct())\
+        .filter(PropertySimilarity.prop_id.in_(prop_ids))
+    return {row[0] for row in rows}
+
+
+def refresh_similarities(prop_ids, batch_size=500):
+    """
+    Bring stored neighbours up to date after listings changed. Recomputed
+    are the changed listings, listings whose neighbours include one of
+    them, listings a changed listing now outscores the weakest stored
+    neighbour of, and listings left with fewer than k neighbours.
+
+    Only a bounded pool is loaded: the changed listings, their candidates
+    (_candidate_ids), the listings referencing them and the stored
+    neighbours of every listing recomputed. Those neighbours were the best
+    among the unchanged listings, so rescoring against the pool finds the
+    same neighbours a full rebuild would, unless a changed listing drops
+    out and the next best lies outside the pool; the daily rebuild
+    settles those. Listings that have no rows yet are scored once a
+    lookup queues them. Returns the number of listings recomputed.
+    """
+    k = _k()
+    changed = {int(prop_id) for prop_id in prop_ids}
+    referencing = {row[0] for row in db.session.query(PropertySimilarity.prop_id.distinct())
+                   .filter(PropertySimilarity.similar_prop_id.in_(changed))}
+    pool = changed | referencing | _candidate_ids(changed)
+    features = _load_features(Property.prop_id.in_(pool))
+
+    stored = db.session.query(
+        PropertySimilarity.prop_id, db.func.min(PropertySimilarity.score), db.func.count()
+    ).filter(PropertySimilarity.prop_id.in_(pool)).group_by(PropertySimilarity.prop_id)
+
+    affected = changed | referencing
+    # Score a changed listing must beat to enter each listing's neighbours
+    thresholds = np.full(len(features.ids), np.inf)
+    for prop_id, weakest, count in stored:
+        if count < min(k, len(features.ids) - 1):
+            affected.add(prop_id)
+        elif prop_id in features.positions:
+            thresholds[features.positions[prop_id]] = weakest
+
+    for prop_id in changed:
+        index = features.positions.get(prop_id)
+        if index is not None:
+            scores = _scores(features, index)
+            affected.update(features.ids[scores > thresholds].tolist())
+
+    # Every recomputed listing is rescored against its current neighbours
+    missing = _stored_neighbours(affected) - pool
+    if missing:
+        features = _load_features(Property.prop_id.in_(pool | missing))
+
+    indices = sorted(features.positions[prop_id] for prop_id in affected if prop_id in features.positions)
+    removed = [prop_id for prop_id in affected if prop_id not in features.positions]
+    for start in range(0, max(len(indices), 1), batch_size):
+        _store(features, indices[start:start + batch_size], k, removed if start == 0 else ())
+    return len(indices)
+
+
+def _fallback_listings(prop_id, limit, min_score):
+    """
+    [(prop_id, score)] for a listing without stored neighbours, scored
+    against its candidates (_candidate_ids). Nothing is written.
+    """
+    features = _load_features(Property.prop_id.in_({prop_id} | _candidate_ids([prop_id])))
+    index = features.positions.get(prop_id)
+    if index is None:
+        return []
+    return [(similar_id, score) for similar_id, score in _top_k(features, index, limit)
+            if score >= min_score]
+
+
+def similar_listings(prop_id, limit=None):
+    """
+    The listings most similar to prop_id, best first, as (Property, score)
+    pairs loaded with the card profile. One indexed range scan of
+    property_similarities joined to the listings; neighbours scoring below
+    SIMILAR_PROPERTIES_MIN_SCORE are left out, so fewer than limit may be
+    returned. A listing without stored neighbours yet is queued for the
+    refresh buffer and served from its candidates meanwhile. limit is
+    capped at SIMILAR_PROPERTIES_K.
+    """
+    k = _k()
+    limit = min(limit or k, k)
+    min_score = _min_score()
+    query = with_profile(Property.query, 'card')\
+        .join(PropertySimilarity, PropertySimilarity.similar_prop_id == Property.prop_id)\
+        .filter(PropertySimilarity.prop_id == prop_id)\
+        .order_by(PropertySimilarity.rank)\
+        .limit(limit)\
+        .add_columns(PropertySimilarity.score)
+
+    # Ranks follow the score, so the weak ones are cut from the end here;
+    # filtering in SQL would not tell a listing without rows from one
+    # without good neighbours
+    rows = query.all()
+    if rows:
+        return [(prop, score) for prop, score in rows if score >= min_score]
+
+    similarity_refresh.queue([prop_id])
+    scored = _fallback_listings(prop_id, limit, min_score)
+    properties = {
+        prop.prop_id: prop
+        for prop in with_profile(Property.query, 'card').filter(Property.prop_id.in_([i for i, _ in scored]))
+    } if scored else {}
+    return [(properties[similar_id], score) for similar_id, score in scored if similar_id in properties]
+
+
+class SimilarityRefreshBuffer(WriteBehindBuffer):
+    """
+    Queues listings changed by committed writes and refreshes their stored
+    similarities (and those of listings they affect) in batches from the
+    background flush, so listing writes never wait on rescoring.
+    """
+
+    config_prefix = 'SIMILARITY_REFRESH'
+
+    def queue(self, prop_ids):
+        # Runs in after_commit, where the session cannot emit SQL, so with
+        # the buffer disabled changes wait for the scheduled rebuild
+        if not self.enabled:
+            return
+        for prop_id in prop_ids:
+            if prop_id is not None:
+                self.add(prop_id, {'prop_id': prop_id})
+
+    def key_for(self, event):
+        return event['prop_id']
+
+    def merge(self, pending, key, event):
+        pending[key] = event
+
+    def write(self, batch):
+        refreshed = refresh_similarities(batch.keys())
+        logger.debug(f"Refreshed similar properties of {refreshed} listings after {len(batch)} changes")
+
+
+similarity_refresh = SimilarityRefreshBuffer()
+on_listings_changed(similarity_refresh.queue)
@@ -0,0 +1,96 @@
+# app/services/reference_data.py
+import hashlib
+import threading
+import time
+from collections import namedtuple
+from flask import current_app
+from app.models.property import PropertyType, Parish, Amenity
+
+# A loaded reference table: its rows, lookup maps and the response body
+ReferenceEntry = namedtuple('ReferenceEntry', ['items', 'by_id', 'ids_by_name', 'body', 'etag', 'loaded_at'])
+
+# name -> (model, id attribute, response key)
+REFERENCE_TABLES = {
+    'parishes': (Parish, 'parish_id', 'parishes'),
+    'property_types': (PropertyType, 'type_id', 'property_types'),
+    'amenities': (Amenity, 'amen_id', 'amenities'),
+}
+
+
+class ReferenceDataRegistry:
+    """
+    In-process copy of the parishes, property types and amenities tables.
+
+    Each table is loaded once, serialized once and served with a strong ETag
+    derived from the body. Writes that add rows call invalidate(); the TTL
+    bounds how long another worker can keep serving its older copy. Clients
+    revalidate on every use by default (a cheap 304), so they never hold a
+    list for longer than the server does.
+    """
+
+    def __init__(self, app=None):
+        self.ttl = 300
+        self.max_age = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('REFERENCE_DATA_TTL', 300)
+        self.max_age = app.config.get('REFERENCE_DATA_MAX_AGE', 0)
+        app.extensions['reference_data'] = self
+
+    @property
+    def cache_control(self):
+        if self.max_age <= 0:
+            return 'public, no-cache'
+        return f'public, max-age={self.max_age}'
+
+    def _load(self, name):
+        model, id_attr, key = REFERENCE_TABLES[name]
+        rows = model.query.order_by(getattr(model, id_attr)).all()
+        items = [row.to_dict() for row in rows]
+        by_id = {getattr(row, id_attr): item for row, item in zip(rows, items)}
+        ids_by_name = {row.name.lower(): getattr(row, id_attr) for row in rows}
+        body = current_app.json.dumps({key: items}).encode('utf-8')
+        etag = hashlib.sha1(body).hexdigest()
+        return ReferenceEntry(items, by_id, ids_by_name, body, etag, time.monotonic())
+
+    def get(self, name):
+        """Return the ReferenceEntry for a table, loading it if needed"""
+        entry = self._entries.get(name)
+        if entry is None or time.monotonic() - entry.loaded_at > self.ttl:
+            entry = self._load(name)
+            with self._lock:
+                self._entries[name] = entry
+        return entry
+
+    def invalidate(self, name=None):
+        """Forget one table, or all of them"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def lookup_id(self, name, value):
+        """Case-insensitive exact name -> id lookup, None if unknown"""
+        if not value:
+            return None
+        return self.get(name).ids_by_name.get(value.strip().lower())
+
+    def lookup(self, name, value):
+        """Case-insensitive exact name -> row dict lookup, None if unknown"""
+        id_ = self.lookup_id(name, value)
+        return self.get(name).by_id.get(id_) if id_ else None
+
+    def search_ids(self, name, term):
+        """Ids whose name contains term (case-insensitive), like ILIKE '%term%'"""
+        term = (term or '').strip().lower()
+        if not term:
+            return []
+        return [id_ for label, id_ in self.get(name).ids_by_name.items() if term in label]
+
+
+reference_data = ReferenceDataRegistry()
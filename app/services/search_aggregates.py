@@ -0,0 +1,189 @@
+# app/services/search_aggregates.py
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models.search import SearchHistory, SearchAggregate
+from app.services.property_cache import documents_for_rows
+from app.services.search_cache import search_cache
+from app.services.search_facets import search_facets
+from app.services.search_query import InvalidSearch, SearchFilters
+from app.services.search_service import search_properties
+
+logger = logging.getLogger(__name__)
+
+
+def settle_seconds(config):
+    """
+    Age after which a search_history row can no longer be bumped: the
+    configured SEARCH_HISTORY_SETTLE_SECONDS, raised if needed to cover
+    SEARCH_HISTORY_COLLAPSE_WINDOW plus one buffer flush interval, the
+    longest a repeat can take to reach the database
+    """
+    reach = (config.get('SEARCH_HISTORY_COLLAPSE_WINDOW', 300)
+             + config.get('SEARCH_HISTORY_BUFFER_FLUSH_INTERVAL', 10))
+    return max(config.get('SEARCH_HISTORY_SETTLE_SECONDS', 900), reach)
+
+
+def compact_search_history(now=None):
+    """
+    Roll settled search_history rows up into search_aggregates and enforce
+    retention. Runs periodically from the scheduler in run.py.
+
+    A row is settled once it is older than settle_seconds(), after which
+    the history buffer can no longer bump its hit_count. Settled
+    rows are added to their signature's aggregate (count, first and last
+    seen, latest params) with one INSERT ... ON CONFLICT and marked
+    aggregated. Aggregated rows older than SEARCH_HISTORY_RETENTION_DAYS, or
+    beyond a user's newest SEARCH_HISTORY_MAX_PER_USER rows, are deleted.
+    Returns (rows aggregated, rows deleted).
+    """
+    config = current_app.config
+    now = now or datetime.utcnow()
+    settled_before = now - timedelta(seconds=settle_seconds(config))
+
+    try:
+        _sign_legacy_rows(settled_before)
+        aggregated = _aggregate(settled_before)
+        deleted = _enforce_retention(
+            now - timedelta(days=config.get('SEARCH_HISTORY_RETENTION_DAYS', 90)),
+            config.get('SEARCH_HISTORY_MAX_PER_USER', 100)
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Search history compacted: {aggregated} rows aggregated, {deleted} deleted")
+    return aggregated, deleted
+
+
+def _sign_legacy_rows(settled_before, batch_size=1000):
+    """Give rows written before signatures existed one, so they aggregate too"""
+    rows = db.session.query(SearchHistory.search_id, SearchHistory.search_params).filter(
+        SearchHistory.signature.is_(None),
+        SearchHistory.search_date < settled_before
+    ).limit(batch_size).all()
+
+    updates = []
+    for search_id, params in rows:
+        try:
+            signature = SearchFilters.from_params(params or {}).signature
+        except InvalidSearch:
+            signature = None
+        # Unparseable rows are left unsigned; retention still removes them
+        updates.append({'search_id': search_id, 'signature': signature, 'aggregated': signature is None})
+    if updates:
+        db.session.execute(db.update(SearchHistory), updates)
+
+
+def _aggregate(settled_before):
+    pending = db.and_(
+        SearchHistory.aggregated.is_(False),
+        SearchHistory.signature.isnot(None),
+        SearchHistory.search_date < settled_before
+    )
+    # Bound the run so rows settling meanwhile are left for the next one
+    max_id = db.session.query(db.func.max(SearchHistory.search_id)).filter(pending).scalar()
+    if max_id is None:
+        return 0
+    pending = db.and_(pending, SearchHistory.search_id <= max_id)
+
+    by_signature = dict(partition_by=SearchHistory.signature)
+    ranked = db.select(
+        SearchHistory.signature,
+        SearchHistory.search_query,
+        SearchHistory.search_params,
+        db.func.sum(SearchHistory.hit_count).over(**by_signature).label('search_count'),
+        db.func.min(SearchHistory.search_date).over(**by_signature).label('first_seen'),
+        db.func.max(SearchHistory.search_date).over(**by_signature).label('last_seen'),
+        db.func.row_number().over(
+            order_by=(SearchHistory.search_date.desc(), SearchHistory.search_id.desc()), **by_signature
+        ).label('position')
+    ).where(pending).subquery()
+
+    latest = db.select(
+        ranked.c.signature, ranked.c.search_query, ranked.c.search_params,
+        ranked.c.search_count, ranked.c.first_seen, ranked.c.last_seen
+    ).where(ranked.c.position == 1)
+
+    insert = pg_insert(SearchAggregate).from_select(
+        ['signature', 'search_query', 'search_params', 'search_count', 'first_seen', 'last_seen'], latest
+    )
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=[SearchAggregate.signature],
+        set_={
+            'search_count': SearchAggregate.search_count + insert.excluded.search_count,
+            'first_seen': db.func.least(SearchAggregate.first_seen, insert.excluded.first_seen),
+            'last_seen': db.func.greatest(SearchAggregate.last_seen, insert.excluded.last_seen),
+            'search_query': insert.excluded.search_query,
+            'search_params': insert.excluded.search_params,
+        }
+    ))
+
+    marked = db.session.execute(
+        db.update(SearchHistory).where(pending).values(aggregated=True)
+        .execution_options(synchronize_session=False)
+    )
+    return marked.rowcount
+
+
+def _enforce_retention(expire_before, max_per_user):
+    ranked = db.select(
+        SearchHistory.search_id,
+        db.func.row_number().over(
+            partition_by=SearchHistory.user_id,
+            order_by=(SearchHistory.search_date.desc(), SearchHistory.search_id.desc())
+        ).label('position')
+    ).subquery()
+    beyond_limit = db.select(ranked.c.search_id).where(ranked.c.position > max_per_user)
+
+    # Rows are only deleted once they are counted in the aggregates
+    deleted = db.session.execute(
+        db.delete(SearchHistory)
+        .where(
+            SearchHistory.aggregated.is_(True),
+            db.or_(SearchHistory.search_date < expire_before, SearchHistory.search_id.in_(beyond_limit))
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return deleted.rowcount
+
+
+def popular_searches(limit=10, days=None):
+    """Most run searches seen within the last days (SEARCH_POPULAR_WINDOW_DAYS)"""
+    days = days or current_app.config.get('SEARCH_POPULAR_WINDOW_DAYS', 30)
+    return SearchAggregate.query.filter(
+        SearchAggregate.last_seen >= datetime.utcnow() - timedelta(days=days)
+    ).order_by(SearchAggregate.search_count.desc(), SearchAggregate.last_seen.desc()).limit(limit).all()
+
+
+def prewarm_search_caches(top_n=None):
+    """
+    Run the first page and facets of the top popular searches so their
+    result ids, totals, facet counts and listing documents are cached
+    before users ask. Returns the number of searches warmed.
+
+    Only useful with a shared cache (CACHE_REDIS_URL): otherwise the
+    results would land in the memory of the process running this (the
+    scheduler or a CLI command), not in the web workers', so nothing is run.
+    """
+    if not search_cache.shared:
+        logger.info("Skipping search pre-warm: without a shared cache it only warms this process")
+        return 0
+
+    top_n = top_n or current_app.config.get('SEARCH_PREWARM_TOP_N', 20)
+    per_page = current_app.config.get('SEARCH_PREWARM_PAGE_SIZE', 10)
+    warmed = 0
+    for aggregate in popular_searches(limit=top_n):
+        try:
+            filters = SearchFilters.from_params(aggregate.search_params or {})
+            result = search_properties(filters, page=1, per_page=per_page)
+            documents_for_rows(result.items)
+            search_facets(filters)
+            warmed += 1
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not pre-warm search {aggregate.signature}: {str(e)}")
+    return warmed
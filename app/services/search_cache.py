@@ -0,0 +1,179 @@
+# app/services/search_cache.py
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from app.services.listing_changes import on_listings_changed
+
+try:
+    import redis
+except ImportError:  # The shared backend is optional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Params that change how results are presented, not which listings match
+PRESENTATION_PARAMS = ('sort_by', 'sort_order', 'page', 'per_page', 'fields', 'snippets', 'count')
+
+
+def _normalize(key, value):
+    if isinstance(value, str):
+        value = ' '.join(value.split())
+        return value.lower() if key in ('city', 'keyword') else value
+    if isinstance(value, (list, tuple, set)):
+        return sorted({str(item).strip().lower() for item in value if str(item).strip()})
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def filter_signature(params, exclude=PRESENTATION_PARAMS):
+    """
+    Stable hash of the filters in a search params dict. Equivalent filter
+    sets (different key order, amenity order or case, 2.0 vs 2, empty
+    values) share a signature; params listed in exclude are ignored.
+    """
+    normalized = {}
+    for key, value in params.items():
+        if key in exclude or value is None:
+            continue
+        value = _normalize(key, value)
+        if value == '' or value == []:
+            continue
+        normalized[key] = value
+    raw = json.dumps(normalized, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+class SearchCache:
+    """
+    Cache of search-derived results (facet counts, totals, ordered result
+    ids) keyed by a namespace and filter_signature().
+
+    Every key carries a generation number that is bumped after any commit
+    changing listings, so stale entries are never read again and simply age
+    out of the LRU. With CACHE_REDIS_URL set, entries and the generation
+    are shared, so a write in one worker invalidates every worker;
+    otherwise SEARCH_CACHE_TTL bounds how long a worker can serve results
+    that predate another worker's write.
+    """
+
+    GENERATION_KEY = 'search:generation'
+
+    def __init__(self, app=None):
+        self.enabled = True
+        self.max_size = 1024
+        self.ttl = 60
+        self._generation = 0
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._shared = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SEARCH_CACHE_ENABLED', True)
+        self.max_size = app.config.get('SEARCH_CACHE_SIZE', 1024)
+        self.ttl = app.config.get('SEARCH_CACHE_TTL', 60)
+
+        redis_url = app.config.get('CACHE_REDIS_URL')
+        if redis_url and redis is not None:
+            self._shared = redis.Redis.from_url(redis_url)
+        elif redis_url:
+            logger.warning("CACHE_REDIS_URL is set but the redis package is not installed")
+
+        app.extensions['search_cache'] = self
+
+    @property
+    def shared(self):
+        """Whether entries are shared with other processes (CACHE_REDIS_URL)"""
+        return self._shared is not None
+
+    @property
+    def generation(self):
+        if self._shared is not None:
+            try:
+                return int(self._shared.get(self.GENERATION_KEY) or 0)
+            except redis.RedisError as e:
+                logger.warning(f"Search cache backend unavailable: {str(e)}")
+        return self._generation
+
+    def bump(self, prop_ids=None):
+        """Invalidate every cached search result"""
+        with self._lock:
+            self._generation += 1
+            self._local.clear()
+
+        if self._shared is not None:
+            try:
+                self._shared.incr(self.GENERATION_KEY)
+            except redis.RedisError as e:
+                logger.warning(f"Search cache backend unavailable: {str(e)}")
+
+    def _key(self, namespace, signature):
+        return f"search:{namespace}:{self.generation}:{signature}"
+
+    def get(self, namespace, signature):
+        if not self.enabled:
+            return None
+
+        key = self._key(namespace, signature)
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if time.monotonic() - entry[0] < self.ttl:
+                    self._local.move_to_end(key)
+                    return entry[1]
+                del self._local[key]
+
+        if self._shared is not None:
+            try:
+                raw = self._shared.get(key)
+            except redis.RedisError as e:
+                logger.warning(f"Search cache backend unavailable: {str(e)}")
+                return None
+            if raw:
+                value = json.loads(raw)
+                self._store_local(key, value)
+                return value
+        return None
+
+    def set(self, namespace, signature, value):
+        if not self.enabled:
+            return
+
+        key = self._key(namespace, signature)
+        self._store_local(key, value)
+
+        if self._shared is not None:
+            try:
+                self._shared.setex(key, self.ttl, json.dumps(value))
+            except redis.RedisError as e:
+                logger.warning(f"Search cache backend unavailable: {str(e)}")
+
+    def get_or_compute(self, namespace, signature, compute):
+        """Cached value, or compute() stored under the generation current before it ran"""
+        key = self._key(namespace, signature)
+        value = self.get(namespace, signature)
+        if value is None:
+            value = compute()
+            if self.enabled and key == self._key(namespace, signature):
+                self.set(namespace, signature, value)
+        return value
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._local[key] = (time.monotonic(), value)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+search_cache = SearchCache()
+on_listings_changed(search_cache.bump)
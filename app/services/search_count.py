@@ -0,0 +1,122 @@
+# app/services/search_count.py
+import logging
+import math
+from collections import namedtuple
+from flask import current_app
+from app import db
+from app.services.search_cache import search_cache
+
+logger = logging.getLogger(__name__)
+
+COUNT_STRATEGIES = ('exact', 'estimate', 'none')
+
+# One page of search results. total and pages are None under the 'none'
+# strategy; estimated is True when total comes from planner statistics.
+SearchPage = namedtuple('SearchPage', ['items', 'total', 'pages', 'has_more', 'estimated'])
+
+
+def count_strategy(value=None):
+    """The requested count strategy, falling back to SEARCH_COUNT_STRATEGY"""
+    value = (value or '').strip().lower()
+    if value in COUNT_STRATEGIES:
+        return value
+    return current_app.config.get('SEARCH_COUNT_STRATEGY', 'exact')
+
+
+def make_page(items, total, page, per_page, estimated=False):
+    """SearchPage for results whose total is already known"""
+    pages = math.ceil(total / per_page) if per_page > 0 else 0
+    return SearchPage(items, total, pages, page < pages, estimated)
+
+
+def paginate(query, page, per_page, strategy='exact', signature=None):
+    """
+    Fetch one page of an ordered query without a separate COUNT query.
+
+    exact:    the total rides along in the page query as COUNT(*) OVER ();
+              only a page past the end needs a real count
+    estimate: the planner's row estimate (EXPLAIN) when it is above
+              SEARCH_COUNT_ESTIMATE_THRESHOLD, an exact count otherwise
+    none:     no total; one extra row is fetched to tell whether a next
+              page exists
+
+    Totals are cached per filter signature (see search_cache) when one is
+    given, so following pages of the same search skip counting entirely.
+    """
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+
+    if strategy == 'none':
+        rows = query.offset(offset).limit(per_page + 1).all()
+        return SearchPage(rows[:per_page], None, None, len(rows) > per_page, False)
+
+    if signature is not None:
+        total = search_cache.get('count', signature)
+        if total is not None:
+            return make_page(query.offset(offset).limit(per_page).all(), total, page, per_page)
+
+    if strategy == 'estimate':
+        estimate = _estimated_count(query, signature)
+        if estimate is not None:
+            return make_page(query.offset(offset).limit(per_page).all(), estimate, page, per_page, estimated=True)
+
+    rows = query.add_columns(db.func.count().over().label('_total')).offset(offset).limit(per_page).all()
+    if rows:
+        total = rows[0]._total
+    else:
+        total = query.order_by(None).count() if page > 1 else 0
+    if signature is not None:
+        search_cache.set('count', signature, total)
+    return make_page(rows, total, page, per_page)
+
+
+def count_total(query, strategy='exact', signature=None):
+    """
+    Total rows of query without fetching any, for when the page rows come
+    from elsewhere. Returns (total, estimated).
+    """
+    if signature is not None:
+        total = search_cache.get('count', signature)
+        if total is not None:
+            return total, False
+
+    if strategy == 'estimate':
+        estimate = _estimated_count(query, signature)
+        if estimate is not None:
+            return estimate, True
+
+    total = query.order_by(None).count()
+    if signature is not None:
+        search_cache.set('count', signature, total)
+    return total, False
+
+
+def _estimated_count(query, signature=None):
+    """
+    Row estimate of the planner for query, or None if it is below the
+    threshold (or unavailable) and the query should be counted exactly
+    """
+    threshold = current_app.config.get('SEARCH_COUNT_ESTIMATE_THRESHOLD', 10000)
+    if signature is not None:
+        cached = search_cache.get('count-estimate', signature)
+        if cached is not None:
+            return cached if cached >= threshold else None
+
+    connection = db.session.connection()
+    if connection.dialect.name != 'postgresql':
+        return None
+
+    statement = query.order_by(None).statement
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    try:
+        # A savepoint keeps a failed EXPLAIN from aborting the transaction
+        with db.session.begin_nested():
+            plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled.string}", compiled.params).scalar()
+        estimate = int(plan[0]['Plan']['Plan Rows'])
+    except Exception as e:
+        logger.warning(f"Row estimate failed, counting exactly: {str(e)}")
+        return None
+
+    if signature is not None:
+        search_cache.set('count-estimate', signature, estimate)
+    return estimate if estimate >= threshold else None
@@ -0,0 +1,153 @@
+# app/services/search_facets.py
+import numpy as np
+from flask import current_app
+from app import db
+from app.models.property import Property
+from app.services.listing_index import listing_index
+from app.services.reference_data import reference_data
+from app.services.search_cache import search_cache
+from app.services.search_query import filter_query
+
+FACETS = ('parish', 'property_type', 'bedrooms', 'price')
+
+
+def _price_edges():
+    return [float(edge) for edge in current_app.config['SEARCH_FACET_PRICE_BANDS']]
+
+
+def _max_bedrooms():
+    return current_app.config['SEARCH_FACET_MAX_BEDROOMS']
+
+
+def search_facets(filters):
+    """
+    Listing counts per parish, property type, bedroom count and price band
+    for the listings matching SearchFilters, computed in one pass and
+    cached per filter signature until listings change.
+    Returns {'total': n, 'facets': {...}}
+    """
+    return search_cache.get_or_compute('facets', filters.signature, lambda: _compute(filters))
+
+
+def _compute(filters):
+    edges = _price_edges()
+    counts = _index_counts(filters, edges)
+    if counts is None:
+        counts = _sql_counts(filters, edges)
+    return _format(counts, edges)
+
+
+def _index_counts(filters, edges):
+    """Facet counts from the in-memory listing index, None if it cannot answer"""
+    columns = listing_index.select(filters, ('parish_id', 'property_type_id', 'bedrooms', 'price'))
+    if columns is None:
+        return None
+
+    def tally(values):
+        keys, numbers = np.unique(values, return_counts=True)
+        return dict(zip(keys.tolist(), numbers.tolist()))
+
+    parish_ids = columns['parish_id']
+    type_ids = columns['property_type_id']
+    bedrooms = columns['bedrooms'][~np.isnan(columns['bedrooms'])]
+    prices = columns['price'][~np.isnan(columns['price'])]
+    bands = np.searchsorted(np.array(edges), prices, side='right') - 1
+
+    return {
+        'total': len(parish_ids),
+        'parish': tally(parish_ids[parish_ids >= 0]),
+        'property_type': tally(type_ids[type_ids >= 0]),
+        'bedrooms': tally(np.minimum(bedrooms, _max_bedrooms()).astype(np.int64)),
+        'price': tally(bands[bands >= 0]),
+    }
+
+
+def _sql_counts(filters, edges):
+    """
+    Facet counts with one GROUPING SETS query:
+
+        SELECT parish_id, property_type_id, bedrooms, price_band,
+               GROUPING(...) ..., count(*)
+        FROM (filtered listings)
+        GROUP BY GROUPING SETS ((parish_id), (property_type_id),
+                                (bedrooms), (price_band))
+
+    Each grouping set partitions the same rows, so the total is the sum of
+    any one facet's counts (including its NULL group).
+    """
+    max_bedrooms = _max_bedrooms()
+    bedrooms = db.case(
+        (Property.bedrooms >= max_bedrooms, max_bedrooms),
+        else_=Property.bedrooms
+    )
+    price_band = db.case(
+        (Property.price.is_(None), None),
+        (Property.price < edges[0], -1),
+        *[(Property.price < edge, index) for index, edge in enumerate(edges[1:])],
+        else_=len(edges) - 1
+    )
+
+    listings = filter_query(filters).with_entities(
+        Property.parish_id.label('parish'),
+        Property.property_type_id.label('property_type'),
+        bedrooms.label('bedrooms'),
+        price_band.label('price'),
+    ).order_by(None).subquery()
+
+    dimensions = [listings.c[name] for name in FACETS]
+    rows = db.session.execute(
+        db.select(
+            *dimensions,
+            *[db.func.grouping(column) for column in dimensions],
+            db.func.count()
+        ).group_by(db.func.grouping_sets(*[db.tuple_(column) for column in dimensions]))
+    ).all()
+
+    counts = {name: {} for name in FACETS}
+    for row in rows:
+        values, grouped, number = row[:len(FACETS)], row[len(FACETS):-1], row[-1]
+        for name, value, rolled_up in zip(FACETS, values, grouped):
+            if not rolled_up:
+                counts[name][value] = number
+
+    counts['total'] = sum(counts['parish'].values())
+    for name in FACETS:
+        counts[name].pop(None, None)
+    counts['price'].pop(-1, None)
+    return counts
+
+
+def _format(counts, edges):
+    parishes = reference_data.get('parishes').by_id
+    types = reference_data.get('property_types').by_id
+    max_bedrooms = _max_bedrooms()
+
+    def named(name, id_key, lookup):
+        items = [
+            {id_key: id_, 'name': lookup.get(id_, {}).get('name'), 'count': number}
+            for id_, number in counts[name].items()
+        ]
+        return sorted(items, key=lambda item: (-item['count'], item['name'] or ''))
+
+    return {
+        'total': counts['total'],
+        'facets': {
+            'parish': named('parish', 'parish_id', parishes),
+            'property_type': named('property_type', 'type_id', types),
+            'bedrooms': [
+                {
+                    'bedrooms': f"{bucket}+" if bucket == max_bedrooms else bucket,
+                    'count': counts['bedrooms'][bucket]
+                }
+                for bucket in sorted(counts['bedrooms'])
+            ],
+            'price': [
+                {
+                    'min_price': edge,
+                    'max_price': edges[index + 1] if index + 1 < len(edges) else None,
+                    'count': counts['price'].get(index, 0)
+                }
+                for index, edge in enumerate(edges)
+            ],
+        },
+    }
@@ -0,0 +1,129 @@
+# app/services/search_history.py
+import logging
+from datetime import datetime, timedelta
+from app import db
+from app.models.search import SearchHistory
+from app.services.write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class SearchHistoryBuffer(WriteBehindBuffer):
+    """
+    Buffers logged-in users' searches and writes them to search_history in
+    bulk.
+
+    Repeats of the same search (same SearchFilters.signature) by the same
+    user are collapsed into one row whose hit_count is incremented and
+    whose search_date moves to the latest run. Repeats within one flush
+    interval merge in memory; a repeat within SEARCH_HISTORY_COLLAPSE_WINDOW
+    seconds of the user's existing row updates that row (the newest, if
+    there are several). A flush costs one UPDATE ... FROM (VALUES ...) plus
+    one multi-row INSERT, in a single transaction.
+    """
+
+    config_prefix = 'SEARCH_HISTORY_BUFFER'
+    collapse_window = 300
+
+    def init_app(self, app):
+        # Set before the base class replays orphaned logs through write()
+        self.collapse_window = app.config.get('SEARCH_HISTORY_COLLAPSE_WINDOW', 300)
+        super().init_app(app)
+
+    def record(self, user_id, filters, search_query, searched_at=None):
+        """Record one run of a search (SearchFilters) by a user"""
+        searched_at = (searched_at or datetime.utcnow()).isoformat()
+        event = {'user_id': int(user_id), 'signature': filters.signature, 'hits': 1,
+                 'search_query': search_query, 'search_params': filters.to_params(),
+                 'first_searched': searched_at, 'last_searched': searched_at}
+        self.add(self.key_for(event), event)
+
+    def key_for(self, event):
+        return (event['user_id'], event['signature'])
+
+    def merge(self, pending, key, event):
+        current = pending.get(key)
+        if current is None:
+            pending[key] = dict(event)
+        else:
+            current['hits'] += event['hits']
+            current['first_searched'] = min(current['first_searched'], event['first_searched'])
+            if event['last_searched'] >= current['last_searched']:
+                current['last_searched'] = event['last_searched']
+                current['search_query'] = event['search_query']
+                current['search_params'] = event['search_params']
+
+    def write(self, batch):
+        window = timedelta(seconds=self.collapse_window)
+        events = list(batch.values())
+        rows = [
+            (event['user_id'], event['signature'], event['hits'],
+             datetime.fromisoformat(event['first_searched']) - window,
+             datetime.fromisoformat(event['last_searched']))
+            for event in events
+        ]
+
+        pending = db.values(
+            db.column('user_id', db.Integer),
+            db.column('signature', db.String),
+            db.column('hits', db.Integer),
+            db.column('window_start', db.DateTime),
+            db.column('last_searched', db.DateTime),
+            name='pending_searches'
+        ).data(rows)
+
+        # Several rows can fall in the window (written before collapsing,
+        # or by two workers flushing the same search at once); bump only
+        # the newest so the repeat is counted once
+        newest = db.aliased(SearchHistory)
+        newest_id = (
+            db.select(newest.search_id)
+            .where(
+                newest.user_id == pending.c.user_id,
+                newest.signature == pending.c.signature,
+                newest.search_date >= pending.c.window_start
+            )
+            .order_by(newest.search_date.desc(), newest.search_id.desc())
+            .limit(1)
+            .correlate(pending)
+            .scalar_subquery()
+        )
+
+        try:
+            # Repeats of a search the user ran recently bump that row
+            updated = db.session.execute(
+                db.update(SearchHistory)
+                .where(
+                    SearchHistory.user_id == pending.c.user_id,
+                    SearchHistory.signature == pending.c.signature,
+                    SearchHistory.search_id == newest_id
+                )
+                .values(
+                    hit_count=SearchHistory.hit_count + pending.c.hits,
+                    search_date=db.func.greatest(SearchHistory.search_date, pending.c.last_searched)
+                )
+                .returning(SearchHistory.user_id, SearchHistory.signature)
+                .execution_options(synchronize_session=False)
+            )
+            existing = {(row.user_id, row.signature) for row in updated}
+
+            new_searches = [
+                {'user_id': event['user_id'], 'signature': event['signature'],
+                 'hit_count': event['hits'], 'search_query': event['search_query'],
+                 'search_params': event['search_params'],
+                 'search_date': datetime.fromisoformat(event['last_searched'])}
+                for event in events
+                if (event['user_id'], event['signature']) not in existing
+            ]
+            if new_searches:
+                db.session.execute(db.insert(SearchHistory), new_searches)
+
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        logger.debug(f"Flushed {len(events)} searches ({len(new_searches)} new)")
+
+
+search_history_buffer = SearchHistoryBuffer()
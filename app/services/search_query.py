@@ -0,0 +1,285 @@
+# app/services/search_query.py
+from collections import namedtuple
+from app import db
+from app.models.property import Property
+from app.services.amenity_filter import amenity_predicate
+from app.services.geo_search import bbox_predicate, distance_km, radius_predicate
+from app.services.reference_data import reference_data
+from app.services.search_cache import filter_signature
+from app.services.text_search import apply_keyword, keyword_rank
+
+
+class InvalidSearch(ValueError):
+    """Raised when search parameters cannot be parsed"""
+
+
+SORTS = ('newest', 'price', 'price_per_sqft', 'relevance', 'distance')
+
+# Earlier sort_by values still sent by clients and stored in search history
+SORT_ALIASES = {'created_at': 'newest'}
+
+FILTER_FIELDS = (
+    'min_price', 'max_price', 'parish_id', 'city', 'keyword', 'property_type_id',
+    'min_bedrooms', 'min_bathrooms', 'amenities', 'is_for_sale', 'is_for_rent',
+    'owner_id', 'agent_id', 'status', 'bbox', 'near', 'radius_km',
+)
+
+# Coordinate filters, sent and stored as comma separated numbers
+COORDINATE_FIELDS = ('bbox', 'near')
+
+_TRUE = ('true', '1', 'yes')
+_FALSE = ('false', '0', 'no')
+
+
+def _text(params, key):
+    value = params.get(key)
+    if value is None:
+        return None
+    value = ' '.join(str(value).split())
+    return value or None
+
+
+def _number(params, key, kind):
+    value = params.get(key)
+    if value is None or value == '':
+        return None
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise InvalidSearch(f"{key} must be a{'n integer' if kind is int else ' number'}")
+
+
+def _coordinates(params, key, count):
+    value = params.get(key)
+    if value is None or value == '':
+        return None
+    parts = value.split(',') if isinstance(value, str) else value
+    try:
+        numbers = tuple(float(part) for part in parts)
+    except (TypeError, ValueError):
+        numbers = ()
+    if len(numbers) != count:
+        raise InvalidSearch(f"{key} must be {count} comma separated numbers")
+    return numbers
+
+
+def _check_point(key, lat, lon):
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise InvalidSearch(f"{key} latitude must be within -90..90 and longitude within -180..180")
+
+
+def _flag(params, key):
+    value = params.get(key)
+    if value is None or isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if not value:
+        return None
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise InvalidSearch(f"{key} must be true or false")
+
+
+class SearchFilters(namedtuple('SearchFilters', FILTER_FIELDS + ('sort_by', 'sort_order'),
+                               defaults=(None,) * len(FILTER_FIELDS) + ('newest', 'desc'))):
+    """
+    Validated listing search: every filter the search endpoints accept,
+    plus the sort. Unset filters are None, so is_for_sale / is_for_rent are
+    tri-state (None matches both). bbox is (min_lon, min_lat, max_lon,
+    max_lat), near is (lat, lon) and radius_km limits results to that
+    distance from near. Build with from_args() or from_params().
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_args(cls, args):
+        """Parse a request's query string (amenities and amenities[] are both accepted)"""
+        params = args.to_dict()
+        params['amenities'] = args.getlist('amenities') + args.getlist('amenities[]')
+        params['keyword'] = args.get('keyword') or args.get('q')
+        return cls.from_params(params)
+
+    @classmethod
+    def from_params(cls, params):
+        """
+        Parse a dict of search params (as stored in search history).
+
+        Raises:
+            InvalidSearch: If a value has the wrong type or the sort is unknown
+        """
+        parish_id = _number(params, 'parish_id', int)
+        if parish_id is None and params.get('parish'):
+            # A parish name selects the first parish containing it
+            parish_ids = reference_data.search_ids('parishes', params['parish'])
+            parish_id = parish_ids[0] if parish_ids else None
+
+        amenities = params.get('amenities') or ()
+        if isinstance(amenities, str):
+            amenities = [amenities]
+        amenities = tuple(sorted({str(term).strip().lower() for term in amenities if str(term).strip()}))
+
+        bbox = _coordinates(params, 'bbox', 4)
+        if bbox is not None:
+            _check_point('bbox', bbox[1], bbox[0])
+            _check_point('bbox', bbox[3], bbox[2])
+            if bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                raise InvalidSearch("bbox must be min_lon,min_lat,max_lon,max_lat")
+        near = _coordinates(params, 'near', 2)
+        if near is not None:
+            _check_point('near', *near)
+        radius_km = _number(params, 'radius_km', float)
+        if radius_km is not None and (near is None or radius_km <= 0):
+            raise InvalidSearch("radius_km must be positive and needs near=lat,lon")
+
+        keyword = _text(params, 'keyword')
+        sort_by = (params.get('sort_by') or params.get('sort') or '').strip().lower()
+        sort_by = SORT_ALIASES.get(sort_by, sort_by) or ('relevance' if keyword else 'newest')
+        if sort_by not in SORTS:
+            raise InvalidSearch(f"sort_by must be one of {', '.join(SORTS)}")
+        sort_order = (params.get('sort_order') or ('asc' if sort_by == 'distance' else 'desc')).strip().lower()
+        if sort_order not in ('asc', 'desc'):
+            raise InvalidSearch("sort_order must be asc or desc")
+
+        return cls(
+            min_price=_number(params, 'min_price', float),
+            max_price=_number(params, 'max_price', float),
+            parish_id=parish_id,
+            city=_text(params, 'city'),
+            keyword=keyword,
+            property_type_id=_number(params, 'property_type_id', int),
+            min_bedrooms=_number(params, 'min_bedrooms', int),
+            min_bathrooms=_number(params, 'min_bathrooms', float),
+            amenities=amenities or None,
+            is_for_sale=_flag(params, 'is_for_sale'),
+            is_for_rent=_flag(params, 'is_for_rent'),
+            owner_id=_number(params, 'owner_id', int),
+            agent_id=_number(params, 'agent_id', int),
+            status=_text(params, 'status'),
+            bbox=bbox,
+            near=near,
+            radius_km=radius_km,
+            sort_by=sort_by,
+            sort_order=sort_order,
+        )
+
+    @property
+    def effective_sort(self):
+        """The sort applied; relevance needs a keyword and distance a point, else newest"""
+        if self.sort_by == 'relevance' and not self.keyword:
+            return 'newest'
+        if self.sort_by == 'distance' and self.near is None:
+            return 'newest'
+        return self.sort_by
+
+    def to_params(self):
+        """Plain dict of the set filters and the sort, for responses and search history"""
+        params = {key: value for key, value in self._asdict().items() if value is not None}
+        if self.amenities:
+            params['amenities'] = list(self.amenities)
+        for key in COORDINATE_FIELDS:
+            if key in params:
+                params[key] = ','.join(str(number) for number in params[key])
+        return params
+
+    @property
+    def signature(self):
+        """Identifies which listings match, regardless of order"""
+        return filter_signature(self.to_params())
+
+    @property
+    def result_signature(self):
+        """Identifies the matching listings and their order"""
+        return filter_signature(dict(self.to_params(), sort_by=self.effective_sort), exclude=())
+
+
+def filter_query(filters, query=None):
+    """
+    Apply the filters to a Property query (Property.query by default),
+    without ordering it.
+
+    Every value is a bound parameter, so searches using the same set of
+    filters share one statement shape and SQLAlchemy's compiled cache
+    reuses its SQL.
+    """
+    if query is None:
+        query = Property.query
+
+    if filters.min_price is not None:
+        query = query.filter(Property.price >= filters.min_price)
+    if filters.max_price is not None:
+        query = query.filter(Property.price <= filters.max_price)
+    if filters.parish_id is not None:
+        query = query.filter(Property.parish_id == filters.parish_id)
+    if filters.city:
+        # A literal substring: % and _ in the input are not wildcards
+        like = filters.city.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        query = query.filter(Property.city.ilike(f"%{like}%", escape='\\'))
+    if filters.keyword:
+        query = apply_keyword(query, filters.keyword, order=False)
+    if filters.property_type_id is not None:
+        query = query.filter(Property.property_type_id == filters.property_type_id)
+    if filters.min_bedrooms is not None:
+        query = query.filter(Property.bedrooms >= filters.min_bedrooms)
+    if filters.min_bathrooms is not None:
+        query = query.filter(Property.bathrooms >= filters.min_bathrooms)
+    if filters.is_for_sale is not None:
+        query = query.filter(Property.is_for_sale == filters.is_for_sale)
+    if filters.is_for_rent is not None:
+        query = query.filter(Property.is_for_rent == filters.is_for_rent)
+    if filters.owner_id is not None:
+        query = query.filter(Property.owner_id == filters.owner_id)
+    if filters.agent_id is not None:
+        query = query.filter(Property.agent_id == filters.agent_id)
+    if filters.status:
+        query = query.filter(Property.status == filters.status)
+    if filters.bbox is not None:
+        min_lon, min_lat, max_lon, max_lat = filters.bbox
+        query = query.filter(bbox_predicate(min_lat, min_lon, max_lat, max_lon))
+    if filters.near is not None and filters.radius_km is not None:
+        query = query.filter(radius_predicate(*filters.near, filters.radius_km))
+
+    # Amenities (ids or names) are matched on the amenity bitset
+    if filters.amenities:
+        predicate = amenity_predicate(filters.amenities)
+        if predicate is not None:
+            query = query.filter(predicate)
+
+    return query
+
+
+def price_per_sqft():
+    """Price per square foot, NULL when the area is unknown or zero"""
+    return Property.price / db.func.nullif(Property.area_sqft, 0)
+
+
+def order_query(query, filters):
+    """
+    Order a filtered query by the search's sort. Ties are broken by prop_id
+    in the same direction so pages are stable (and match the in-memory
+    listing index).
+    """
+    sort = filters.effective_sort
+    descending = filters.sort_order == 'desc'
+
+    def direction(column):
+        return column.desc() if descending else column.asc()
+
+    if sort == 'relevance':
+        return query.order_by(keyword_rank(filters.keyword).desc(), Property.created_at.desc(),
+                              Property.prop_id.desc())
+    if sort == 'price':
+        return query.order_by(direction(Property.price), direction(Property.prop_id))
+    if sort == 'distance':
+        # Nearest first by default; listings without coordinates go last either way
+        return query.order_by(direction(distance_km(*filters.near)).nulls_last(), direction(Property.prop_id))
+    if sort == 'price_per_sqft':
+        # Listings without an area go last either way
+        return query.order_by(direction(price_per_sqft()).nulls_last(), direction(Property.prop_id))
+    return query.order_by(direction(Property.created_at), direction(Property.prop_id))
+
+
+def search_query(filters):
+    """Filtered and ordered Property query for a search"""
+    return order_query(filter_query(filters), filters)
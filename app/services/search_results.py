@@ -0,0 +1,62 @@
+# app/services/search_results.py
+from flask import current_app
+from app import db
+from app.models.property import Property
+from app.services.property_cache import version_query
+from app.services.property_projection import project
+from app.services.search_cache import search_cache
+from app.services.search_count import SearchPage, count_total, make_page
+
+
+def cached_page(query, signature, page, per_page, strategy='exact', count_signature=None):
+    """
+    One page of prop_ids for an ordered Property query (search_query()),
+    cut from a cached list of its first SEARCH_RESULT_CACHE_DEPTH matches.
+
+    On a miss the ids are loaded with one query (carrying COUNT(*) OVER ()
+    when an exact total is wanted) and cached under signature until
+    listings change. When the list holds every match the total is its
+    length; otherwise it comes from count_total() under count_signature.
+    Returns a SearchPage of prop_ids, or None for pages deeper than the
+    cached list, which the caller paginates in SQL.
+    """
+    depth = current_app.config.get('SEARCH_RESULT_CACHE_DEPTH', 500)
+    page = max(page, 1)
+    start = (page - 1) * per_page
+    if not search_cache.enabled or start + per_page > depth:
+        return None
+
+    def load():
+        return _load_ids(query, depth, count_signature if strategy == 'exact' else None)
+
+    ids = search_cache.get_or_compute('results', signature, load)
+    page_ids = ids[start:start + per_page]
+
+    # The list is complete when the query ran out before the depth
+    if len(ids) <= depth:
+        return make_page(page_ids, len(ids), page, per_page)
+    if strategy == 'none':
+        return SearchPage(page_ids, None, None, True, False)
+
+    total, estimated = count_total(query, strategy, count_signature)
+    return make_page(page_ids, total, page, per_page, estimated=estimated)
+
+
+def _load_ids(query, depth, count_signature=None):
+    """First depth + 1 prop_ids of query, in order (one past the depth tells whether there are more)"""
+    if count_signature is None:
+        return [row[0] for row in query.with_entities(Property.prop_id).limit(depth + 1)]
+
+    rows = query.with_entities(Property.prop_id, db.func.count().over()).limit(depth + 1).all()
+    search_cache.set('count', count_signature, rows[0][1] if rows else 0)
+    return [row[0] for row in rows]
+
+
+def hydrate(prop_ids, fields=None):
+    """Load result rows for prop_ids, in that order"""
+    if not prop_ids:
+        return []
+    query = Property.query.filter(Property.prop_id.in_(prop_ids))
+    query = project(query, fields) if fields else version_query(query)
+    rows = {row.prop_id: row for row in query}
+    return [rows[prop_id] for prop_id in prop_ids if prop_id in rows]
@@ -0,0 +1,368 @@
+# app/services/search_suggest.py
+import bisect
+import logging
+import threading
+import time
+from datetime import timedelta
+from flask import current_app
+from app import db
+from app.models.property import Property
+from app.services.listing_changes import on_listings_changed
+from app.services.reference_data import reference_data
+from app.services.search_cache import filter_signature, search_cache
+
+logger = logging.getLogger(__name__)
+
+# Kinds of completion, in the order they rank among equally good matches
+SUGGEST_TYPES = ('city', 'parish', 'address', 'title')
+
+
+def normalize_term(text):
+    """Lowercase with whitespace collapsed, the form terms are matched in"""
+    return ' '.join((text or '').lower().split())
+
+
+def _word_suffixes(term):
+    """'12 hope road' -> ['12 hope road', 'hope road', 'road']"""
+    words = term.split(' ')
+    return list(dict.fromkeys(' '.join(words[index:]) for index in range(len(words))))
+
+
+def _suggestion(kind, text, prop_ids=None, count=None, ref=None):
+    """A completion and the search params that apply it"""
+    count = len(prop_ids) if count is None else count
+    if kind == 'city':
+        search = {'city': text}
+    elif kind == 'parish':
+        search = {'parish_id': ref}
+    else:
+        search = {'keyword': text}
+    suggestion = {'type': kind, 'text': text, 'count': count, 'search': search}
+    if kind == 'title' and count == 1:
+        suggestion['prop_id'] = ref if prop_ids is None else next(iter(prop_ids))
+    return suggestion
+
+
+def _rank(suggestion, term):
+    """Whole-term prefix matches first, then more listings, then kind"""
+    return (
+        not normalize_term(suggestion['text']).startswith(term),
+        -suggestion['count'],
+        SUGGEST_TYPES.index(suggestion['type']),
+        suggestion['text'].lower()
+    )
+
+
+class SuggestIndex:
+    """
+    Typeahead completions for cities, parishes, addresses and titles, held
+    in process as one sorted list of keys searched with bisect.
+
+    Each distinct normalized term is keyed by every word suffix, so "hope"
+    completes "12 Hope Road", and remembers the listings carrying it.
+    Listings this process changes (on_listings_changed) are re-read on the
+    next lookup and only their terms move; changes made by other workers are
+    picked up every SEARCH_SUGGEST_REFRESH_INTERVAL seconds from updated_at,
+    as in ListingIndex.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.refresh_interval = 30
+        self.refresh_overlap = 60
+        self.scan_limit = 500
+        self._keys = []  # Sorted (key, kind, term)
+        self._terms = {}  # (kind, term) -> {'text', 'ref', 'prop_ids'}
+        self._listing_terms = {}  # prop_id -> ((kind, term, text, ref), ...)
+        self._pending = set()
+        self._watermark = None
+        self._loaded = False
+        self._refreshed_at = 0.0
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('SEARCH_SUGGEST_INDEX_ENABLED', True)
+        self.refresh_interval = app.config.get('SEARCH_SUGGEST_REFRESH_INTERVAL', 30)
+        self.refresh_overlap = app.config.get('SEARCH_SUGGEST_REFRESH_OVERLAP', 60)
+        self.scan_limit = app.config.get('SEARCH_SUGGEST_SCAN_LIMIT', 500)
+        app.extensions['search_suggest'] = self
+
+    def mark_changed(self, prop_ids):
+        with self._lock:
+            self._pending.update(prop_id for prop_id in prop_ids if prop_id is not None)
+
+    # Loading
+
+    @staticmethod
+    def _load(query):
+        rows = query.with_entities(
+            Property.prop_id, Property.updated_at, Property.city,
+            Property.parish_id, Property.address, Property.title
+        ).all()
+        parishes = reference_data.get('parishes').by_id
+
+        listings = {}
+        for prop_id, _, city, parish_id, address, title in rows:
+            terms = []
+            for kind, text, ref in (
+                ('city', city, None),
+                ('parish', parishes.get(parish_id, {}).get('name'), parish_id),
+                ('address', address, None),
+                ('title', title, prop_id),
+            ):
+                text = ' '.join((text or '').split())
+                if text:
+                    terms.append((kind, text.lower(), text, ref))
+            listings[prop_id] = tuple(terms)
+
+        updated = [row[1] for row in rows if row[1] is not None]
+        return listings, max(updated) if updated else None
+
+    def rebuild(self):
+        """Load every listing from scratch"""
+        started = time.perf_counter()
+        listings, watermark = self._load(Property.query)
+
+        terms = {}
+        for prop_id, listing_terms in listings.items():
+            for kind, term, text, ref in listing_terms:
+                entry = terms.setdefault((kind, term), {'text': text, 'ref': ref, 'prop_ids': set()})
+                entry['prop_ids'].add(prop_id)
+        keys = sorted(
+            (key, kind, term) for kind, term in terms for key in _word_suffixes(term)
+        )
+
+        with self._lock:
+            self._keys, self._terms, self._listing_terms = keys, terms, listings
+            self._watermark = watermark
+            self._loaded = True
+            self._refreshed_at = time.monotonic()
+        logger.info(f"Suggest index built: {len(terms)} terms in {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    def _add(self, prop_id, kind, term, text, ref):
+        entry = self._terms.get((kind, term))
+        if entry is None:
+            entry = self._terms[(kind, term)] = {'text': text, 'ref': ref, 'prop_ids': set()}
+            for key in _word_suffixes(term):
+                bisect.insort(self._keys, (key, kind, term))
+        entry['prop_ids'].add(prop_id)
+
+    def _remove(self, prop_id, kind, term):
+        entry = self._terms.get((kind, term))
+        if entry is None:
+            return
+        entry['prop_ids'].discard(prop_id)
+        if not entry['prop_ids']:
+            del self._terms[(kind, term)]
+            for key in _word_suffixes(term):
+                index = bisect.bisect_left(self._keys, (key, kind, term))
+                if index < len(self._keys) and self._keys[index] == (key, kind, term):
+                    del self._keys[index]
+
+    def _apply(self, prop_id, listing_terms):
+        """Replace one listing's terms (empty to remove the listing)"""
+        old = self._listing_terms.pop(prop_id, ())
+        new_keys = {(kind, term) for kind, term, _, _ in listing_terms}
+        for kind, term, _, _ in old:
+            if (kind, term) not in new_keys:
+                self._remove(prop_id, kind, term)
+        for kind, term, text, ref in listing_terms:
+            self._add(prop_id, kind, term, text, ref)
+        if listing_terms:
+            self._listing_terms[prop_id] = listing_terms
+
+    def refresh(self):
+        """Re-read listings changed here, and every interval those changed since the watermark"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        due = time.monotonic() - self._refreshed_at >= self.refresh_interval
+
+        changed = []
+        if pending:
+            changed.append(Property.prop_id.in_(pending))
+        if due and self._watermark is None:
+            # Nothing indexed yet, so every listing is new
+            changed.append(db.true())
+        elif due:
+            changed.append(Property.updated_at >= self._watermark - timedelta(seconds=self.refresh_overlap))
+        try:
+            if changed:
+                listings, watermark = self._load(Property.query.filter(db.or_(*changed)))
+            else:
+                listings, watermark = {}, None
+        except Exception:
+            # Listings changed here may not be in any later delta, so keep
+            # them for the next attempt
+            with self._lock:
+                self._pending |= pending
+            raise
+
+        with self._lock:
+            for prop_id, listing_terms in listings.items():
+                self._apply(prop_id, listing_terms)
+            # Pending listings that no longer load were deleted
+            for prop_id in pending - listings.keys():
+                self._apply(prop_id, ())
+            if watermark is not None and (self._watermark is None or watermark > self._watermark):
+                self._watermark = watermark
+
+        if due:
+            # Deleted listings never show up in a delta, so compare counts
+            total = db.session.query(db.func.count(Property.prop_id)).scalar()
+            if total != len(self._listing_terms):
+                existing = {row[0] for row in db.session.query(Property.prop_id)}
+                with self._lock:
+                    for prop_id in list(self._listing_terms.keys() - existing):
+                        self._apply(prop_id, ())
+            self._refreshed_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Build or refresh the index if it is due; never blocks on a refresh in progress"""
+        if not self._loaded:
+            with self._refresh_lock:
+                if not self._loaded:
+                    self.rebuild()
+            return
+
+        due = self._pending or time.monotonic() - self._refreshed_at >= self.refresh_interval
+        if due and self._refresh_lock.acquire(blocking=False):
+            try:
+                self.refresh()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Suggest index refresh failed: {str(e)}")
+            finally:
+                self._refresh_lock.release()
+
+    # Lookup
+
+    def complete(self, term, types=SUGGEST_TYPES, limit=8):
+        """
+        Ranked completions of a normalized term, or None if the index is
+        disabled and the caller has to match prefixes in SQL
+        """
+        if not self.enabled:
+            return None
+        self.ensure_fresh()
+
+        # Terms with a word starting with term; _rank puts whole-term prefixes first
+        matched_terms = set()
+        with self._lock:
+            keys = self._keys
+            start = bisect.bisect_left(keys, (term,))
+            for index in range(start, min(start + self.scan_limit, len(keys))):
+                key, kind, matched = keys[index]
+                if not key.startswith(term):
+                    break
+                if kind in types:
+                    matched_terms.add((kind, matched))
+
+            suggestions = []
+            for (kind, matched) in matched_terms:
+                entry = self._terms[(kind, matched)]
+                suggestions.append(_suggestion(kind, entry['text'], entry['prop_ids'], ref=entry['ref']))
+
+        return sorted(suggestions, key=lambda suggestion: _rank(suggestion, term))[:limit]
+
+
+suggest_index = SuggestIndex()
+on_listings_changed(suggest_index.mark_changed)
+
+
+# Listing columns completed in SQL, each with a pg_trgm GIN index
+def _text_columns():
+    return {'city': Property.city, 'address': Property.address, 'title': Property.title}
+
+
+def _sql_suggestions(kind, column, condition, score, limit):
+    count = db.func.count(Property.prop_id)
+    rows = db.session.query(column, count, db.func.min(Property.prop_id))\
+        .filter(condition)\
+        .group_by(column)\
+        .order_by(score.desc(), count.desc(), column)\
+        .limit(limit)
+    return [_suggestion(kind, text, count=number, ref=prop_id) for text, number, prop_id in rows]
+
+
+def _sql_prefix(term, types, limit):
+    """Word-prefix completions with ILIKE, used when the in-memory index is disabled"""
+    like = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    suggestions = []
+    for kind, column in _text_columns().items():
+        if kind in types:
+            starts = column.ilike(f'{like}%', escape='\\')
+            condition = db.or_(starts, column.ilike(f'% {like}%', escape='\\'))
+            suggestions.extend(_sql_suggestions(kind, column, condition, db.case((starts, 1), else_=0), limit))
+
+    if 'parish' in types:
+        parish_ids = [
+            id_ for name, id_ in reference_data.get('parishes').ids_by_name.items()
+            if any(key.startswith(term) for key in _word_suffixes(name))
+        ]
+        if parish_ids:
+            by_id = reference_data.get('parishes').by_id
+            counts = db.session.query(Property.parish_id, db.func.count(Property.prop_id))\
+                .filter(Property.parish_id.in_(parish_ids))\
+                .group_by(Property.parish_id)
+            suggestions.extend(
+                _suggestion('parish', by_id[parish_id]['name'], count=number, ref=parish_id)
+                for parish_id, number in counts
+            )
+
+    return sorted(suggestions, key=lambda suggestion: _rank(suggestion, term))[:limit]
+
+
+def _sql_fuzzy(term, types, limit):
+    """
+    Completions tolerant of typos, from the pg_trgm indexes: listings whose
+    text contains a word similar to term (word_similarity over the
+    pg_trgm.word_similarity_threshold), most similar first
+    """
+    suggestions = []
+    for kind, column in _text_columns().items():
+        if kind in types:
+            suggestions.extend(_sql_suggestions(
+                kind, column, column.op('%>')(term), db.func.word_similarity(term, column), limit
+            ))
+    return suggestions
+
+
+def suggest(text, types=SUGGEST_TYPES, limit=8):
+    """
+    Ranked typeahead completions for what a user has typed so far.
+
+    Prefixes are completed from the in-memory SuggestIndex (or with ILIKE
+    when it is disabled). When that finds fewer than limit completions and
+    the text is long enough to form trigrams, fuzzy matches from pg_trgm
+    fill the rest; SQL answers are cached until listings change.
+    Returns a list of {'type', 'text', 'count', 'search'} dicts.
+    """
+    config = current_app.config
+    term = normalize_term(text)
+    if len(term) < config.get('SEARCH_SUGGEST_MIN_LENGTH', 2):
+        return []
+
+    def signature(mode):
+        return filter_signature({'mode': mode, 'term': term, 'types': list(types), 'limit': limit}, exclude=())
+
+    suggestions = suggest_index.complete(term, types, limit)
+    if suggestions is None:
+        suggestions = search_cache.get_or_compute(
+            'suggest', signature('prefix'), lambda: _sql_prefix(term, types, limit)
+        )
+
+    if len(suggestions) < limit and len(term) >= config.get('SEARCH_SUGGEST_FUZZY_MIN_LENGTH', 3):
+        fuzzy = search_cache.get_or_compute(
+            'suggest', signature('fuzzy'), lambda: _sql_fuzzy(term, types, limit)
+        )
+        seen = {(suggestion['type'], suggestion['text'].lower()) for suggestion in suggestions}
+        extra = [
+            suggestion for suggestion in fuzzy
+            if (suggestion['type'], suggestion['text'].lower()) not in seen
+        ]
+        suggestions = suggestions + extra[:limit - len(suggestions)]
+
+    return suggestions
@@ -0,0 +1,59 @@
+# app/services/text_search.py
+from app import db
+from app.models.property import Property
+
+# Must match the configuration of the generated search_vector column
+TEXT_SEARCH_CONFIG = 'english'
+
+HEADLINE_OPTIONS = 'MaxWords=35, MinWords=15, MaxFragments=2, StartSel=<mark>, StopSel=</mark>'
+
+
+def keyword_tsquery(keyword):
+    """
+    Parse free text the way web search boxes do: words are AND-ed,
+    "quoted phrases" must appear together, 'or' alternates and -word excludes
+    """
+    return db.func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, keyword)
+
+
+def keyword_rank(keyword):
+    """ts_rank of a listing for a keyword, weighted title > location > description"""
+    return db.func.ts_rank(Property.search_vector, keyword_tsquery(keyword))
+
+
+def apply_keyword(query, keyword, order=True):
+    """
+    Restrict a Property query to listings matching keyword through the GIN
+    index on search_vector and, if order is set, sort by relevance (newest
+    first among equal ranks).
+    """
+    query = query.filter(Property.search_vector.op('@@')(keyword_tsquery(keyword)))
+    if order:
+        query = query.order_by(keyword_rank(keyword).desc(), Property.created_at.desc())
+    return query
+
+
+def snippets(prop_ids, keyword):
+    """
+    Highlighted description excerpts for a page of results, keyed by prop_id.
+    ts_headline re-parses the text, so it only runs for the listings returned.
+    """
+    if not prop_ids or not keyword:
+        return {}
+
+    tsquery = keyword_tsquery(keyword)
+    text = db.func.coalesce(Property.description, Property.title)
+    rows = db.session.query(
+        Property.prop_id,
+        db.func.ts_headline(TEXT_SEARCH_CONFIG, text, tsquery, HEADLINE_OPTIONS)
+    ).filter(Property.prop_id.in_(prop_ids))
+
+    return {prop_id: snippet for prop_id, snippet in rows}
+
+
+def attach_snippets(documents, keyword):
+    """Add a 'snippet' key to serialized listings (dicts with prop_id)"""
+    found = snippets([document['prop_id'] for document in documents], keyword)
+    for document in documents:
+        document['snippet'] = found.get(document['prop_id'])
+    return documents
@@ -0,0 +1,74 @@
+# app/services/view_tracker.py
+import logging
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app import db
+from app.models.property import UserPropertyInteraction
+from app.services.write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+
+class ViewBuffer(WriteBehindBuffer):
+    """
+    Buffers property detail views and writes them to
+    user_property_interactions in bulk.
+
+    Views of the same listing by the same user within one flush interval are
+    collapsed into a single (views, last_viewed) pair, so a flush costs one
+    multi-row INSERT ... ON CONFLICT DO UPDATE, however many page loads it
+    covers.
+    """
+
+    config_prefix = 'VIEW_BUFFER'
+
+    def record(self, user_id, prop_id, viewed_at=None):
+        """Count one view of a listing by a user"""
+        viewed_at = viewed_at or datetime.utcnow()
+        event = {'user_id': int(user_id), 'prop_id': int(prop_id), 'views': 1,
+                 'last_viewed': viewed_at.isoformat()}
+        self.add(self.key_for(event), event)
+
+    def key_for(self, event):
+        return (event['user_id'], event['prop_id'])
+
+    def merge(self, pending, key, event):
+        current = pending.get(key)
+        if current is None:
+            pending[key] = dict(event)
+        else:
+            current['views'] += event['views']
+            # ISO timestamps of the same format sort chronologically
+            current['last_viewed'] = max(current['last_viewed'], event['last_viewed'])
+
+    def write(self, batch):
+        now = datetime.utcnow()
+        rows = [
+            {'user_id': event['user_id'], 'prop_id': event['prop_id'], 'view_count': event['views'],
+             'last_viewed': datetime.fromisoformat(event['last_viewed']),
+             'created_at': now, 'updated_at': now}
+            for event in batch.values()
+        ]
+
+        # First views insert a row; repeat views add to it through the
+        # unique (user_id, prop_id) constraint
+        insert = pg_insert(UserPropertyInteraction).values(rows)
+        upsert = insert.on_conflict_do_update(
+            constraint='uq_user_property_interactions_user_prop',
+            set_={
+                'view_count': db.func.coalesce(UserPropertyInteraction.view_count, 0) + insert.excluded.view_count,
+                'last_viewed': db.func.greatest(UserPropertyInteraction.last_viewed, insert.excluded.last_viewed),
+                'updated_at': insert.excluded.updated_at,
+            }
+        )
+
+        try:
+            db.session.execute(upsert)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        logger.debug(f"Flushed {len(rows)} view counters")
+
+view_buffer = ViewBuffer()
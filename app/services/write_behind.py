@@ -0,0 +1,242 @@
+# app/services/write_behind.py
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+
+logger = logging.getLogger(__name__)
+
+# Failures of the connection or transaction rather than of particular
+# rows; the batch is retried whole on the next flush
+TRANSIENT_ERRORS = (OperationalError, InterfaceError, DisconnectionError)
+
+
+class WriteBehindBuffer:
+    """
+    Collects writes in memory and flushes them in batches from a background
+    thread, so request handlers never wait on a write transaction.
+
+    Subclasses set config_prefix and implement merge() and write(). Settings
+    are read from <prefix>_ENABLED, <prefix>_FLUSH_INTERVAL,
+    <prefix>_MAX_PENDING, <prefix>_MAX_RETRIES, <prefix>_LOG_PATH and
+    <prefix>_FSYNC.
+
+    A batch that fails because of its rows (a constraint violation, say) is
+    split in halves until the rows that fail on their own are isolated;
+    those are logged and dropped, the rest are written. A batch that fails
+    on the connection is kept and retried on later flushes, at most
+    <prefix>_MAX_RETRIES times per event.
+
+    With a log path, every event is also appended to a per-process log file
+    before it is acknowledged. Logs left behind by a process that died
+    before flushing are replayed on start-up. Without one, events still
+    buffered when the process is killed are lost; a normal shutdown flushes.
+    """
+
+    config_prefix = None
+
+    def __init__(self, app=None):
+        self.app = None
+        self.enabled = True
+        self.flush_interval = 10
+        self.max_pending = 1000
+        self.max_retries = 20
+        self.log_path = None
+        self.fsync = False
+        self._pending = {}
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._log_file = None
+        self._exit_hook = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        prefix = self.config_prefix
+        self.app = app
+        self.enabled = app.config.get(f'{prefix}_ENABLED', True)
+        self.flush_interval = app.config.get(f'{prefix}_FLUSH_INTERVAL', 10)
+        self.max_pending = app.config.get(f'{prefix}_MAX_PENDING', 1000)
+        self.max_retries = app.config.get(f'{prefix}_MAX_RETRIES', 20)
+        self.log_path = app.config.get(f'{prefix}_LOG_PATH')
+        self.fsync = app.config.get(f'{prefix}_FSYNC', False)
+        app.extensions[prefix.lower()] = self
+
+        if self.enabled and self.log_path:
+            self._replay_orphaned_logs()
+        # create_app() runs more than once per process; flush at exit only once
+        if not self._exit_hook:
+            atexit.register(self.flush)
+            self._exit_hook = True
+
+    # Subclass hooks
+
+    def merge(self, pending, key, event):
+        """Fold an event into the pending dict"""
+        raise NotImplementedError
+
+    def write(self, batch):
+        """Persist a batch (dict of merged events) inside an app context"""
+        raise NotImplementedError
+
+    def key_for(self, event):
+        """Key used to merge an event replayed from the log"""
+        raise NotImplementedError
+
+    # Buffering
+
+    def add(self, key, event):
+        if not self.enabled:
+            # Buffering disabled (e.g. tests): write straight through
+            batch = {}
+            self.merge(batch, key, event)
+            self.write(batch)
+            return
+
+        with self._lock:
+            if self.log_path:
+                self._append_log(event)
+            self.merge(self._pending, key, event)
+            pending = len(self._pending)
+
+        self._ensure_worker()
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write out everything buffered so far; returns the number of events written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                flushing_log = self._rotate_log() if batch else None
+
+            if not batch:
+                return 0
+
+            retry, dropped = self._write_isolating(batch)
+            for key in batch.keys() - retry.keys():
+                self._attempts.pop(key, None)
+
+            requeue = {}
+            for key, event in retry.items():
+                attempts = self._attempts.get(key, 0) + 1
+                if attempts > self.max_retries:
+                    logger.error(f"{type(self).__name__} dropped {key!r} after {attempts} failed flushes")
+                    self._attempts.pop(key, None)
+                else:
+                    self._attempts[key] = attempts
+                    requeue[key] = event
+
+            with self._lock:
+                for key, event in requeue.items():
+                    self.merge(self._pending, key, event)
+                    if self.log_path:
+                        self._append_log(event)
+            if flushing_log:
+                os.remove(flushing_log)
+            return len(batch) - len(retry) - len(dropped)
+
+    def _write_isolating(self, batch):
+        """
+        Write a batch, splitting it when its rows make it fail.
+        Returns (events to retry later, events dropped).
+        """
+        try:
+            with self.app.app_context():
+                self.write(batch)
+            return {}, {}
+        except TRANSIENT_ERRORS as e:
+            logger.error(f"{type(self).__name__} flush failed, will retry: {str(e)}")
+            return batch, {}
+        except Exception as e:
+            if len(batch) == 1:
+                (key, event), = batch.items()
+                logger.error(f"{type(self).__name__} dropped {key!r}, it cannot be written: {str(e)} ({event})")
+                return {}, batch
+
+        items = list(batch.items())
+        middle = len(items) // 2
+        retry_first, dropped_first = self._write_isolating(dict(items[:middle]))
+        retry_second, dropped_second = self._write_isolating(dict(items[middle:]))
+        return {**retry_first, **retry_second}, {**dropped_first, **dropped_second}
+
+    def _ensure_worker(self):
+        # Threads do not survive a fork, so track which process started it
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        self._thread_pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name=f'{type(self).__name__}-flush', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    # Append log
+
+    def _own_log(self):
+        return f'{self.log_path}.{os.getpid()}'
+
+    def _append_log(self, event):
+        if self._log_file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            self._log_file = open(self._own_log(), 'a', encoding='utf-8')
+        self._log_file.write(json.dumps(event) + '\n')
+        self._log_file.flush()
+        if self.fsync:
+            os.fsync(self._log_file.fileno())
+
+    def _rotate_log(self):
+        """Move the current log aside while its events are being written"""
+        if self._log_file is None:
+            return None
+        self._log_file.close()
+        self._log_file = None
+        flushing = self._own_log() + '.flushing'
+        os.replace(self._own_log(), flushing)
+        return flushing
+
+    def _replay_orphaned_logs(self):
+        for path in glob.glob(f'{self.log_path}.*'):
+            name = path[len(self.log_path) + 1:]
+            pid = name.split('.')[0]
+            if not pid.isdigit() or int(pid) == os.getpid() or _process_alive(int(pid)):
+                continue
+
+            # Workers starting together race for the same logs; the rename
+            # succeeds for one of them, and a crash mid-replay leaves the
+            # file under this (then dead) pid for the next start-up
+            claimed = f'{self._own_log()}.replaying.{name}'
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+
+            replayed = 0
+            with open(claimed, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        event = json.loads(line)
+                        self.add(self.key_for(event), event)
+                        replayed += 1
+            os.remove(claimed)
+            logger.info(f"Replayed {replayed} buffered events from {path}")
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
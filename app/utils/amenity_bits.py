@@ -0,0 +1,83 @@
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+# properties.amenity_bits is a signed BIGINT, so amenities 1..63 get a bit
+# (amen_id n <-> bit n - 1). Higher ids are only in property_amenities.
+MAX_AMENITY_BIT = 63
+
+
+def amenity_bit(amen_id: int) -> Optional[int]:
+    """
+    Returns the bit of an amenity.
+
+    Args:
+        amen_id: Amenity id
+
+    Returns:
+        The bit value, or None if the amenity has no bit
+    """
+    if amen_id is None or not 1 <= amen_id <= MAX_AMENITY_BIT:
+        return None
+    return 1 << (amen_id - 1)
+
+
+def has_amenity_bit(amen_id: int) -> bool:
+    """Checks whether an amenity is represented in amenity_bits"""
+    return amenity_bit(amen_id) is not None
+
+
+def amenity_mask(amen_ids: Iterable[int]) -> int:
+    """
+    Packs amenity ids into a bitset, skipping ids that have no bit.
+
+    Args:
+        amen_ids: Amenity ids
+
+    Returns:
+        The packed bitset
+    """
+    mask = 0
+    for amen_id in amen_ids:
+        bit = amenity_bit(amen_id)
+        if bit is not None:
+            mask |= bit
+    return mask
+
+
+def amenity_ids(bits: int) -> List[int]:
+    """Unpacks a bitset into the amenity ids it contains"""
+    bits = int(bits or 0)
+    return [index + 1 for index in range(MAX_AMENITY_BIT) if bits >> index & 1]
+
+
+def unpack_amenity_bits(values: Iterable[int], width: int = MAX_AMENITY_BIT) -> np.ndarray:
+    """
+    Expands packed bitsets into a dense 0/1 feature matrix.
+
+    Args:
+        values: amenity_bits of each listing
+        width: Number of leading amenity ids to keep
+
+    Returns:
+        uint8 array of shape (len(values), width); column j is amen_id j + 1
+    """
+    packed = np.asarray(list(values), dtype='<i8').reshape(-1, 1)
+    bits = np.unpackbits(packed.view(np.uint8), axis=1, bitorder='little')
+    return bits[:, :width]
+
+
+def amenity_match_matrix(values: Iterable[int], amen_ids: Iterable[int]) -> np.ndarray:
+    """
+    Tests many listings against several amenities with one vectorized AND.
+
+    Args:
+        values: amenity_bits of each listing
+        amen_ids: Amenity ids to test; ids without a bit never match
+
+    Returns:
+        bool array of shape (len(values), len(amen_ids))
+    """
+    packed = np.asarray(list(values), dtype=np.int64).reshape(-1, 1)
+    masks = np.array([amenity_bit(amen_id) or 0 for amen_id in amen_ids], dtype=np.int64)
+    return (packed & masks) != 0
@@ -0,0 +1,63 @@
+import math
+from typing import List, Tuple
+
+import numpy as np
+
+# Mean Earth radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = math.pi * EARTH_RADIUS_KM / 180
+
+# properties.geo_cell numbers a grid of GEO_CELL_DEGREES squares row by
+# row from (-90, -180); cell_ranges() must number cells the same way
+GEO_CELL_DEGREES = 0.05
+GEO_CELL_COLUMNS = 7200  # 360 / GEO_CELL_DEGREES
+GEO_CELL_EXPRESSION = (
+    "floor((latitude + 90) / 0.05)::bigint * 7200 + floor((longitude + 180) / 0.05)::bigint"
+)
+
+
+def cell_ranges(min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Tuple[int, int]]:
+    """
+    Covers a bounding box with contiguous runs of grid cells, one per row.
+
+    Each run is widened by a cell on every side so float rounding at cell
+    edges never drops a point; callers still test the exact coordinates.
+
+    Args:
+        min_lat, min_lon, max_lat, max_lon: Bounding box in degrees
+
+    Returns:
+        Inclusive (first cell, last cell) pairs
+    """
+    first_row = max(math.floor((min_lat + 90) / GEO_CELL_DEGREES) - 1, 0)
+    last_row = math.floor((max_lat + 90) / GEO_CELL_DEGREES) + 1
+    first_column = max(math.floor((min_lon + 180) / GEO_CELL_DEGREES) - 1, 0)
+    last_column = min(math.floor((max_lon + 180) / GEO_CELL_DEGREES) + 1, GEO_CELL_COLUMNS - 1)
+    return [
+        (row * GEO_CELL_COLUMNS + first_column, row * GEO_CELL_COLUMNS + last_column)
+        for row in range(first_row, last_row + 1)
+    ]
+
+
+def radius_bbox(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """
+    Returns the bounding box (min_lat, min_lon, max_lat, max_lon) of a
+    circle, clamped to valid coordinates (no wrapping at the antimeridian)
+    """
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = max(lat - lat_delta, -90.0), min(lat + lat_delta, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat < 1e-9:
+        return min_lat, -180.0, max_lat, 180.0
+    lon_delta = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    return min_lat, max(lon - lon_delta, -180.0), max_lat, min(lon + lon_delta, 180.0)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km. Works on floats or NumPy arrays; missing
+    coordinates (NaN) give NaN.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(value) for value in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
@@ -0,0 +1,68 @@
+from datetime import datetime
+from typing import Optional
+
+from flask import request, Response
+
+# Content codings whose representations get their own entity tag
+ENCODING_ETAG_SUFFIXES = ('gzip', 'br')
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """Entity tag of the representation compressed with encoding"""
+    return f'{etag}-{encoding}'
+
+
+def request_is_fresh(etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    Checks the request's conditional headers against the current version.
+
+    If-None-Match takes precedence over If-Modified-Since as required by
+    RFC 7232, and last_modified is compared at one second resolution since
+    that is all the HTTP date format carries.
+
+    Args:
+        etag: Current entity tag, without quotes
+        last_modified: Current modification time (naive UTC)
+
+    Returns:
+        True if the client's cached copy is still current
+    """
+    if request.if_none_match:
+        # Clients that received a compressed response send its tag back
+        return any(
+            request.if_none_match.contains(tag)
+            for tag in (etag, *(encoded_etag(etag, encoding) for encoding in ENCODING_ETAG_SUFFIXES))
+        )
+
+    if last_modified is not None and request.if_modified_since is not None:
+        since = request.if_modified_since.replace(tzinfo=None)
+        return last_modified.replace(microsecond=0) <= since
+
+    return False
+
+
+def not_modified(etag: str, cache_control: str, last_modified: Optional[datetime] = None) -> Response:
+    """Builds an empty 304 response carrying the validators"""
+    response = Response(status=304)
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+
+def cached_json_response(body: bytes, etag: str, cache_control: str,
+                         last_modified: Optional[datetime] = None) -> Response:
+    """
+    Serves a pre-serialized JSON body with validators, answering 304 when
+    the client already holds this version.
+    """
+    if request_is_fresh(etag, last_modified):
+        return not_modified(etag, cache_control, last_modified)
+
+    response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
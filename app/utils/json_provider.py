@@ -0,0 +1,147 @@
+import logging
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Callable, Iterable, Optional
+
+from flask import Response, current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+from app import db
+
+try:
+    import orjson
+except ImportError:  # Falls back to the stdlib encoder
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+
+def _default(o: Any) -> Any:
+    """Serializes types our models hand out that json does not know"""
+    if isinstance(o, Decimal):
+        return float(o)
+    return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider using orjson when it is installed.
+
+    Decimal columns (prices, coordinates) serialize as numbers. Every other
+    type, including datetimes, serializes exactly as with Flask's default
+    provider. Keys are not sorted, which is the largest single cost of the
+    default encoder on big list responses.
+    """
+
+    default = staticmethod(_default)
+    sort_keys = False
+
+    _ORJSON_OPTIONS = (
+        orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if orjson is not None else 0
+    )
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumpb(obj).decode('utf-8')
+
+    def dumpb(self, obj: Any, indent: bool = False) -> bytes:
+        """
+        Serializes to UTF-8 bytes without the str round trip.
+
+        Args:
+            obj: Value to serialize
+            indent: Pretty print with two space indentation
+
+        Returns:
+            Encoded JSON document
+        """
+        if orjson is None:
+            return super().dumps(obj, indent=2 if indent else None).encode('utf-8')
+
+        options = self._ORJSON_OPTIONS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=options)
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dumpb(obj, indent=indent), mimetype=self.mimetype)
+
+
+def stream_json_array(rows: Iterable[Any], serialize: Callable[[Any], Any],
+                      key: Optional[str] = None, envelope: Optional[dict] = None,
+                      chunk_size: Optional[int] = None) -> Response:
+    """
+    Streams a JSON array chunk by chunk.
+
+    SQLAlchemy queries are read through a server-side cursor in batches of
+    chunk_size, so only one batch of rows and encoded items is held in
+    memory at a time however many rows the response contains.
+
+    The first batch is fetched before this returns, so a query that fails
+    outright raises in the caller's try block. Once the status line is
+    sent a failure can no longer change it: the session is rolled back and
+    the stream ends without a complete document. With a key, an "error"
+    member follows the array; a bare array is left unterminated so the
+    client cannot mistake it for the full list.
+
+    Args:
+        rows: Query or iterable of items
+        serialize: Converts one item to a JSON-serializable value
+        key: If given, the array is the value of this key in an object
+        envelope: Other members of that object, written before the array
+        chunk_size: Rows fetched and items written per chunk, defaults
+            to JSON_STREAM_CHUNK_SIZE
+
+    Returns:
+        Streamed application/json response
+    """
+    chunk_size = chunk_size or current_app.config.get('JSON_STREAM_CHUNK_SIZE', 500)
+    provider = current_app.json
+    dumpb = provider.dumpb if hasattr(provider, 'dumpb') else \
+        (lambda obj: provider.dumps(obj).encode('utf-8'))
+
+    if hasattr(rows, 'yield_per'):
+        rows = rows.yield_per(chunk_size)
+
+    if key is None:
+        head, tail = b'[', b']'
+    else:
+        # Serialize the envelope with an empty array as its last member
+        # and split it open where the items go
+        members = {name: value for name, value in (envelope or {}).items() if name != key}
+        members[key] = []
+        encoded = dumpb(members)
+        head, tail = encoded[:-2], b']}'
+
+    rows = iter(rows)
+    first_chunk = [dumpb(serialize(row)) for row in islice(rows, chunk_size)]
+
+    def generate():
+        yield head + b','.join(first_chunk)
+        try:
+            chunk = []
+            for row in rows:
+                chunk.append(b',' + dumpb(serialize(row)))
+                if len(chunk) >= chunk_size:
+                    yield b''.join(chunk)
+                    chunk = []
+            if chunk:
+                yield b''.join(chunk)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Streamed response failed part way: {str(e)}")
+            if key is not None:
+                yield b'],"error":' + dumpb('Response truncated by a server error') + b'}'
+            return
+        yield tail
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
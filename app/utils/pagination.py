@@ -0,0 +1,67 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Encodes a (created_at, id) keyset position as an opaque URL-safe token.
+    """
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """
+    Decodes a token produced by encode_cursor.
+
+    Raises:
+        InvalidCursor: If the token is malformed
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor('Invalid pagination cursor')
+
+
+def clamp_limit(limit: Optional[int], default: int, maximum: int) -> int:
+    """Bounds a client supplied page size to [1, maximum]"""
+    if not limit or limit < 1:
+        return default
+    return min(limit, maximum)
+
+
+def keyset_paginate(query, created_col, id_col, limit: int, cursor: Optional[str] = None):
+    """
+    Applies newest-first keyset pagination on (created_col, id_col).
+
+    Rows are ordered by created_col DESC, id_col DESC and the cursor position
+    is applied as a row-value comparison, so a deep page costs the same index
+    range scan as the first one instead of skipping OFFSET rows.
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(created_col, id_col) < tuple_(created_at, row_id))
+
+    query = query.order_by(created_col.desc(), id_col.desc())
+
+    # Fetch one extra row to know whether another page exists
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
@@ -6,6 +6,8 @@ from app.models.preference import UserPreference, UserPropertyInteraction
 from app.models.property import Parish, PropertyType
 from sqlalchemy import func, desc
 from app import db
+from app.services.reference_data import reference_data
+from app.utils.amenity_bits import amenity_ids
 
 class DatabaseAdapter:
     """
@@ -52,17 +54,11 @@ class DatabaseAdapter:
             Parish.name.label('parish'),
             Property.latitude,
             Property.longitude,
-            func.array_agg(Amenity.name).label('amenities')
+            Property.amenity_bits
         ).join(
             PropertyType, Property.property_type_id == PropertyType.type_id
         ).outerjoin(
             Parish, Property.parish_id == Parish.parish_id
-        ).outerjoin(
-            Property.amenities
-        ).group_by(
-            Property.prop_id,
-            PropertyType.name,
-            Parish.name
         )
         
         if property_id:
@@ -76,6 +72,8 @@ class DatabaseAdapter:
         # Convert SQLAlchemy result to pandas DataFrame
         if not result:
             return pd.DataFrame()
+        
+        amenity_names = {amen_id: item['name'] for amen_id, item in reference_data.get('amenities').by_id.items()}
             
         data = [{
             'property_id': row.property_id,
@@ -88,7 +86,10 @@ class DatabaseAdapter:
             'parish': row.parish,
             'latitude': float(row.latitude) if row.latitude else None,
             'longitude': float(row.longitude) if row.longitude else None,
-            'amenities': [a for a in row.amenities if a is not None]
+            # Packed amenity vector; see app.utils.amenity_bits
+            'amenity_bits': row.amenity_bits or 0,
+            'amenities': [amenity_names[amen_id] for amen_id in amenity_ids(row.amenity_bits)
+                          if amen_id in amenity_names]
         } for row in result]
         
         return pd.DataFrame(data)
@@ -7,6 +7,9 @@ from scipy.sparse import csr_matrix
 from sklearn.neighbors import NearestNeighbors
 import logging
 from app.utils.ml_recommendation import MLPropertyRecommender
+from app.utils.amenity_bits import unpack_amenity_bits, amenity_match_matrix, has_amenity_bit
+from app.services.reference_data import reference_data
+from app.services.property_similarity import similar_listings
 
 logger = logging.getLogger(__name__)
 
@@ -64,18 +67,24 @@ class PropertyRecommendationEngine:
         # Categorical features (one-hot encoding)
         cat_features = pd.get_dummies(properties_df[['property_type', 'parish']])
         
-        # Extract amenities (assuming amenities is a list/array column)
-        all_amenities = set()
-        for amenities in properties_df['amenities']:
-            if amenities:
-                all_amenities.update(amenities)
-                
-        # Create amenity features
-        amenity_features = pd.DataFrame()
-        for amenity in all_amenities:
-            amenity_features[amenity] = properties_df['amenities'].apply(
-                lambda x: 1 if amenity in x else 0
-            )
+        if 'amenity_bits' in properties_df:
+            # Packed bitsets unpack straight into a 0/1 matrix; amenities no
+            # listing has are dropped
+            amenity_matrix = unpack_amenity_bits(properties_df['amenity_bits'])
+            amenity_features = pd.DataFrame(amenity_matrix[:, amenity_matrix.any(axis=0)])
+        else:
+            # Extract amenities (assuming amenities is a list/array column)
+            all_amenities = set()
+            for amenities in properties_df['amenities']:
+                if amenities:
+                    all_amenities.update(amenities)
+                    
+            # Create amenity features
+            amenity_features = pd.DataFrame()
+            for amenity in all_amenities:
+                amenity_features[amenity] = properties_df['amenities'].apply(
+                    lambda x: 1 if amenity in x else 0
+                )
             
         # Combine all features
         feature_matrix = np.hstack([
@@ -131,43 +140,38 @@ class PropertyRecommendationEngine:
                 type_scores = (properties_df['property_type'] == pref_value).astype(float)
                 scores += weight * type_scores
                 
-            elif pref_type == 'amenities':
+            elif pref_type == 'amenities' and pref_value:
                 # Amenity preferences
-                for amenity in pref_value:
-                    amenity_scores = properties_df['amenities'].apply(
-                        lambda x: 1 if amenity in x else 0
-                    )
-                    scores += (weight / len(pref_value)) * amenity_scores
+                pref_ids = [self._amenity_id(amenity) for amenity in pref_value]
+                if 'amenity_bits' in properties_df and all(has_amenity_bit(amen_id) for amen_id in pref_ids):
+                    # One vectorized AND per listing and preferred amenity
+                    matches = amenity_match_matrix(properties_df['amenity_bits'], pref_ids)
+                    scores += (weight / len(pref_value)) * matches.sum(axis=1)
+                else:
+                    for amenity in pref_value:
+                        amenity_scores = properties_df['amenities'].apply(
+                            lambda x: 1 if amenity in x else 0
+                        )
+                        scores += (weight / len(pref_value)) * amenity_scores
         
         return scores
     
+    @staticmethod
+    def _amenity_id(amenity):
+        """Amenity preferences may hold ids or names"""
+        if isinstance(amenity, int):
+            return amenity
+        return reference_data.lookup_id('amenities', str(amenity))
+    
     def get_similar_properties(self, property_id, n=5):
-        """Find similar properties using cosine similarity"""
-        properties_df = self.fetch_properties()
-        feature_matrix, property_ids = self.preprocess_properties(properties_df)
-        
-        # Calculate similarity matrix
-        similarity_matrix = cosine_similarity(feature_matrix)
-        
-        # Find the index of the target property
-        target_idx = np.where(property_ids == property_id)[0][0]
-        
-        # Get similarity scores for the target property
-        similarities = similarity_matrix[target_idx]
-        
-        # Get indices of most similar properties (excluding self)
-        similar_indices = np.argsort(similarities)[::-1][1:n+1]
-        
-        # Return similar property IDs and their similarity scores
-        similar_properties = [
+        """Find similar properties from the precomputed property_similarities table"""
+        return [
             {
-                'property_id': int(property_ids[idx]),
-                'similarity_score': float(similarities[idx])
+                'property_id': prop.prop_id,
+                'similarity_score': score
             }
-            for idx in similar_indices
+            for prop, score in similar_listings(property_id, n)
         ]
-        
-        return similar_properties
     
     def collaborative_filtering(self, user_id, n=5):
         """Recommend properties based on similar users' preferences"""
@@ -0,0 +1,36 @@
+"""Backfill properties.created_at and make it NOT NULL with a server default
+
+Revision ID: 1d7e4b2a9c53
+Revises: f6a2d94c1e87
+Create Date: 2026-10-17 09:14:22.630418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d7e4b2a9c53'
+down_revision = 'f6a2d94c1e87'
+branch_labels = None
+depends_on = None
+
+# Timestamps are stored as naive UTC, like datetime.utcnow() in the models
+UTC_NOW = sa.text("timezone('utc', now())")
+
+
+def upgrade():
+    # Listings inserted outside the ORM (the scraper) have no created_at;
+    # the keyset cursor over (created_at, prop_id) needs one on every row
+    op.execute("""
+        UPDATE properties
+        SET created_at = coalesce(updated_at, timezone('utc', now()))
+        WHERE created_at IS NULL
+    """)
+    op.alter_column('properties', 'created_at', existing_type=sa.DateTime(),
+                    nullable=False, server_default=UTC_NOW)
+
+
+def downgrade():
+    op.alter_column('properties', 'created_at', existing_type=sa.DateTime(),
+                    nullable=True, server_default=None)
@@ -0,0 +1,36 @@
+"""Backfill properties.updated_at and make it NOT NULL with a server default
+
+Revision ID: 2c8e5f1a7b39
+Revises: 9a3f6c1d2e84
+Create Date: 2026-10-17 11:20:37.104592
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8e5f1a7b39'
+down_revision = '9a3f6c1d2e84'
+branch_labels = None
+depends_on = None
+
+# Timestamps are stored as naive UTC, like datetime.utcnow() in the models
+UTC_NOW = sa.text("timezone('utc', now())")
+
+
+def upgrade():
+    # The in-process indexes pick up other workers' writes by updated_at;
+    # listings inserted without one (the scraper) never reached them
+    op.execute("""
+        UPDATE properties
+        SET updated_at = coalesce(created_at, timezone('utc', now()))
+        WHERE updated_at IS NULL
+    """)
+    op.alter_column('properties', 'updated_at', existing_type=sa.DateTime(),
+                    nullable=False, server_default=UTC_NOW)
+
+
+def downgrade():
+    op.alter_column('properties', 'updated_at', existing_type=sa.DateTime(),
+                    nullable=True, server_default=None)
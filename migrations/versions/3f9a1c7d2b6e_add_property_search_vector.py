@@ -0,0 +1,44 @@
+"""Add weighted full-text search vector to properties
+
+Revision ID: 3f9a1c7d2b6e
+Revises: 8c5e240eaf77
+Create Date: 2026-10-16 09:12:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c7d2b6e'
+down_revision = '8c5e240eaf77'
+branch_labels = None
+depends_on = None
+
+# Title ranks above location, which ranks above the description
+SEARCH_VECTOR_EXPRESSION = (
+    "setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(city, '') || ' ' || coalesce(address, '')), 'B') || "
+    "setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'C')"
+)
+
+
+def upgrade():
+    # A stored generated column is maintained by PostgreSQL on every write
+    op.add_column('properties', sa.Column(
+        'search_vector',
+        postgresql.TSVECTOR(),
+        sa.Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+        nullable=True
+    ))
+    op.create_index(
+        'ix_properties_search_vector',
+        'properties',
+        ['search_vector'],
+        postgresql_using='gin'
+    )
+
+
+def downgrade():
+    op.drop_index('ix_properties_search_vector', table_name='properties')
+    op.drop_column('properties', 'search_vector')
@@ -0,0 +1,45 @@
+"""Add search aggregates for compacted search history
+
+Revision ID: 5e7c2a9d4f10
+Revises: d2a8f3b61c94
+Create Date: 2026-10-16 16:03:21.540982
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7c2a9d4f10'
+down_revision = 'd2a8f3b61c94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('search_aggregates',
+        sa.Column('aggregate_id', sa.Integer(), nullable=False),
+        sa.Column('signature', sa.String(length=40), nullable=False),
+        sa.Column('search_query', sa.Text(), nullable=False),
+        sa.Column('search_params', sa.JSON(), nullable=True),
+        sa.Column('search_count', sa.Integer(), nullable=False),
+        sa.Column('first_seen', sa.DateTime(), nullable=True),
+        sa.Column('last_seen', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('aggregate_id'),
+        sa.UniqueConstraint('signature')
+    )
+    op.create_index(op.f('ix_search_aggregates_search_count'), 'search_aggregates', ['search_count'], unique=False)
+    op.create_index(op.f('ix_search_aggregates_last_seen'), 'search_aggregates', ['last_seen'], unique=False)
+
+    op.add_column('search_history', sa.Column('aggregated', sa.Boolean(), server_default=sa.false(), nullable=False))
+    # Compaction only scans rows it has not rolled up yet
+    op.create_index('ix_search_history_pending', 'search_history', ['search_date'], unique=False,
+                    postgresql_where=sa.text('NOT aggregated'))
+
+
+def downgrade():
+    op.drop_index('ix_search_history_pending', table_name='search_history')
+    op.drop_column('search_history', 'aggregated')
+    op.drop_index(op.f('ix_search_aggregates_last_seen'), table_name='search_aggregates')
+    op.drop_index(op.f('ix_search_aggregates_search_count'), table_name='search_aggregates')
+    op.drop_table('search_aggregates')
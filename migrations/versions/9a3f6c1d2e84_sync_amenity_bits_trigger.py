@@ -0,0 +1,71 @@
+"""Keep amenity_bits in sync with a trigger on property_amenities
+
+Revision ID: 9a3f6c1d2e84
+Revises: 1d7e4b2a9c53
+Create Date: 2026-10-16 16:05:41.318207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3f6c1d2e84'
+down_revision = '1d7e4b2a9c53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Same definition as app.models.property.AMENITY_BITS_TRIGGER
+    op.execute("""
+        CREATE OR REPLACE FUNCTION sync_property_amenity_bits() RETURNS trigger AS $$
+        BEGIN
+            UPDATE properties p
+            SET amenity_bits = packed.bits,
+                updated_at = timezone('utc', clock_timestamp())
+            FROM (
+                SELECT touched.prop_id,
+                       coalesce(bit_or(1::bigint << (pa.amen_id - 1)) FILTER (WHERE pa.amen_id BETWEEN 1 AND 63), 0) AS bits
+                FROM (SELECT DISTINCT prop_id FROM changed) AS touched
+                LEFT JOIN property_amenities pa ON pa.prop_id = touched.prop_id
+                GROUP BY touched.prop_id
+            ) AS packed
+            WHERE p.prop_id = packed.prop_id;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("DROP TRIGGER IF EXISTS property_amenities_insert_bits ON property_amenities")
+    op.execute("""
+        CREATE TRIGGER property_amenities_insert_bits AFTER INSERT ON property_amenities
+            REFERENCING NEW TABLE AS changed
+            FOR EACH STATEMENT EXECUTE FUNCTION sync_property_amenity_bits()
+    """)
+    op.execute("DROP TRIGGER IF EXISTS property_amenities_delete_bits ON property_amenities")
+    op.execute("""
+        CREATE TRIGGER property_amenities_delete_bits AFTER DELETE ON property_amenities
+            REFERENCING OLD TABLE AS changed
+            FOR EACH STATEMENT EXECUTE FUNCTION sync_property_amenity_bits()
+    """)
+
+    # Listings the scraper wrote since b7d41e08c5a2 still have stale bits
+    op.execute("""
+        UPDATE properties p
+        SET amenity_bits = packed.bits,
+            updated_at = timezone('utc', now())
+        FROM (
+            SELECT p2.prop_id,
+                   coalesce(bit_or(1::bigint << (pa.amen_id - 1)) FILTER (WHERE pa.amen_id BETWEEN 1 AND 63), 0) AS bits
+            FROM properties p2
+            LEFT JOIN property_amenities pa ON pa.prop_id = p2.prop_id
+            GROUP BY p2.prop_id
+        ) AS packed
+        WHERE p.prop_id = packed.prop_id AND p.amenity_bits <> packed.bits
+    """)
+
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS property_amenities_delete_bits ON property_amenities")
+    op.execute("DROP TRIGGER IF EXISTS property_amenities_insert_bits ON property_amenities")
+    op.execute("DROP FUNCTION IF EXISTS sync_property_amenity_bits()")
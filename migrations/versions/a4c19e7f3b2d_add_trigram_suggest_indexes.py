@@ -0,0 +1,34 @@
+"""Add pg_trgm indexes for typeahead suggestions
+
+Revision ID: a4c19e7f3b2d
+Revises: 5e7c2a9d4f10
+Create Date: 2026-10-16 23:20:37.104582
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = 'a4c19e7f3b2d'
+down_revision = '5e7c2a9d4f10'
+branch_labels = None
+depends_on = None
+
+# Trigram GIN indexes serve fuzzy suggestions (%>) and ILIKE '%term%' filters
+TRIGRAM_COLUMNS = ('city', 'address', 'title')
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for column in TRIGRAM_COLUMNS:
+        op.create_index(
+            f'ix_properties_{column}_trgm',
+            'properties',
+            [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'}
+        )
+
+
+def downgrade():
+    for column in TRIGRAM_COLUMNS:
+        op.drop_index(f'ix_properties_{column}_trgm', table_name='properties')
@@ -0,0 +1,38 @@
+"""Add amenity bitset to properties
+
+Revision ID: b7d41e08c5a2
+Revises: 3f9a1c7d2b6e
+Create Date: 2026-10-16 11:40:07.902614
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d41e08c5a2'
+down_revision = '3f9a1c7d2b6e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('properties', sa.Column('amenity_bits', sa.BigInteger(), server_default='0', nullable=False))
+
+    # Amenity n sets bit n - 1; ids above 63 do not fit a signed BIGINT and
+    # are only matched through property_amenities
+    op.execute("""
+        UPDATE properties p
+        SET amenity_bits = packed.bits
+        FROM (
+            SELECT prop_id, bit_or(1::bigint << (amen_id - 1)) AS bits
+            FROM property_amenities
+            WHERE amen_id BETWEEN 1 AND 63
+            GROUP BY prop_id
+        ) AS packed
+        WHERE p.prop_id = packed.prop_id
+    """)
+
+
+def downgrade():
+    op.drop_column('properties', 'amenity_bits')
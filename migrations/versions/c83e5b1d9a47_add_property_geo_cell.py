@@ -0,0 +1,37 @@
+"""Add map grid cell to properties for area searches
+
+Revision ID: c83e5b1d9a47
+Revises: a4c19e7f3b2d
+Create Date: 2026-10-16 23:48:12.662390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'c83e5b1d9a47'
+down_revision = 'a4c19e7f3b2d'
+branch_labels = None
+depends_on = None
+
+# Must match app.utils.geo.GEO_CELL_EXPRESSION: 0.05 degree cells numbered
+# row by row from (-90, -180)
+GEO_CELL_EXPRESSION = (
+    "floor((latitude + 90) / 0.05)::bigint * 7200 + floor((longitude + 180) / 0.05)::bigint"
+)
+
+
+def upgrade():
+    # A stored generated column is maintained by PostgreSQL on every write
+    op.add_column('properties', sa.Column(
+        'geo_cell',
+        sa.BigInteger(),
+        sa.Computed(GEO_CELL_EXPRESSION, persisted=True),
+        nullable=True
+    ))
+    op.create_index('ix_properties_geo_cell', 'properties', ['geo_cell'])
+
+
+def downgrade():
+    op.drop_index('ix_properties_geo_cell', table_name='properties')
+    op.drop_column('properties', 'geo_cell')
@@ -0,0 +1,29 @@
+"""Add signature and hit count to search history
+
+Revision ID: d2a8f3b61c94
+Revises: b7d41e08c5a2
+Create Date: 2026-10-16 15:12:44.318027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a8f3b61c94'
+down_revision = 'b7d41e08c5a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('search_history', sa.Column('signature', sa.String(length=40), nullable=True))
+    op.add_column('search_history', sa.Column('hit_count', sa.Integer(), server_default='1', nullable=False))
+    op.create_index('ix_search_history_user_signature', 'search_history',
+                    ['user_id', 'signature', 'search_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_search_history_user_signature', table_name='search_history')
+    op.drop_column('search_history', 'hit_count')
+    op.drop_column('search_history', 'signature')
@@ -0,0 +1,127 @@
+"""Add composite and partial indexes for hot query shapes; unique interactions
+
+Revision ID: e51b7c3a08d6
+Revises: c83e5b1d9a47
+Create Date: 2026-10-17 00:21:55.407316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e51b7c3a08d6'
+down_revision = 'c83e5b1d9a47'
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, options). Filters on parish, type, owner and
+# price end in the (created_at, prop_id) sort and keyset cursor used by
+# the listing and search endpoints, so those pages are read in index order.
+INDEXES = [
+    ('ix_properties_created_at', 'properties', ['created_at', 'prop_id'], {}),
+    ('ix_properties_active_created_at', 'properties', ['created_at', 'prop_id'],
+     {'postgresql_where': sa.text("status = 'Active'")}),
+    ('ix_properties_parish_created_at', 'properties', ['parish_id', 'created_at', 'prop_id'], {}),
+    ('ix_properties_type_created_at', 'properties', ['property_type_id', 'created_at', 'prop_id'], {}),
+    ('ix_properties_parish_price', 'properties', ['parish_id', 'price'], {}),
+    ('ix_properties_bedrooms_price', 'properties', ['bedrooms', 'price'], {}),
+    ('ix_properties_price', 'properties', ['price', 'prop_id'], {}),
+    ('ix_properties_owner_created_at', 'properties', ['owner_id', 'created_at'], {}),
+    ('ix_properties_agent_id', 'properties', ['agent_id'],
+     {'postgresql_where': sa.text('agent_id IS NOT NULL')}),
+    # Delta refreshes of the in-process listing, suggest and cluster indexes
+    ('ix_properties_updated_at', 'properties', ['updated_at'], {}),
+    ('ix_user_property_interactions_prop_id', 'user_property_interactions', ['prop_id'], {}),
+    ('ix_search_history_user_date', 'search_history', ['user_id', 'search_date'], {}),
+    ('ix_property_images_prop_id', 'property_images', ['prop_id', 'is_primary'], {}),
+    ('ix_saved_properties_prop_id', 'saved_properties', ['prop_id'], {}),
+]
+
+INTERACTION_UNIQUE = 'uq_user_property_interactions_user_prop'
+
+
+def upgrade():
+    # Fold duplicate interactions into the oldest row so (user_id, prop_id)
+    # can be unique; runs in the migration's transaction
+    op.execute("""
+        WITH merged AS (
+            SELECT user_id, prop_id,
+                   min(interaction_id) AS keep_id,
+                   sum(coalesce(view_count, 0)) AS view_count,
+                   max(last_viewed) AS last_viewed,
+                   max(interaction_score) AS interaction_score,
+                   min(created_at) AS created_at,
+                   max(updated_at) AS updated_at
+            FROM user_property_interactions
+            GROUP BY user_id, prop_id
+            HAVING count(*) > 1
+        ),
+        folded AS (
+            UPDATE user_property_interactions i
+            SET view_count = merged.view_count,
+                last_viewed = merged.last_viewed,
+                interaction_score = merged.interaction_score,
+                created_at = merged.created_at,
+                updated_at = merged.updated_at
+            FROM merged
+            WHERE i.interaction_id = merged.keep_id
+        )
+        DELETE FROM user_property_interactions i
+        USING merged
+        WHERE i.user_id = merged.user_id
+          AND i.prop_id = merged.prop_id
+          AND i.interaction_id <> merged.keep_id
+    """)
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and does
+    # not block writes while it builds. A failed build leaves an INVALID
+    # index behind; only those are dropped, so re-running the step rebuilds
+    # what failed and keeps what was built.
+    bind = op.get_bind()
+    constrained = _has_constraint(bind, INTERACTION_UNIQUE)
+    with op.get_context().autocommit_block():
+        invalid = _invalid_indexes(bind)
+        for name, table, columns, options in INDEXES:
+            if name in invalid:
+                op.drop_index(name, table_name=table, postgresql_concurrently=True)
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+
+        # Once adopted by the constraint the index belongs to it
+        if not constrained:
+            if INTERACTION_UNIQUE in invalid:
+                op.drop_index(INTERACTION_UNIQUE, table_name='user_property_interactions',
+                              postgresql_concurrently=True)
+            op.create_index(INTERACTION_UNIQUE, 'user_property_interactions', ['user_id', 'prop_id'],
+                            unique=True, postgresql_concurrently=True, if_not_exists=True)
+
+    if not constrained:
+        # Adopting the built index as the constraint only takes a brief lock
+        op.execute(
+            f'ALTER TABLE user_property_interactions '
+            f'ADD CONSTRAINT {INTERACTION_UNIQUE} UNIQUE USING INDEX {INTERACTION_UNIQUE}'
+        )
+
+
+def _has_constraint(bind, name):
+    return bind.execute(
+        sa.text("SELECT 1 FROM pg_constraint WHERE conname = :name"), {'name': name}
+    ).first() is not None
+
+
+def _invalid_indexes(bind):
+    """Names of indexes in the current schema left INVALID by a failed concurrent build"""
+    return set(bind.execute(sa.text("""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = current_schema()
+    """)).scalars())
+
+
+def downgrade():
+    op.drop_constraint(INTERACTION_UNIQUE, 'user_property_interactions', type_='unique')
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,38 @@
+"""Add precomputed top-k property similarities
+
+Revision ID: f6a2d94c1e87
+Revises: e51b7c3a08d6
+Create Date: 2026-10-17 00:58:30.281945
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a2d94c1e87'
+down_revision = 'e51b7c3a08d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Filled by `flask refresh-similarities` and kept current on listing writes
+    op.create_table(
+        'property_similarities',
+        sa.Column('prop_id', sa.Integer(), nullable=False),
+        sa.Column('rank', sa.SmallInteger(), nullable=False),
+        sa.Column('similar_prop_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('computed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['prop_id'], ['properties.prop_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['similar_prop_id'], ['properties.prop_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('prop_id', 'rank')
+    )
+    op.create_index('ix_property_similarities_similar_prop_id', 'property_similarities',
+                    ['similar_prop_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_property_similarities_similar_prop_id', table_name='property_similarities')
+    op.drop_table('property_similarities')
@@ -6,6 +6,9 @@ import click
 from flask.cli import with_appcontext
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.services.recommendation_service import update_property_interaction_scores
+from app.services.search_aggregates import compact_search_history, prewarm_search_caches
+from app.services.search_cache import search_cache
+from app.services.property_similarity import rebuild_similarities
 
 app = create_app(os.getenv('FLASK_CONFIG') or 'development')
 migrate = Migrate(app, db)
@@ -19,6 +22,31 @@ scheduler.add_job(
     id='train_recommendation_model'
 )
 
+def compact_searches():
+    """Roll search history into the popular-search aggregates, then pre-warm their caches (shared cache only)"""
+    with app.app_context():
+        compact_search_history()
+        prewarm_search_caches()
+
+scheduler.add_job(
+    compact_searches,
+    'interval',
+    minutes=app.config.get('SEARCH_COMPACTION_INTERVAL_MINUTES', 60),
+    id='compact_search_history'
+)
+
+def rebuild_property_similarities():
+    """Recompute every listing's precomputed similar listings"""
+    with app.app_context():
+        rebuild_similarities()
+
+scheduler.add_job(
+    rebuild_property_similarities,
+    'cron',
+    hour=app.config.get('SIMILARITY_REFRESH_HOUR', 4),
+    id='rebuild_property_similarities'
+)
+
 # Start scheduler with the app
 if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
     scheduler.start()
@@ -31,10 +59,10 @@ def make_shell_context():
     from app.models.user import User, Profile
     from app.models.property import (
         Property, PropertyImage, PropertyType, Parish, 
-        Amenity, SavedProperty, UserPropertyInteraction
+        Amenity, SavedProperty, UserPropertyInteraction, PropertySimilarity
     )
     from app.models.preference import UserPreference
-    from app.models.search import SearchHistory
+    from app.models.search import SearchHistory, SearchAggregate
     
     return dict(
         db=db, 
@@ -47,8 +75,10 @@ def make_shell_context():
         Amenity=Amenity,
         SavedProperty=SavedProperty,
         UserPropertyInteraction=UserPropertyInteraction,
+        PropertySimilarity=PropertySimilarity,
         UserPreference=UserPreference,
-        SearchHistory=SearchHistory
+        SearchHistory=SearchHistory,
+        SearchAggregate=SearchAggregate
     )
 
 @app.cli.command("init-db")
@@ -111,6 +141,21 @@ def train_model():
     else:
         print("Model training skipped - insufficient data")
 
+@app.cli.command("compact-searches")
+def compact_searches_command():
+    """Roll search history into search_aggregates and pre-warm popular searches"""
+    aggregated, deleted = compact_search_history()
+    print(f"Aggregated {aggregated} searches, deleted {deleted} expired history rows")
+    if search_cache.shared:
+        print(f"Pre-warmed {prewarm_search_caches()} popular searches")
+    else:
+        print("Skipped pre-warming popular searches: no shared cache (CACHE_REDIS_URL)")
+
+@app.cli.command("refresh-similarities")
+def refresh_similarities_command():
+    """Recompute the precomputed similar listings of every property"""
+    print(f"Stored similar properties for {rebuild_similarities()} listings")
+
 @app.cli.command("sample-data")
 def add_sample_data():
     """Add sample properties for testing"""
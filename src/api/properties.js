@@ -30,6 +30,27 @@ export const getProperties = async (params = {}) => {
   }
 };
 
+/**
+ * Get every property matching the filters, following the keyset cursor
+ * across pages; used by dashboards that list all of a user's properties
+ * @param {Object} params - Query parameters and filters
+ * @returns {Promise} Promise resolving to { properties }
+ */
+export const getAllProperties = async (params = {}) => {
+  const properties = [];
+  let cursor = null;
+  do {
+    const page = await getProperties({
+      ...params,
+      limit: 200,
+      ...(cursor ? { cursor } : {})
+    });
+    properties.push(...(page?.properties || []));
+    cursor = page?.next_cursor || null;
+  } while (cursor);
+  return { properties };
+};
+
 /**
  * Search properties with advanced filters
  * @param {Object} filters - Search filters
@@ -34,7 +34,7 @@ import HomeIcon from '@mui/icons-material/Home';
 import { useAuth } from '../../hooks/useAuth';
 
 // Import API functions
-import { getProperties, getPropertyStatistics } from '../../api/properties';
+import { getAllProperties, getPropertyStatistics } from '../../api/properties';
 
 const AgentContent = ({ activeTab, user }) => {
   const navigate = useNavigate();
@@ -69,7 +69,7 @@ const AgentContent = ({ activeTab, user }) => {
       const fetchProperties = async () => {
         setLoading(prev => ({ ...prev, properties: true }));
         try {
-          const response = await getProperties({ agent_id: user.user_id });
+          const response = await getAllProperties({ agent_id: user.user_id });
           
           // Handle different response formats
           let propertiesData = [];
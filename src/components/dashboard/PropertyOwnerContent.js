@@ -38,7 +38,7 @@ import EditIcon from '@mui/icons-material/Edit';
 import DeleteIcon from '@mui/icons-material/Delete';
 import InfoIcon from '@mui/icons-material/Info';
 import { useAuth } from '../../hooks/useAuth';
-import { getProperties, getPropertyStatistics, deleteProperty } from '../../api/properties';
+import { getAllProperties, getPropertyStatistics, deleteProperty } from '../../api/properties';
 
 const PropertyOwnerContent = ({ activeTab, user }) => {
   const navigate = useNavigate();
@@ -66,7 +66,7 @@ const PropertyOwnerContent = ({ activeTab, user }) => {
 
   const fetchMyProperties = async () => {
     try {
-      const response = await getProperties({ owner_id: user.user_id });
+      const response = await getAllProperties({ owner_id: user.user_id });
       let propertiesData = [];
       if (response?.properties && Array.isArray(response.properties)) {
         propertiesData = response.properties;
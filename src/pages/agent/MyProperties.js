@@ -20,7 +20,7 @@ import { useNavigate, useLocation } from 'react-router-dom';
 import AddIcon from '@mui/icons-material/Add';
 import HomeIcon from '@mui/icons-material/Home';
 import { useAuth } from '../../hooks/useAuth';
-import { getProperties } from '../../api/properties';
+import { getAllProperties } from '../../api/properties';
 
 const MyProperties = () => {
   const navigate = useNavigate();
@@ -61,7 +61,7 @@ const MyProperties = () => {
         }
 
         // Get property data - providing both agent_id and user_id to handle different API implementations
-        const response = await getProperties({ 
+        const response = await getAllProperties({ 
           agent_id: user.user_id,
           user_id: user.user_id 
         });
@@ -24,7 +24,7 @@ import PeopleIcon from '@mui/icons-material/People';
 import SearchIcon from '@mui/icons-material/Search';
 import HomeIcon from '@mui/icons-material/Home';
 import { useAuth } from '../../hooks/useAuth';
-import { getProperties } from '../../api/properties';
+import { getAllProperties } from '../../api/properties';
 import { getClients } from '../../api/clients';
 
 const AgentHome = () => {
@@ -58,7 +58,7 @@ const AgentHome = () => {
         console.log('Current user:', user);
         
         // Get property data - providing both agent_id and user_id 
-        const response = await getProperties({ 
+        const response = await getAllProperties({ 
           agent_id: user.user_id,
           user_id: user.user_id 
         });
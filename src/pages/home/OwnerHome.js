@@ -27,7 +27,7 @@ import EditIcon from '@mui/icons-material/Edit';
 import HomeIcon from '@mui/icons-material/Home';
 import TrendingUpIcon from '@mui/icons-material/TrendingUp';
 import { useAuth } from '../../hooks/useAuth';
-import { getProperties, getPropertyStatistics } from '../../api/properties';
+import { getAllProperties, getPropertyStatistics } from '../../api/properties';
 
 const OwnerHome = () => {
   const navigate = useNavigate();
@@ -69,7 +69,7 @@ const OwnerHome = () => {
       setLoading(true);
       try {
         // Fetch properties
-        const propertiesRes = await getProperties({ owner_id: user.user_id });
+        const propertiesRes = await getAllProperties({ owner_id: user.user_id });
         
         // Normalize the response structure
         let propertiesData = [];
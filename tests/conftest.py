@@ -0,0 +1,135 @@
+# tests/conftest.py
+import itertools
+from contextlib import contextmanager
+from decimal import Decimal
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from app import create_app, db as _db
+
+
+@pytest.fixture(scope='session')
+def app():
+    app = create_app('testing')
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def database(app):
+    """
+    The schema in TEST_DATABASE_URL, created once per run. It must be
+    PostgreSQL with pg_trgm available; tests that need the database are
+    skipped when it cannot be reached.
+    """
+    try:
+        with _db.engine.begin() as connection:
+            connection.execute(_db.text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+    except OperationalError as e:
+        pytest.skip(f'PostgreSQL test database unavailable: {e.orig}')
+
+    _db.drop_all()
+    _db.create_all()
+    yield _db
+    _db.session.remove()
+    _db.drop_all()
+
+
+@pytest.fixture
+def session(database):
+    """The database session; every table is emptied and in-process caches cleared afterwards"""
+    from app.services.property_cache import property_cache
+    from app.services.reference_data import reference_data
+    from app.services.search_cache import search_cache
+
+    yield database.session
+
+    database.session.rollback()
+    tables = ', '.join(table.name for table in database.metadata.sorted_tables)
+    database.session.execute(database.text(f'TRUNCATE {tables} RESTART IDENTITY CASCADE'))
+    database.session.commit()
+    database.session.expunge_all()
+    property_cache.clear()
+    search_cache.clear()
+    reference_data.invalidate()
+
+
+@pytest.fixture
+def owner(session):
+    from app.models.user import User
+
+    user = User(email='owner@example.com', password_hash='x',
+                user_type=['property_owner'], active_user_type='property_owner')
+    session.add(user)
+    session.commit()
+    return user
+
+
+@pytest.fixture
+def make_property(session, owner):
+    """Factory for listings; reference rows are created by name on first use"""
+    from app.models.property import Amenity, Parish, Property, PropertyType
+
+    counter = itertools.count(1)
+    references = {}
+
+    def reference(model, name):
+        key = (model, name)
+        if key not in references:
+            row = model.query.filter_by(name=name).first() or model(name=name)
+            session.add(row)
+            session.flush()
+            references[key] = row
+        return references[key]
+
+    def make(property_type='House', parish='Kingston', amenities=(), commit=True, **fields):
+        number = next(counter)
+        values = {
+            'title': f'Listing {number}',
+            'price': Decimal(100000 + number),
+            'bedrooms': 3,
+            'bathrooms': Decimal(2),
+            'city': 'Kingston',
+            'status': 'Active',
+            'owner_id': owner.user_id,
+        }
+        values.update(fields)
+        if property_type is not None:
+            values['property_type'] = reference(PropertyType, property_type)
+        if parish is not None:
+            values['parish'] = reference(Parish, parish)
+        values['amenities'] = [reference(Amenity, name) for name in amenities]
+        prop = Property(**values)
+        session.add(prop)
+        if commit:
+            session.commit()
+        return prop
+
+    return make
+
+
+@pytest.fixture
+def count_queries(database):
+    """Context manager collecting the SQL statements run inside it"""
+    from sqlalchemy import event
+
+    @contextmanager
+    def counted():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(database.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(database.engine, 'before_cursor_execute', record)
+
+    return counted
@@ -0,0 +1,82 @@
+# tests/test_amenity_bits.py
+import numpy as np
+
+from app import db
+from app.models.property import Amenity, Property
+from app.services.amenity_filter import amenity_predicate
+from app.utils.amenity_bits import (
+    MAX_AMENITY_BIT, amenity_ids, amenity_mask, amenity_match_matrix, unpack_amenity_bits
+)
+
+
+def test_pack_and_unpack_round_trip():
+    ids = [1, 2, 17, 63]
+    bits = amenity_mask(ids)
+    assert amenity_ids(bits) == ids
+    # The highest id still fits a signed BIGINT
+    assert amenity_mask([MAX_AMENITY_BIT]) == 1 << 62
+
+    matrix = unpack_amenity_bits([bits, 0])
+    assert matrix.shape == (2, MAX_AMENITY_BIT)
+    assert list(np.flatnonzero(matrix[0]) + 1) == ids
+    assert not matrix[1].any()
+
+
+def test_ids_without_a_bit_are_skipped():
+    assert amenity_mask([0, 64, 200, None]) == 0
+    assert amenity_mask([3, 64]) == amenity_mask([3])
+
+
+def test_match_matrix():
+    values = [amenity_mask([1, 5]), amenity_mask([5]), 0]
+    assert amenity_match_matrix(values, [1, 5, 64]).tolist() == [
+        [True, True, False],
+        [False, True, False],
+        [False, False, False],
+    ]
+
+
+def stored_bits(session, prop_id):
+    return session.execute(
+        db.text('SELECT amenity_bits FROM properties WHERE prop_id = :prop_id'), {'prop_id': prop_id}
+    ).scalar()
+
+
+def test_orm_writes_keep_bits_in_sync(session, make_property):
+    prop = make_property(amenities=('Pool', 'Gym'))
+    pool, gym = Amenity.query.filter_by(name='Pool').one(), Amenity.query.filter_by(name='Gym').one()
+    expected = amenity_mask([pool.amen_id, gym.amen_id])
+    assert prop.amenity_bits == expected
+    assert stored_bits(session, prop.prop_id) == expected
+
+    before = prop.updated_at
+    prop.amenities.remove(gym)
+    session.commit()
+    assert stored_bits(session, prop.prop_id) == amenity_mask([pool.amen_id])
+    assert prop.amenity_bits == amenity_mask([pool.amen_id])
+    assert prop.updated_at > before
+
+
+def test_raw_sql_writes_keep_bits_in_sync(session, make_property):
+    prop = make_property()
+    make_property(amenities=('Pool', 'Gym'))
+    pool, gym = Amenity.query.filter_by(name='Pool').one(), Amenity.query.filter_by(name='Gym').one()
+
+    # The scraper links amenities one row at a time with psycopg2
+    for amen_id in (pool.amen_id, gym.amen_id):
+        session.execute(
+            db.text('INSERT INTO property_amenities (prop_id, amen_id) VALUES (:prop_id, :amen_id) ON CONFLICT DO NOTHING'),
+            {'prop_id': prop.prop_id, 'amen_id': amen_id}
+        )
+    session.commit()
+    assert stored_bits(session, prop.prop_id) == amenity_mask([pool.amen_id, gym.amen_id])
+
+    matches = Property.query.filter(amenity_predicate([str(pool.amen_id), str(gym.amen_id)])).count()
+    assert matches == 2
+
+    session.execute(
+        db.text('DELETE FROM property_amenities WHERE prop_id = :prop_id AND amen_id = :amen_id'),
+        {'prop_id': prop.prop_id, 'amen_id': gym.amen_id}
+    )
+    session.commit()
+    assert stored_bits(session, prop.prop_id) == amenity_mask([pool.amen_id])
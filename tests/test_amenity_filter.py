@@ -0,0 +1,45 @@
+# tests/test_amenity_filter.py
+import pytest
+
+from app.models.property import Amenity, Property
+from app.services.amenity_filter import amenity_predicate, resolve_amenity_terms
+from app.services.reference_data import reference_data
+
+
+@pytest.fixture
+def listings(session, make_property):
+    # Ids past the last amenity bit are matched through property_amenities
+    session.add_all([Amenity(amen_id=100, name='Helipad'), Amenity(amen_id=101, name='Wine cellar')])
+    session.commit()
+    listings = {
+        'pool_gym': make_property(amenities=('Pool', 'Gym')),
+        'pool': make_property(amenities=('Pool',)),
+        'heated_helipad': make_property(amenities=('Heated pool', 'Helipad')),
+        'helipad_cellar': make_property(amenities=('Helipad', 'Wine cellar')),
+        'none': make_property(),
+    }
+    reference_data.invalidate()
+    return listings
+
+
+def matching(terms):
+    predicate = amenity_predicate(terms)
+    query = Property.query if predicate is None else Property.query.filter(predicate)
+    return {prop.prop_id for prop in query}
+
+
+@pytest.mark.parametrize('terms, expected', [
+    (['pool'], {'pool_gym', 'pool', 'heated_helipad'}),
+    (['Pool', 'gym'], {'pool_gym'}),
+    (['100'], {'heated_helipad', 'helipad_cellar'}),
+    (['helipad', 'wine cellar'], {'helipad_cellar'}),
+    (['pool', 'helipad'], {'heated_helipad'}),
+    (['sauna'], set()),
+    ([' ', ''], {'pool_gym', 'pool', 'heated_helipad', 'helipad_cellar', 'none'}),
+])
+def test_every_requested_amenity_is_required(listings, terms, expected):
+    assert matching(terms) == {listings[name].prop_id for name in expected}
+
+
+def test_repeated_terms_are_resolved_once(listings):
+    assert resolve_amenity_terms(['100', 'helipad', '100']) == [frozenset([100])]
@@ -0,0 +1,86 @@
+# tests/test_compression.py
+import gzip
+import json
+
+import pytest
+from flask import Flask, Response, jsonify
+
+from app.middleware.compression import Compress, no_compress
+from app.utils.http_cache import cached_json_response
+
+PAYLOAD = {'properties': [{'prop_id': i, 'title': f'Listing {i}'} for i in range(100)]}
+GZIP = {'Accept-Encoding': 'gzip'}
+
+
+@pytest.fixture
+def compressed():
+    app = Flask(__name__)
+    app.config['COMPRESS_MIN_SIZE'] = 500
+    compress = Compress(app)
+
+    @app.route('/large')
+    def large():
+        return jsonify(PAYLOAD)
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/image')
+    def image():
+        return Response(b'\x89PNG' + b'\0' * 2000, mimetype='image/png')
+
+    @app.route('/opted-out')
+    @no_compress
+    def opted_out():
+        return jsonify(PAYLOAD)
+
+    @app.route('/stream')
+    def stream():
+        return Response((json.dumps(item) + '\n' for item in PAYLOAD['properties']),
+                        mimetype='application/json')
+
+    @app.route('/tagged')
+    def tagged():
+        return cached_json_response(json.dumps(PAYLOAD).encode('utf-8'), 'v1', 'no-cache')
+
+    return app.test_client(), compress
+
+
+def test_large_text_responses_are_gzipped(compressed):
+    client, _ = compressed
+    response = client.get('/large', headers=GZIP)
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert json.loads(gzip.decompress(response.data)) == PAYLOAD
+    assert 'Content-Encoding' not in client.get('/large').headers
+
+
+@pytest.mark.parametrize('path', ['/small', '/image', '/opted-out'])
+def test_responses_that_are_left_alone(compressed, path):
+    client, _ = compressed
+    assert 'Content-Encoding' not in client.get(path, headers=GZIP).headers
+
+
+def test_streamed_responses_are_compressed_incrementally(compressed):
+    client, _ = compressed
+    response = client.get('/stream', headers=GZIP)
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(response.data).decode('utf-8').splitlines()
+    assert [json.loads(line) for line in lines] == PAYLOAD['properties']
+
+
+def test_tagged_bodies_are_compressed_once_and_revalidate(compressed):
+    client, compress = compressed
+    first = client.get('/tagged', headers=GZIP)
+    assert first.headers['ETag'] == '"v1-gzip"'
+
+    second = client.get('/tagged', headers=GZIP)
+    assert second.data == first.data
+    assert list(compress._cache) == [('v1', 'gzip')]
+
+    revalidated = client.get('/tagged', headers={**GZIP, 'If-None-Match': '"v1-gzip"'})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == '"v1-gzip"'
@@ -0,0 +1,107 @@
+# tests/test_geo_search.py
+import math
+import random
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.services.listing_index import ListingIndex
+from app.services.search_query import InvalidSearch, SearchFilters, search_query
+from app.utils.geo import GEO_CELL_COLUMNS, GEO_CELL_DEGREES, cell_ranges, haversine_km
+
+CENTRE = (18.0, -76.8)
+
+
+def geo_cell(lat, lon):
+    return (math.floor((lat + 90) / GEO_CELL_DEGREES) * GEO_CELL_COLUMNS
+            + math.floor((lon + 180) / GEO_CELL_DEGREES))
+
+
+@pytest.fixture
+def listings(session, make_property):
+    rng = random.Random(22)
+    points = {}
+    for _ in range(60):
+        lat = round(rng.uniform(17.7, 18.5), 6)
+        lon = round(rng.uniform(-77.4, -76.2), 6)
+        prop = make_property(commit=False, latitude=Decimal(str(lat)), longitude=Decimal(str(lon)))
+        session.flush()
+        points[prop.prop_id] = (lat, lon)
+    make_property(commit=False)  # No coordinates
+    session.commit()
+    return points
+
+
+def test_cell_ranges_cover_every_point_in_the_box():
+    rng = random.Random(7)
+    box = (17.93, -77.12, 18.21, -76.64)
+    ranges = cell_ranges(*box)
+    for _ in range(500):
+        cell = geo_cell(rng.uniform(box[0], box[2]), rng.uniform(box[1], box[3]))
+        assert any(first <= cell <= last for first, last in ranges)
+
+
+def test_stored_geo_cell_matches_the_grid(listings, session):
+    rows = session.execute(db.text('SELECT prop_id, geo_cell FROM properties WHERE latitude IS NOT NULL'))
+    for prop_id, cell in rows:
+        assert cell == geo_cell(*listings[prop_id])
+
+
+@pytest.mark.parametrize('max_cell_rows', [40, 0])
+def test_bbox_matches_the_coordinates(app, listings, monkeypatch, max_cell_rows):
+    monkeypatch.setitem(app.config, 'SEARCH_GEO_MAX_CELL_ROWS', max_cell_rows)
+    min_lon, min_lat, max_lon, max_lat = -77.0, 17.9, -76.6, 18.2
+    filters = SearchFilters.from_params({'bbox': f'{min_lon},{min_lat},{max_lon},{max_lat}'})
+
+    expected = {prop_id for prop_id, (lat, lon) in listings.items()
+                if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon}
+    assert expected
+    assert {prop.prop_id for prop in search_query(filters)} == expected
+
+
+def test_radius_search_sorts_by_distance(listings):
+    filters = SearchFilters.from_params({'near': '%s,%s' % CENTRE, 'radius_km': '25', 'sort_by': 'distance'})
+    distances = {prop_id: float(haversine_km(*CENTRE, lat, lon)) for prop_id, (lat, lon) in listings.items()}
+    expected = sorted((prop_id for prop_id, km in distances.items() if km <= 25), key=distances.get)
+
+    assert expected
+    assert [prop.prop_id for prop in search_query(filters)] == expected
+
+
+@pytest.mark.parametrize('params', [
+    {'bbox': '-77.0,17.9,-76.6,18.2', 'sort_by': 'price'},
+    {'near': '18.0,-76.8', 'radius_km': '30', 'sort_by': 'distance'},
+    {'near': '18.0,-76.8', 'sort_by': 'distance', 'sort_order': 'desc'},
+])
+def test_index_matches_sql_for_geo_searches(listings, params):
+    index = ListingIndex()
+    index.enabled = True
+    index.rebuild()
+
+    filters = SearchFilters.from_params(params)
+    hit = index.search(filters, page=1, per_page=1000)
+    assert hit is not None
+    assert hit[0] == [prop.prop_id for prop in search_query(filters)]
+
+
+@pytest.mark.parametrize('params', [
+    {'radius_km': '5'},
+    {'near': '18.0,-76.8', 'radius_km': '-1'},
+    {'near': '95,-76.8'},
+    {'bbox': '-76.6,17.9,-77.0,18.2'},
+    {'bbox': '1,2,3'},
+])
+def test_invalid_geo_params_are_rejected(params):
+    with pytest.raises(InvalidSearch):
+        SearchFilters.from_params(params)
+
+
+def test_search_attaches_distances(client, listings):
+    response = client.get('/api/search', query_string={
+        'near': '%s,%s' % CENTRE, 'radius_km': '10', 'sort_by': 'distance', 'per_page': 50
+    })
+    assert response.status_code == 200
+    distances = [prop['distance_km'] for prop in response.json['properties']]
+    assert distances and distances == sorted(distances)
+    assert max(distances) <= 10
@@ -0,0 +1,85 @@
+# tests/test_instrumentation.py
+import json
+import logging
+
+import pytest
+from flask import Flask, jsonify
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from app.middleware.instrumentation import Instrumentation
+
+
+@pytest.fixture
+def instrumented():
+    def make(**config):
+        app = Flask(__name__)
+        app.config.update(config)
+        engine = create_engine('sqlite://')
+
+        @app.route('/listings')
+        def listings():
+            with engine.connect() as connection:
+                for _ in range(3):
+                    connection.execute(text('SELECT 1'))
+            return jsonify([])
+
+        @app.route('/broken')
+        def broken():
+            with engine.connect() as connection:
+                try:
+                    connection.execute(text('SELECT * FROM missing_table'))
+                except OperationalError:
+                    connection.rollback()
+                connection.execute(text('SELECT 1'))
+                leftovers = {key for key in connection.connection.info if key.startswith('_query')}
+            return jsonify(sorted(leftovers))
+
+        Instrumentation(app)
+        return app.test_client()
+    return make
+
+
+def logged(caplog):
+    return [(record.levelno, json.loads(record.getMessage())) for record in caplog.records
+            if record.name == 'app.middleware.instrumentation']
+
+
+def test_sampled_requests_report_their_queries(instrumented, caplog):
+    client = instrumented(INSTRUMENTATION_SAMPLE_RATE=1.0)
+    with caplog.at_level(logging.INFO, logger='app.middleware.instrumentation'):
+        response = client.get('/listings')
+
+    assert 'desc="3 queries"' in response.headers['Server-Timing']
+    [(level, record)] = logged(caplog)
+    assert level == logging.INFO
+    assert (record['endpoint'], record['status'], record['db_queries']) == ('listings', 200, 3)
+    assert record['slowest_query'] == 'SELECT 1'
+
+
+def test_unsampled_requests_are_not_reported(instrumented, caplog):
+    client = instrumented(INSTRUMENTATION_SAMPLE_RATE=0)
+    with caplog.at_level(logging.INFO, logger='app.middleware.instrumentation'):
+        response = client.get('/listings')
+
+    assert 'Server-Timing' not in response.headers
+    assert logged(caplog) == []
+
+
+def test_slow_requests_are_always_logged(instrumented, caplog):
+    client = instrumented(INSTRUMENTATION_SAMPLE_RATE=0, INSTRUMENTATION_SLOW_REQUEST_MS=0)
+    with caplog.at_level(logging.INFO, logger='app.middleware.instrumentation'):
+        client.get('/listings')
+
+    [(level, record)] = logged(caplog)
+    assert level == logging.WARNING
+    assert 'db_queries' not in record
+
+
+def test_failed_queries_leave_nothing_on_the_connection(instrumented):
+    client = instrumented(INSTRUMENTATION_SAMPLE_RATE=1.0)
+    for _ in range(2):
+        response = client.get('/broken')
+        assert response.json == []
+        # The failed statement never finishes, so only the second is counted
+        assert 'desc="1 queries"' in response.headers['Server-Timing']
@@ -0,0 +1,132 @@
+# tests/test_listing_index.py
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.models.property import Property
+from app.services.listing_index import ListingIndex
+from app.services.search_query import SearchFilters, search_query
+
+CITIES = ['Kingston', 'Ocho Rios', 'St_Ann Bay', '100% Bay', 'Mandeville', None]
+
+
+@pytest.fixture
+def listings(session, make_property):
+    rng = random.Random(14)
+    base = datetime(2026, 1, 1)
+    for number in range(60):
+        make_property(
+            property_type=rng.choice(['House', 'Apartment']),
+            parish=rng.choice(['Kingston', 'St. Ann']),
+            amenities=rng.sample(['Pool', 'Gym', 'Garden'], rng.randint(0, 2)),
+            commit=False,
+            price=Decimal(rng.randrange(50, 500) * 1000),
+            bedrooms=rng.choice([None, 1, 2, 3, 4]),
+            area_sqft=rng.choice([None, 0, 800, 1200, 2500]),
+            city=rng.choice(CITIES),
+            is_for_sale=rng.choice([True, False]),
+            is_for_rent=rng.choice([True, False]),
+            # Some listings share created_at so ties are broken by prop_id
+            created_at=base + timedelta(days=number // 3),
+        )
+    session.commit()
+
+    # The ORM fills in the flags' defaults; raw writers leave them NULL
+    session.execute(db.text('UPDATE properties SET is_for_sale = NULL WHERE prop_id % 4 = 0'))
+    session.execute(db.text('UPDATE properties SET is_for_rent = NULL WHERE prop_id % 5 = 0'))
+    session.commit()
+
+
+def index_ids(index, filters):
+    hit = index.search(filters, page=1, per_page=1000)
+    assert hit is not None
+    return hit[0]
+
+
+def sql_ids(filters):
+    return [prop.prop_id for prop in search_query(filters)]
+
+
+FILTERS = [
+    {},
+    {'is_for_sale': 'true'},
+    {'is_for_sale': 'false'},
+    {'is_for_rent': 'false', 'min_bedrooms': '2'},
+    {'is_for_rent': 'true'},
+    {'city': 'bay'},
+    {'city': 'St_Ann'},
+    {'city': 'St%Ann'},
+    {'city': '100%'},
+    {'city': '_'},
+    {'min_price': '150000', 'max_price': '300000', 'sort_by': 'price', 'sort_order': 'asc'},
+    {'sort_by': 'price_per_sqft'},
+    {'sort_by': 'price_per_sqft', 'sort_order': 'asc'},
+    {'sort_by': 'newest', 'sort_order': 'asc'},
+    {'amenities': ['pool']},
+]
+
+
+@pytest.mark.parametrize('params', FILTERS)
+def test_index_matches_sql(listings, params):
+    index = ListingIndex()
+    index.enabled = True
+    index.rebuild()
+
+    filters = SearchFilters.from_params(params)
+    assert index_ids(index, filters) == sql_ids(filters)
+
+
+def test_refresh_picks_up_raw_inserts_and_deletions(listings, session):
+    index = ListingIndex()
+    index.enabled = True
+    index.rebuild()
+    filters = SearchFilters.from_params({})
+    first, second = [prop.prop_id for prop in Property.query.order_by(Property.prop_id).limit(2)]
+
+    # The scraper inserts without updated_at; the server default supplies it
+    owner_id = Property.query.first().owner_id
+    session.execute(db.text(
+        "INSERT INTO properties (prop_id, title, price, owner_id, city, is_for_sale) "
+        "VALUES (9001, 'Scraped', 120000, :owner_id, 'Negril', NULL)"
+    ), {'owner_id': owner_id})
+    # A listing this process deletes is reported through on_listings_changed
+    session.execute(db.text('DELETE FROM property_amenities WHERE prop_id IN (:first, :second)'),
+                    {'first': first, 'second': second})
+    session.execute(db.text('DELETE FROM properties WHERE prop_id = :prop_id'), {'prop_id': first})
+    session.commit()
+    index.mark_stale({first})
+
+    index.refresh()
+    assert 9001 in index._snapshot.positions
+    assert first not in index._snapshot.positions
+    assert index_ids(index, SearchFilters.from_params({'city': 'negril'})) == [9001]
+
+    # Another worker's deletion is caught by the periodic row count
+    session.execute(db.text('DELETE FROM properties WHERE prop_id = :prop_id'), {'prop_id': second})
+    session.commit()
+    index.refresh()
+    assert second in index._snapshot.positions
+
+    index.delete_check_interval = 0
+    index.refresh()
+    assert second not in index._snapshot.positions
+    assert index_ids(index, filters) == sql_ids(filters)
+
+
+def test_failed_refresh_keeps_changed_listings(listings, monkeypatch):
+    index = ListingIndex()
+    index.enabled = True
+    index.rebuild()
+    index.mark_stale({1, 2})
+
+    def fail(snapshot, pending):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(index, '_apply_changes', fail)
+    with pytest.raises(RuntimeError):
+        index.refresh()
+    assert index._pending == {1, 2}
+    assert index._stale
@@ -0,0 +1,46 @@
+# tests/test_map_clusters.py
+from decimal import Decimal
+
+import pytest
+
+from app import db
+from app.services.map_clusters import ClusterIndex
+
+
+def total_count(index, zoom=6):
+    return sum(cluster['count'] for cluster in index.clusters(zoom)[1])
+
+
+@pytest.fixture
+def clusters(session):
+    index = ClusterIndex()
+    index.refresh_interval = 0
+    index.rebuild()
+    return index
+
+
+def test_raw_inserts_reach_the_clusters(clusters, session, make_property):
+    make_property(latitude=Decimal('18.0'), longitude=Decimal('-76.8'))
+    owner_id = session.execute(db.text('SELECT owner_id FROM properties')).scalar()
+
+    # The scraper inserts without updated_at; the server default supplies it
+    session.execute(db.text(
+        "INSERT INTO properties (prop_id, title, price, owner_id, latitude, longitude) "
+        "VALUES (9001, 'Scraped', 120000, :owner_id, 18.4, -77.1)"
+    ), {'owner_id': owner_id})
+    session.commit()
+
+    clusters.refresh()
+    assert total_count(clusters) == 2
+
+
+def test_failed_refresh_keeps_changed_listings(clusters, monkeypatch):
+    clusters.mark_changed({1, 2})
+
+    def fail(query):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(clusters, '_load', fail)
+    with pytest.raises(RuntimeError):
+        clusters.refresh()
+    assert clusters._pending == {1, 2}
@@ -0,0 +1,79 @@
+# tests/test_property_cache.py
+from app import db
+from app.models.property import Property
+from app.services import property_cache as cache_module
+from app.services.property_cache import PropertyDocumentCache, documents_for_rows, version_query
+
+
+def test_local_entries_expire_after_ttl(monkeypatch):
+    cache = PropertyDocumentCache()
+    cache.ttl = 60
+    clock = [1000.0]
+    monkeypatch.setattr(cache_module.time, 'monotonic', lambda: clock[0])
+
+    cache.set(1, 'v1', {'prop_id': 1})
+    assert cache.get(1, 'v1') == {'prop_id': 1}
+    assert cache.get(1, 'v2') is None
+
+    cache.set(1, 'v1', {'prop_id': 1})
+    clock[0] += 61
+    assert cache.get(1, 'v1') is None
+
+
+def test_lru_evicts_least_recently_used():
+    cache = PropertyDocumentCache()
+    cache.max_size = 2
+    for prop_id in (1, 2):
+        cache.set(prop_id, 'v', {'prop_id': prop_id})
+    cache.get(1, 'v')
+    cache.set(3, 'v', {'prop_id': 3})
+
+    assert cache.get(1, 'v') is not None
+    assert cache.get(2, 'v') is None
+
+
+def test_raw_image_insert_changes_etag_and_document(client, session, make_property):
+    prop = make_property()
+    url = f'/api/properties/{prop.prop_id}'
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.json['images'] == []
+    etag = first.headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    # The scraper adds images with raw SQL and leaves updated_at alone
+    session.execute(
+        db.text('INSERT INTO property_images (prop_id, image_url, is_primary) VALUES (:prop_id, :url, true)'),
+        {'prop_id': prop.prop_id, 'url': '/uploads/scraped.jpg'}
+    )
+    session.commit()
+
+    second = client.get(url, headers={'If-None-Match': etag})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != etag
+    assert [image['image_url'] for image in second.json['images']] == ['/uploads/scraped.jpg']
+
+    # List responses read the same versions
+    listed = client.get('/api/properties/', query_string={'owner_id': prop.owner_id})
+    assert [image['image_url'] for image in listed.json['properties'][0]['images']] == ['/uploads/scraped.jpg']
+
+
+def test_documents_for_rows_serializes_each_version_once(session, make_property, count_queries):
+    listings = [make_property() for _ in range(3)]
+    newest_first = Property.query.order_by(Property.prop_id.desc())
+
+    first = documents_for_rows(version_query(newest_first).all())
+    assert [document['prop_id'] for document in first] == [prop.prop_id for prop in reversed(listings)]
+
+    rows = version_query(newest_first).all()
+    with count_queries() as statements:
+        assert documents_for_rows(rows) == first
+    assert statements == []
+
+    # A write bumps updated_at, so that listing is serialized again
+    listings[0].title = 'Renamed'
+    session.commit()
+    documents = documents_for_rows(version_query(newest_first).all())
+    assert documents[-1]['title'] == 'Renamed'
+    assert documents[:2] == first[:2]
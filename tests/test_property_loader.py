@@ -0,0 +1,35 @@
+# tests/test_property_loader.py
+import pytest
+
+from app import db
+from app.models.property import Property, PropertyImage
+from app.services.property_loader import loader_options, with_profile
+
+
+def serialize_page(count_queries, profile):
+    db.session.expire_all()
+    with count_queries() as statements:
+        for prop in with_profile(Property.query, profile).order_by(Property.prop_id):
+            prop.to_dict(include_owner=profile != 'card')
+    return len(statements)
+
+
+def add_listings(make_property, count):
+    for _ in range(count):
+        prop = make_property(amenities=('Pool', 'Gym'), commit=False)
+        prop.images.append(PropertyImage(image_url='/uploads/front.jpg', is_primary=True))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('profile', ['card', 'detail', 'owner'])
+def test_queries_per_page_do_not_grow_with_the_page(session, make_property, count_queries, profile):
+    add_listings(make_property, 2)
+    small = serialize_page(count_queries, profile)
+    add_listings(make_property, 6)
+
+    assert serialize_page(count_queries, profile) == small
+
+
+def test_unknown_profile_is_rejected():
+    with pytest.raises(ValueError):
+        loader_options('everything')
@@ -0,0 +1,41 @@
+# tests/test_property_projection.py
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from app.models.property import PropertyImage
+from app.services.property_projection import VIEWS, requested_fields
+
+
+@pytest.mark.parametrize('args, expected', [
+    ({}, None),
+    ({'view': 'full'}, None),
+    ({'view': 'card'}, VIEWS['card']),
+    ({'fields': 'title, price'}, ('prop_id', 'title', 'price')),
+    ({'fields': 'price,prop_id,price'}, ('price', 'prop_id')),
+])
+def test_requested_fields(args, expected):
+    assert requested_fields(MultiDict(args)) == expected
+
+
+@pytest.mark.parametrize('args', [{'view': 'thumbnail'}, {'fields': 'title,password'}])
+def test_unknown_views_and_fields_are_rejected(args):
+    with pytest.raises(ValueError):
+        requested_fields(MultiDict(args))
+
+
+def test_projected_search_returns_only_the_requested_fields(client, session, make_property):
+    prop = make_property(parish='St. Andrew', commit=False)
+    prop.images.extend([
+        PropertyImage(image_url='/uploads/side.jpg', is_primary=False),
+        PropertyImage(image_url='/uploads/front.jpg', is_primary=True),
+    ])
+    session.commit()
+
+    response = client.get('/api/search', query_string={'fields': 'title,parish_name,primary_image'})
+    assert response.status_code == 200
+    assert response.json['properties'] == [{
+        'prop_id': prop.prop_id, 'title': prop.title,
+        'parish_name': 'St. Andrew', 'primary_image': '/uploads/front.jpg',
+    }]
+
+    assert client.get('/api/search', query_string={'fields': 'password'}).status_code == 400
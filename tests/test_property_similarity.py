@@ -0,0 +1,104 @@
+# tests/test_property_similarity.py
+from decimal import Decimal
+
+from app import db
+from app.models.property import PropertySimilarity
+from app.services import property_similarity as similarity_module
+from app.services.property_similarity import (
+    _load_features, _store, rebuild_similarities, refresh_similarities, similar_listings
+)
+
+
+def neighbours(prop_id):
+    return [(prop.prop_id, score) for prop, score in similar_listings(prop_id)]
+
+
+def test_neighbours_are_best_first_and_dissimilar_listings_left_out(session, make_property):
+    target = make_property(price=Decimal(100000))
+    twin_a = make_property(price=Decimal(100000))
+    twin_b = make_property(price=Decimal(100000))
+    pricier = make_property(price=Decimal(150000))
+    make_property(property_type='Apartment', parish='St. Ann', city='Ocho Rios',
+                  price=Decimal(400000), bedrooms=1)
+
+    rebuild_similarities()
+
+    found = neighbours(target.prop_id)
+    # Equal scores are ordered by prop_id
+    assert [prop_id for prop_id, _ in found] == [twin_a.prop_id, twin_b.prop_id, pricier.prop_id]
+    assert found[0][1] == found[1][1] > found[2][1] >= 0.5
+
+
+def test_a_listing_without_rows_is_served_without_writing(session, make_property):
+    target = make_property(price=Decimal(100000))
+    close = make_property(price=Decimal(105000))
+    far = make_property(price=Decimal(180000))
+    make_property(property_type='Apartment', parish='St. Ann', city='Ocho Rios',
+                  price=Decimal(400000), bedrooms=1)
+
+    assert [prop_id for prop_id, _ in neighbours(target.prop_id)] == [close.prop_id, far.prop_id]
+    assert PropertySimilarity.query.count() == 0
+
+
+def test_store_skips_listings_deleted_after_loading(session, make_property):
+    listings = [make_property() for _ in range(3)]
+    features = _load_features()
+    session.execute(db.text('DELETE FROM properties WHERE prop_id = :prop_id'),
+                    {'prop_id': listings[2].prop_id})
+    session.commit()
+
+    _store(features, range(len(features.ids)), 20)
+
+    rows = PropertySimilarity.query.order_by(PropertySimilarity.prop_id).all()
+    assert [(row.prop_id, row.similar_prop_id) for row in rows] == [
+        (listings[0].prop_id, listings[1].prop_id), (listings[1].prop_id, listings[0].prop_id)
+    ]
+
+
+def stored_rows():
+    return [(row.prop_id, row.rank, row.similar_prop_id, row.score)
+            for row in PropertySimilarity.query.order_by(PropertySimilarity.prop_id, PropertySimilarity.rank)]
+
+
+def test_refresh_matches_a_rebuild_and_loads_only_the_pool(app, session, make_property, monkeypatch):
+    monkeypatch.setitem(app.config, 'SIMILAR_PROPERTIES_K', 2)
+    houses = [make_property(price=Decimal(100000 + 10000 * number)) for number in range(5)]
+    flats = [make_property(property_type='Apartment', parish='St. Ann', city='Ocho Rios',
+                           price=Decimal(900000 + 1000 * number), bedrooms=1) for number in range(3)]
+    rebuild_similarities()
+
+    houses[0].price = Decimal(135000)
+    session.commit()
+    loaded = []
+    load = similarity_module._load_features
+
+    def recording(*criteria):
+        features = load(*criteria)
+        loaded.append(set(features.ids.tolist()))
+        return features
+
+    monkeypatch.setattr(similarity_module, '_load_features', recording)
+    refresh_similarities([houses[0].prop_id])
+    refreshed = stored_rows()
+
+    assert loaded and all(ids.isdisjoint(flat.prop_id for flat in flats) for ids in loaded)
+    monkeypatch.setattr(similarity_module, '_load_features', load)
+    rebuild_similarities()
+    assert refreshed == stored_rows()
+
+
+def test_lookup_is_one_query_and_weak_rows_are_not_rescored(app, session, make_property,
+                                                            count_queries, monkeypatch):
+    target = make_property()
+    make_property(property_type='Apartment', parish='St. Ann', city='Ocho Rios',
+                  price=Decimal(400000), bedrooms=1)
+    rebuild_similarities()
+
+    def fail(*args):
+        raise AssertionError('stored neighbours are not rescored')
+
+    monkeypatch.setattr(similarity_module, '_fallback_listings', fail)
+    with count_queries() as statements:
+        assert similar_listings(target.prop_id) == []
+    assert len([sql for sql in statements if 'property_similarities' in sql]) == 1
+    assert not any('EXISTS' in sql for sql in statements)
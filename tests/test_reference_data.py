@@ -0,0 +1,24 @@
+# tests/test_reference_data.py
+from app.models.property import Amenity
+from app.services.reference_data import reference_data
+
+
+def test_reference_lists_revalidate_with_etag(client, session):
+    session.add(Amenity(name='Pool'))
+    session.commit()
+
+    response = client.get('/api/properties/amenities')
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == 'public, no-cache'
+    etag = response.headers['ETag']
+
+    assert client.get('/api/properties/amenities', headers={'If-None-Match': etag}).status_code == 304
+
+    # A new amenity invalidates the registry; the client's next revalidation sees it
+    session.add(Amenity(name='Gym'))
+    session.commit()
+    reference_data.invalidate('amenities')
+
+    response = client.get('/api/properties/amenities', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [item['name'] for item in response.json['amenities']] == ['Pool', 'Gym']
@@ -0,0 +1,35 @@
+# tests/test_search_aggregates.py
+from datetime import datetime, timedelta
+
+from app.models.search import SearchAggregate, SearchHistory
+from app.services.search_aggregates import (
+    compact_search_history, popular_searches, prewarm_search_caches, settle_seconds
+)
+from app.services.search_query import SearchFilters
+
+
+def test_settle_time_covers_the_collapse_window():
+    config = {'SEARCH_HISTORY_SETTLE_SECONDS': 60, 'SEARCH_HISTORY_COLLAPSE_WINDOW': 300,
+              'SEARCH_HISTORY_BUFFER_FLUSH_INTERVAL': 10}
+    assert settle_seconds(config) == 310
+    assert settle_seconds(dict(config, SEARCH_HISTORY_SETTLE_SECONDS=900)) == 900
+
+
+def test_rows_that_can_still_be_bumped_are_not_aggregated(app, session, owner, monkeypatch):
+    monkeypatch.setitem(app.config, 'SEARCH_HISTORY_SETTLE_SECONDS', 60)
+    now = datetime.utcnow()
+    filters = SearchFilters.from_params({'city': 'Kingston'})
+    for seconds, hits in ((200, 2), (600, 3)):
+        session.add(SearchHistory(user_id=owner.user_id, signature=filters.signature, search_query='Kingston',
+                                  search_params=filters.to_params(), hit_count=hits,
+                                  search_date=now - timedelta(seconds=seconds)))
+    session.commit()
+
+    assert compact_search_history(now) == (1, 0)
+    aggregate = SearchAggregate.query.one()
+    assert aggregate.search_count == 3
+    assert [search.search_query for search in popular_searches()] == ['Kingston']
+
+
+def test_prewarm_needs_a_shared_cache(session):
+    assert prewarm_search_caches() == 0
@@ -0,0 +1,53 @@
+# tests/test_search_count.py
+import pytest
+
+from app.models.property import Property
+from app.services.search_count import count_strategy, count_total, paginate
+
+
+@pytest.fixture
+def listings(session, make_property):
+    return [make_property() for _ in range(5)]
+
+
+def ordered():
+    return Property.query.order_by(Property.prop_id)
+
+
+def test_exact_total_rides_along_in_the_page_query(listings, count_queries):
+    with count_queries() as statements:
+        page = paginate(ordered(), 2, 2)
+    assert len(statements) == 1
+    assert [prop.prop_id for prop, _ in page.items] == [listings[2].prop_id, listings[3].prop_id]
+    assert (page.total, page.pages, page.has_more, page.estimated) == (5, 3, True, False)
+
+    past_end = paginate(ordered(), 4, 2)
+    assert (past_end.items, past_end.total, past_end.has_more) == ([], 5, False)
+
+
+def test_none_strategy_only_tells_whether_more_follow(listings):
+    page = paginate(ordered(), 2, 2, strategy='none')
+    assert (page.total, page.pages, page.has_more) == (None, None, True)
+    assert paginate(ordered(), 3, 2, strategy='none').has_more is False
+
+
+def test_estimate_strategy_counts_small_results_exactly(app, listings, monkeypatch):
+    page = paginate(ordered(), 1, 2, strategy='estimate')
+    assert (page.total, page.estimated) == (5, False)
+
+    monkeypatch.setitem(app.config, 'SEARCH_COUNT_ESTIMATE_THRESHOLD', 0)
+    page = paginate(ordered(), 1, 2, strategy='estimate')
+    assert page.estimated is True
+    assert page.total >= 0
+
+
+def test_totals_are_cached_per_signature(listings, count_queries):
+    assert paginate(ordered(), 1, 2, signature='all').total == 5
+    with count_queries() as statements:
+        assert count_total(ordered(), signature='all') == (5, False)
+    assert statements == []
+
+
+@pytest.mark.parametrize('value, expected', [('none', 'none'), (' Estimate ', 'estimate'), ('bogus', 'exact'), (None, 'exact')])
+def test_count_strategy(app, value, expected):
+    assert count_strategy(value) == expected
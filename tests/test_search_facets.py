@@ -0,0 +1,54 @@
+# tests/test_search_facets.py
+import random
+from decimal import Decimal
+
+import pytest
+
+from app.services import search_facets as facets_module
+from app.services.listing_index import ListingIndex
+from app.services.search_facets import _index_counts, _price_edges, _sql_counts
+from app.services.search_query import SearchFilters, search_query
+
+
+@pytest.fixture
+def listings(session, make_property):
+    rng = random.Random(15)
+    for _ in range(50):
+        make_property(
+            property_type=rng.choice(['House', 'Apartment', None]),
+            parish=rng.choice(['Kingston', 'St. Ann', 'Portland']),
+            commit=False,
+            price=rng.choice([Decimal(90000), Decimal(6500000), Decimal(25000000), Decimal(95000000)]),
+            bedrooms=rng.choice([None, 1, 3, 5, 7]),
+            is_for_sale=rng.choice([True, False]),
+        )
+    session.commit()
+
+
+@pytest.mark.parametrize('params', [{}, {'is_for_sale': 'true'}, {'min_bedrooms': '3'}, {'parish': 'Kingston'}])
+def test_index_and_sql_counts_agree_and_add_up(listings, monkeypatch, params):
+    index = ListingIndex()
+    index.enabled = True
+    index.rebuild()
+    filters = SearchFilters.from_params(params)
+    edges = _price_edges()
+
+    sql = _sql_counts(filters, edges)
+    assert sql['total'] == search_query(filters).count()
+    # Every listing has a parish; other facets leave out their NULLs
+    assert sum(sql['parish'].values()) == sql['total']
+    for name in ('property_type', 'bedrooms', 'price'):
+        assert sum(sql[name].values()) <= sql['total']
+
+    monkeypatch.setattr(facets_module, 'listing_index', index)
+    assert _index_counts(filters, edges) == sql
+
+
+def test_facets_endpoint(client, app, listings):
+    response = client.get('/api/search/facets', query_string={'min_bedrooms': '5'})
+    assert response.status_code == 200
+    body = response.json
+    assert body['total'] == search_query(SearchFilters.from_params({'min_bedrooms': '5'})).count()
+    assert [bucket['bedrooms'] for bucket in body['facets']['bedrooms']] == ['5+']
+    assert sum(item['count'] for item in body['facets']['parish']) == body['total']
+    assert len(body['facets']['price']) == len(app.config['SEARCH_FACET_PRICE_BANDS'])
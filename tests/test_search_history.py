@@ -0,0 +1,42 @@
+# tests/test_search_history.py
+from datetime import datetime, timedelta
+
+from flask_jwt_extended import create_access_token
+
+from app.models.search import SearchHistory
+from app.services.search_history import search_history_buffer
+from app.services.search_query import SearchFilters
+
+
+def test_repeat_bumps_only_the_newest_row(session, owner):
+    filters = SearchFilters.from_params({'city': 'Kingston'})
+    now = datetime.utcnow()
+    older, newer = [
+        SearchHistory(user_id=owner.user_id, signature=filters.signature, search_query='Kingston',
+                      search_params=filters.to_params(), search_date=now - timedelta(seconds=seconds))
+        for seconds in (120, 60)
+    ]
+    session.add_all([older, newer])
+    session.commit()
+
+    search_history_buffer.record(owner.user_id, filters, 'Kingston', searched_at=now)
+
+    session.expire_all()
+    assert (older.hit_count, newer.hit_count) == (1, 2)
+    assert newer.search_date == now
+    assert SearchHistory.query.count() == 2
+
+
+def test_search_records_history_for_a_valid_token_only(client, session, owner):
+    token = create_access_token(identity=str(owner.user_id))
+
+    response = client.get('/api/search', query_string={'city': 'Kingston'},
+                          headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    assert SearchHistory.query.filter_by(user_id=owner.user_id).count() == 1
+
+    # A malformed token still gets results, it just is not recorded
+    response = client.get('/api/search', query_string={'city': 'Ocho Rios'},
+                          headers={'Authorization': 'Bearer not-a-token'})
+    assert response.status_code == 200
+    assert SearchHistory.query.count() == 1
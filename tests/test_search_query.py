@@ -0,0 +1,69 @@
+# tests/test_search_query.py
+from decimal import Decimal
+
+import pytest
+
+from app.services.search_query import InvalidSearch, SearchFilters
+
+
+def test_params_round_trip_through_search_history():
+    filters = SearchFilters.from_params({
+        'min_price': '100000', 'city': '  Ocho   Rios ', 'amenities': ['Pool', 'gym', 'pool'],
+        'is_for_sale': 'yes', 'sort_by': 'price', 'sort_order': 'ASC',
+    })
+    assert (filters.min_price, filters.city, filters.amenities) == (100000.0, 'Ocho Rios', ('gym', 'pool'))
+    assert filters.is_for_sale is True and filters.is_for_rent is None
+
+    again = SearchFilters.from_params(filters.to_params())
+    assert again == filters
+    assert again.signature == filters.signature
+
+
+@pytest.mark.parametrize('params, sort, effective', [
+    ({}, 'newest', 'newest'),
+    ({'sort_by': 'created_at'}, 'newest', 'newest'),
+    ({'keyword': 'pool'}, 'relevance', 'relevance'),
+    ({'sort_by': 'relevance'}, 'relevance', 'newest'),
+    ({'sort_by': 'distance'}, 'distance', 'newest'),
+])
+def test_sorts(params, sort, effective):
+    filters = SearchFilters.from_params(params)
+    assert (filters.sort_by, filters.effective_sort) == (sort, effective)
+
+
+def test_order_does_not_change_which_listings_match():
+    newest = SearchFilters.from_params({'city': 'Kingston'})
+    cheapest = SearchFilters.from_params({'city': 'Kingston', 'sort_by': 'price', 'sort_order': 'asc'})
+    assert newest.signature == cheapest.signature
+    assert newest.result_signature != cheapest.result_signature
+
+
+@pytest.mark.parametrize('params', [
+    {'min_price': 'cheap'},
+    {'parish_id': '1.5'},
+    {'is_for_rent': 'maybe'},
+    {'sort_by': 'popularity'},
+    {'sort_order': 'sideways'},
+])
+def test_invalid_params_are_rejected(params):
+    with pytest.raises(InvalidSearch):
+        SearchFilters.from_params(params)
+
+
+def test_both_search_endpoints_return_the_same_listings(client, session, make_property):
+    listings = [
+        make_property(parish=parish, price=Decimal(100000 * (number + 1)), bedrooms=number + 1)
+        for number, parish in enumerate(['Kingston', 'St. Ann', 'Kingston', 'Kingston'])
+    ]
+    query = {'parish': 'Kingston', 'min_bedrooms': '2', 'sort_by': 'price', 'sort_order': 'asc'}
+
+    search = client.get('/api/search', query_string=query)
+    listing_search = client.get('/api/properties/search', query_string=query)
+    assert search.status_code == listing_search.status_code == 200
+    ids = [prop['prop_id'] for prop in search.json['properties']]
+    assert ids == [listings[2].prop_id, listings[3].prop_id]
+    assert [prop['prop_id'] for prop in listing_search.json['properties']] == ids
+    assert search.json['total'] == listing_search.json['total'] == 2
+
+    for url in ('/api/search', '/api/properties/search'):
+        assert client.get(url, query_string={'min_price': 'cheap'}).status_code == 400
@@ -0,0 +1,51 @@
+# tests/test_search_results.py
+import pytest
+
+from app.services.search_query import SearchFilters, search_query
+from app.services.search_results import cached_page
+
+
+@pytest.fixture
+def listings(session, make_property):
+    return [make_property(amenities=('Pool', 'Gym')) for _ in range(5)]
+
+
+def page_of(params, page, per_page=2, **kwargs):
+    filters = SearchFilters.from_params(params)
+    return cached_page(search_query(filters), filters.result_signature, page, per_page,
+                       count_signature=filters.signature, **kwargs)
+
+
+def test_later_pages_come_from_the_cached_ids(listings, count_queries):
+    newest_first = [prop.prop_id for prop in reversed(listings)]
+    first = page_of({}, 1)
+    assert (first.items, first.total, first.has_more) == (newest_first[:2], 5, True)
+
+    with count_queries() as statements:
+        third = page_of({}, 3)
+    assert statements == []
+    assert (third.items, third.total, third.has_more) == (newest_first[4:], 5, False)
+
+
+def test_equivalent_searches_share_an_entry(listings, count_queries):
+    page_of({'amenities': ['pool', 'gym'], 'sort_by': 'newest'}, 1)
+    with count_queries() as statements:
+        page_of({'amenities': ['gym', 'pool']}, 1)
+    assert statements == []
+
+
+def test_listing_writes_invalidate_the_cached_ids(listings, make_property):
+    assert page_of({}, 1).total == 5
+    added = make_property()
+    page = page_of({}, 1)
+    assert (page.items[0], page.total) == (added.prop_id, 6)
+
+
+def test_results_deeper_than_the_cache(app, listings, monkeypatch):
+    monkeypatch.setitem(app.config, 'SEARCH_RESULT_CACHE_DEPTH', 3)
+    assert page_of({}, 2) is None
+
+    # The cached list is cut at the depth, so the total is counted
+    page = page_of({}, 1)
+    assert (page.total, page.has_more) == (5, True)
+    assert page_of({}, 1, strategy='none').total is None
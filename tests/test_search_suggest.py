@@ -0,0 +1,83 @@
+# tests/test_search_suggest.py
+import pytest
+
+from app import db
+from app.services.search_suggest import SuggestIndex, _sql_prefix
+
+
+@pytest.fixture
+def index(session):
+    index = SuggestIndex()
+    index.enabled = True
+    index.refresh_interval = 0
+    index.rebuild()
+    return index
+
+
+@pytest.fixture
+def listings(session, make_property):
+    return [
+        make_property(title='Sea view villa', city='Ocho Rios', address='12 Hope Road'),
+        make_property(title='Hillside cottage', city='Ocho Rios', address='4 Hopewell Lane'),
+        make_property(title='Hope Gardens flat', city='Kingston', address='1 Old Hope Road'),
+    ]
+
+
+def texts(suggestions):
+    return [(suggestion['type'], suggestion['text'], suggestion['count']) for suggestion in suggestions]
+
+
+def test_words_inside_a_term_are_completed(index, listings):
+    found = texts(index.complete('hope', ('address', 'title')))
+    # Whole-term prefix matches rank before matches on a later word
+    assert found[0] == ('title', 'Hope Gardens flat', 1)
+    assert {text for _, text, _ in found} == {'12 Hope Road', '1 Old Hope Road', '4 Hopewell Lane', 'Hope Gardens flat'}
+
+
+def test_more_listings_rank_first(index, listings):
+    assert texts(index.complete('o', ('city',))) == [('city', 'Ocho Rios', 2)]
+    suggestion = index.complete('sea view', ('title',))[0]
+    assert (suggestion['prop_id'], suggestion['search']) == (listings[0].prop_id, {'keyword': 'Sea view villa'})
+
+
+def test_index_agrees_with_the_sql_prefix_search(index, listings):
+    for term in ('hope', 'ocho', 'road', 'kingston', 'hill'):
+        assert texts(index.complete(term)) == texts(_sql_prefix(term, ('city', 'parish', 'address', 'title'), 8))
+
+
+def test_changes_move_only_the_listings_terms(index, listings, session):
+    listings[0].title = 'Harbour loft'
+    session.commit()
+    index.mark_changed({listings[0].prop_id})
+    index.refresh()
+
+    assert index.complete('sea', ('title',)) == []
+    assert texts(index.complete('harb', ('title',))) == [('title', 'Harbour loft', 1)]
+
+
+def test_an_index_built_empty_picks_up_raw_inserts(index, session, owner):
+    session.execute(db.text(
+        "INSERT INTO properties (prop_id, title, price, owner_id, city) "
+        "VALUES (9001, 'Scraped cabin', 120000, :owner_id, 'Negril')"
+    ), {'owner_id': owner.user_id})
+    session.commit()
+
+    index.refresh()
+    assert texts(index.complete('negril', ('city',))) == [('city', 'Negril', 1)]
+
+
+def test_failed_refresh_keeps_changed_listings(index, monkeypatch):
+    index.mark_changed({1, 2})
+
+    def fail(query):
+        raise RuntimeError('database unavailable')
+
+    monkeypatch.setattr(index, '_load', fail)
+    with pytest.raises(RuntimeError):
+        index.refresh()
+    assert index._pending == {1, 2}
+
+
+def test_suggest_endpoint_validates_its_input(client, listings):
+    assert client.get('/api/search/suggest', query_string={'q': 'o'}).json['suggestions'] == []
+    assert client.get('/api/search/suggest', query_string={'q': 'ocho', 'types': 'city,owner'}).status_code == 400
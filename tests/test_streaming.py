@@ -0,0 +1,51 @@
+# tests/test_streaming.py
+import json
+
+import pytest
+
+from app.utils.json_provider import stream_json_array
+
+
+def rows_failing_after(count):
+    for number in range(count):
+        yield {'n': number}
+    raise RuntimeError('connection lost')
+
+
+def body(response):
+    return b''.join(response.response).decode('utf-8')
+
+
+def test_streams_every_row_with_envelope(app):
+    with app.test_request_context():
+        response = stream_json_array(({'n': n} for n in range(5)), dict,
+                                     key='items', envelope={'success': True}, chunk_size=2)
+        assert json.loads(body(response)) == {'success': True, 'items': [{'n': n} for n in range(5)]}
+
+
+def test_empty_array(app):
+    with app.test_request_context():
+        assert json.loads(body(stream_json_array([], dict))) == []
+
+
+def test_failure_in_first_batch_raises_before_streaming(app):
+    with app.test_request_context():
+        with pytest.raises(RuntimeError):
+            stream_json_array(rows_failing_after(1), dict, chunk_size=2)
+
+
+def test_failure_mid_stream_ends_with_error_member(app):
+    with app.test_request_context():
+        response = stream_json_array(rows_failing_after(3), dict,
+                                     key='items', envelope={'success': True}, chunk_size=2)
+        document = json.loads(body(response))
+
+    assert document['items'] == [{'n': 0}, {'n': 1}]
+    assert 'error' in document
+
+
+def test_failure_mid_stream_leaves_bare_array_unterminated(app):
+    with app.test_request_context():
+        response = stream_json_array(rows_failing_after(3), dict, chunk_size=2)
+        with pytest.raises(json.JSONDecodeError):
+            json.loads(body(response))
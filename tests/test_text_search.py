@@ -0,0 +1,44 @@
+# tests/test_text_search.py
+import pytest
+
+from app.models.property import Property
+from app.services.text_search import apply_keyword, snippets
+
+
+@pytest.fixture
+def listings(session, make_property):
+    return {
+        'title': make_property(title='Villa with pool', description='Quiet street'),
+        'description': make_property(title='Family home', description='Large garden and a pool'),
+        'beach': make_property(title='Beach house', description='Steps from the sea, no pool'),
+        'plain': make_property(title='Studio', description='Close to the university'),
+    }
+
+
+def matches(keyword):
+    return [prop.prop_id for prop in apply_keyword(Property.query, keyword)]
+
+
+def test_keywords_are_stemmed_and_ranked_title_first(listings):
+    found = matches('pools')
+    assert found[0] == listings['title'].prop_id
+    assert set(found) == {listings[name].prop_id for name in ('title', 'description', 'beach')}
+
+
+def test_web_search_syntax(listings):
+    assert set(matches('pool -beach')) == {listings['title'].prop_id, listings['description'].prop_id}
+    assert matches('"family home"') == [listings['description'].prop_id]
+    assert set(matches('studio or villa')) == {listings['plain'].prop_id, listings['title'].prop_id}
+
+
+def test_search_returns_highlighted_snippets(client, listings):
+    response = client.get('/api/search', query_string={'keyword': 'garden', 'snippets': 'true'})
+    assert response.status_code == 200
+    [found] = response.json['properties']
+    assert found['prop_id'] == listings['description'].prop_id
+    assert '<mark>garden</mark>' in found['snippet']
+
+
+def test_snippets_need_ids_and_a_keyword(session):
+    assert snippets([], 'pool') == {}
+    assert snippets([1], '') == {}
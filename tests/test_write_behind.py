@@ -0,0 +1,145 @@
+# tests/test_write_behind.py
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from app.services.write_behind import WriteBehindBuffer
+
+
+class RecordingBuffer(WriteBehindBuffer):
+    """Sums counts per key; keys in `poison` fail every write they are part of"""
+
+    config_prefix = 'TEST_BUFFER'
+
+    def __init__(self, app, poison=(), down=False):
+        self.poison = set(poison)
+        self.down = down
+        self.written = {}
+        self.writes = 0
+        super().__init__(app)
+
+    def merge(self, pending, key, event):
+        pending[key] = {'key': key, 'count': pending.get(key, {'count': 0})['count'] + event['count']}
+
+    def key_for(self, event):
+        return event['key']
+
+    def write(self, batch):
+        self.writes += 1
+        if self.down:
+            raise OperationalError('INSERT', {}, Exception('server closed the connection'))
+        if self.poison & batch.keys():
+            raise IntegrityError('INSERT', {}, Exception('violates foreign key constraint'))
+        for key, event in batch.items():
+            self.written[key] = self.written.get(key, 0) + event['count']
+
+
+@pytest.fixture
+def buffer_app(app):
+    app.config['TEST_BUFFER_ENABLED'] = True
+    app.config['TEST_BUFFER_MAX_RETRIES'] = 2
+    yield app
+    for key in [key for key in app.config if key.startswith('TEST_BUFFER_')]:
+        del app.config[key]
+
+
+def fill(buffer, keys):
+    # Straight into pending, so no worker thread races the test's flush
+    for key in keys:
+        buffer.merge(buffer._pending, key, {'key': key, 'count': 1})
+
+
+def test_poison_rows_are_dropped_and_the_rest_written(buffer_app):
+    buffer = RecordingBuffer(buffer_app, poison={3, 6})
+    fill(buffer, range(8))
+
+    assert buffer.flush() == 6
+    assert sorted(buffer.written) == [0, 1, 2, 4, 5, 7]
+    assert buffer._pending == {}
+
+    # Nothing is left to block later flushes
+    fill(buffer, [8])
+    assert buffer.flush() == 1
+    assert 8 in buffer.written
+
+
+def test_transient_failures_are_retried_up_to_the_cap(buffer_app):
+    buffer = RecordingBuffer(buffer_app, down=True)
+    fill(buffer, [1, 2])
+
+    assert buffer.flush() == 0
+    assert buffer.writes == 1  # Connection errors do not split the batch
+    assert sorted(buffer._pending) == [1, 2]
+
+    assert buffer.flush() == 0
+    assert sorted(buffer._pending) == [1, 2]
+
+    # Third failure in a row exceeds TEST_BUFFER_MAX_RETRIES
+    assert buffer.flush() == 0
+    assert buffer._pending == {}
+
+
+def test_retried_events_merge_with_new_ones(buffer_app):
+    buffer = RecordingBuffer(buffer_app, down=True)
+    fill(buffer, [1])
+    buffer.flush()
+
+    fill(buffer, [1])
+    buffer.down = False
+    assert buffer.flush() == 1
+    assert buffer.written == {1: 2}
+    assert buffer._attempts == {}
+
+
+def test_failed_events_stay_in_the_log(buffer_app, tmp_path):
+    buffer_app.config['TEST_BUFFER_LOG_PATH'] = str(tmp_path / 'events.log')
+    buffer = RecordingBuffer(buffer_app, down=True)
+    with buffer._lock:
+        buffer._append_log({'key': 1, 'count': 1})
+        fill(buffer, [1])
+
+    buffer.flush()
+
+    with open(buffer._own_log(), encoding='utf-8') as f:
+        assert [json.loads(line) for line in f] == [{'key': 1, 'count': 1}]
+    assert not os.path.exists(buffer._own_log() + '.flushing')
+
+    buffer.down = False
+    assert buffer.flush() == 1
+
+
+def test_orphaned_logs_are_claimed_before_replay(buffer_app, tmp_path):
+    buffer_app.config['TEST_BUFFER_LOG_PATH'] = str(tmp_path / 'events.log')
+    buffer_app.config['TEST_BUFFER_FLUSH_INTERVAL'] = 3600
+
+    # A log left by a process that has exited
+    dead = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'],
+                          capture_output=True, text=True, check=True)
+    orphan = tmp_path / f'events.log.{dead.stdout.strip()}'
+    orphan.write_text('{"key": 1, "count": 2}\n{"key": 1, "count": 3}\n', encoding='utf-8')
+
+    buffer = RecordingBuffer(buffer_app)
+    assert not orphan.exists()
+    assert buffer._pending == {1: {'key': 1, 'count': 5}}
+
+    # A second worker finds nothing left to replay
+    assert RecordingBuffer(buffer_app)._pending == {}
+
+    assert buffer.flush() == 1
+    assert buffer.written == {1: 5}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_exit_hook_is_registered_once(buffer_app, monkeypatch):
+    registered = []
+    monkeypatch.setattr('app.services.write_behind.atexit.register', registered.append)
+
+    buffer = RecordingBuffer(buffer_app)
+    buffer.init_app(buffer_app)
+    buffer.init_app(buffer_app)
+
+    assert registered == [buffer.flush]